@@ -0,0 +1,229 @@
+"""Admin CLI for the expense spreadsheets.
+
+    python admin.py sheets                 # worksheets of GOOGLE_SHEET_NAME
+    python admin.py sheets --all           # every spreadsheet the service account sees
+    python admin.py sheets --sample        # plus header and last row of each worksheet
+    python admin.py sheets --totals        # plus spent/income per worksheet (reads the amount column)
+    python admin.py backup                 # incremental backup of the month worksheets now
+    python admin.py backups                # list backup manifests
+    python admin.py restore 10/2026 [--at MANIFEST] [--into TITLE]
+
+The listing is built from one metadata fetch per spreadsheet; cell data is
+only read for --sample (two small batch reads) and --totals.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+
+import backup
+import config
+import schema
+import sheets_client
+
+INCOME_CATEGORY = "Thu nhập"
+
+
+def _a1(title, rng):
+    return "'" + title.replace("'", "''") + "'!" + rng
+
+
+def _col(index):
+    return gspread.utils.rowcol_to_a1(1, index + 1)[:-1]
+
+
+def _value_ranges(http, spreadsheet_id, ranges, **params):
+    if not ranges:
+        return []
+    response = http.values_batch_get(spreadsheet_id, ranges, params=params or None)
+    return [r.get("values", []) for r in response.get("valueRanges", [])]
+
+
+def _to_int(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = "".join(ch for ch in str(value) if ch.isdigit())
+    return int(digits) if digits else 0
+
+
+def inventory(client, spreadsheet_id, registry=None):
+    """(spreadsheet title, worksheet entries) from a single metadata fetch."""
+    meta = client.http_client.fetch_sheet_metadata(spreadsheet_id, params={"fields": "properties.title,sheets.properties"})
+    worksheets = []
+    for sheet in meta.get("sheets", []):
+        props = sheet["properties"]
+        grid = props.get("gridProperties", {})
+        entry = (registry.get(props["title"]) if registry else None) or {}
+        worksheets.append({
+            "title": props["title"],
+            "grid_rows": grid.get("rowCount", 0),
+            "grid_cols": grid.get("columnCount", 0),
+            "rows": entry.get("rows"),
+            "version": entry.get("version"),
+            "columns": entry.get("columns"),
+        })
+    return meta.get("properties", {}).get("title", spreadsheet_id), worksheets
+
+
+def load_headers(http, spreadsheet_id, worksheets):
+    """Fill 'header' (and 'columns' when unknown) with one batch read of every row 1."""
+    headers = _value_ranges(http, spreadsheet_id, [_a1(ws["title"], "1:1") for ws in worksheets])
+    for ws, values in zip(worksheets, headers):
+        ws["header"] = values[0] if values else []
+        if ws["columns"] is None:
+            ws["columns"] = schema.detect_columns(ws["header"])
+
+
+def load_samples(http, spreadsheet_id, worksheets):
+    """Fill 'last_row'; worksheets without a known row count get it from column A first."""
+    unknown = [ws for ws in worksheets if not ws["rows"]]
+    for ws, values in zip(unknown, _value_ranges(http, spreadsheet_id, [_a1(ws["title"], "A:A") for ws in unknown])):
+        ws["rows"] = len(values)
+    sampled = [ws for ws in worksheets if ws["rows"] and ws["rows"] > 1]
+    ranges = [_a1(ws["title"], f"A{ws['rows']}:{ws['rows']}") for ws in sampled]
+    for ws, values in zip(sampled, _value_ranges(http, spreadsheet_id, ranges)):
+        ws["last_row"] = values[0] if values else []
+
+
+def worksheet_totals(http, spreadsheet_id, ws):
+    """(spent, income) of one worksheet from its amount, category and status columns only.
+
+    Soft-deleted rows (status TOMBSTONE) are left out, as in the bot's reports.
+    """
+    columns = ws["columns"] or {}
+    if "amount" not in columns:
+        return None
+    fields = [field for field in ("amount", "category", "status") if field in columns]
+    ranges = [_a1(ws["title"], f"{_col(columns[field])}2:{_col(columns[field])}") for field in fields]
+    values = dict(zip(fields, _value_ranges(http, spreadsheet_id, ranges, valueRenderOption="UNFORMATTED_VALUE")))
+
+    def cell(field, i):
+        column = values.get(field, [])
+        return column[i][0] if i < len(column) and column[i] else ""
+
+    spent = income = 0
+    for i in range(len(values["amount"])):
+        if str(cell("status", i)).strip() == schema.TOMBSTONE:
+            continue
+        if cell("category", i) == INCOME_CATEGORY:
+            income += _to_int(cell("amount", i))
+        else:
+            spent += _to_int(cell("amount", i))
+    return spent, income
+
+
+def print_inventory(title, worksheets, sample=False, totals=False):
+    print(f"Spreadsheet: '{title}' ({len(worksheets)} worksheets)")
+    for ws in worksheets:
+        used = ws["rows"] if ws["rows"] else "?"
+        version = f"v{ws['version']}" if ws["version"] else "-"
+        line = f"  - '{ws['title']}': grid {ws['grid_rows']}x{ws['grid_cols']}, used rows {used}, schema {version}"
+        if totals and ws.get("totals"):
+            spent, income = ws["totals"]
+            line += f", chi {spent:,} / thu {income:,} {config.CURRENCY}"
+        print(line)
+        if sample:
+            print(f"      header: {ws.get('header', [])}")
+            print(f"      last:   {ws.get('last_row', [])}")
+
+
+def cmd_sheets(args):
+    client = sheets_client.get_client()
+    http = client.http_client
+    files = client.list_spreadsheet_files(None if args.all else config.GOOGLE_SHEET_NAME)
+    if not args.all:
+        files = [f for f in files if f["name"] == config.GOOGLE_SHEET_NAME]
+    if not files:
+        print("No spreadsheets found!")
+        return 1
+
+    registry = schema.SchemaRegistry(os.path.join(config.DATA_DIR, "schema.json"))
+    for file in files:
+        # The local registry describes the bot's own spreadsheet only
+        title, worksheets = inventory(client, file["id"], registry if file["name"] == config.GOOGLE_SHEET_NAME else None)
+        if args.sample or (args.totals and any(ws["columns"] is None for ws in worksheets)):
+            load_headers(http, file["id"], worksheets)
+        if args.sample:
+            load_samples(http, file["id"], worksheets)
+        if args.totals:
+            with ThreadPoolExecutor(max_workers=config.HISTORY_FETCH_WORKERS) as pool:
+                results = pool.map(lambda ws: worksheet_totals(http, file["id"], ws), worksheets)
+                for ws, result in zip(worksheets, results):
+                    ws["totals"] = result
+        print_inventory(title, worksheets, args.sample, args.totals)
+    return 0
+
+
+def _backup_store():
+    return backup.BackupStore(os.path.join(config.DATA_DIR, "backups"))
+
+
+def _open_spreadsheet():
+    return sheets_client.get_client().open(config.GOOGLE_SHEET_NAME)
+
+
+def cmd_backup(args):
+    store = _backup_store()
+    name, changed, removed = backup.run_backup(_open_spreadsheet(), store)
+    print(f"Backup {name}: re-read {len(changed)} worksheets, removed {removed} unused objects")
+    for title in changed:
+        print(f"  - {title}")
+    return 0
+
+
+def cmd_backups(args):
+    store = _backup_store()
+    names = store.manifests()
+    if not names:
+        print("No backups yet.")
+        return 0
+    for name in names:
+        manifest = store.load_manifest(name)
+        rows = sum(entry["rows"] for entry in manifest["worksheets"].values())
+        print(f"  {name}: {len(manifest['worksheets'])} worksheets, {rows} rows")
+    return 0
+
+
+def cmd_restore(args):
+    title = f"{config.GOOGLE_SHEET_NAME} {args.month}"
+    target, rows = backup.restore_worksheet(_open_spreadsheet(), _backup_store(), args.at, title, args.into)
+    print(f"Restored {rows} rows of '{title}' into '{target}'")
+    if target == title:
+        print("The live month was overwritten: restart the bot so its caches are rebuilt.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Expense spreadsheet admin tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sheets = sub.add_parser("sheets", help="List worksheets from spreadsheet metadata")
+    sheets.add_argument("--all", action="store_true", help="every accessible spreadsheet, not only GOOGLE_SHEET_NAME")
+    sheets.add_argument("--sample", action="store_true", help="show the header and last row of each worksheet")
+    sheets.add_argument("--totals", action="store_true", help="sum spent/income per worksheet (parallel reads)")
+    sheets.set_defaults(func=cmd_sheets)
+
+    sub.add_parser("backup", help="Back up changed month worksheets now").set_defaults(func=cmd_backup)
+    sub.add_parser("backups", help="List backup manifests").set_defaults(func=cmd_backups)
+
+    restore = sub.add_parser("restore", help="Restore a month worksheet from a backup")
+    restore.add_argument("month", help="month as mm/yyyy")
+    restore.add_argument("--at", help="manifest name from 'backups' (default: latest)")
+    restore.add_argument("--into", help="target worksheet title (default: a new '<month> (backup ...)' worksheet)")
+    restore.set_defaults(func=cmd_restore)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
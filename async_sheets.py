@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from urllib.parse import quote
+
+import httpx
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsAPIError(Exception):
+    """Non-2xx answer from the Sheets REST API."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def a1(title, cells):
+    """'Title'!cells with the title quoted the way the Sheets API expects."""
+    return "'{}'!{}".format(title.replace("'", "''"), cells)
+
+
+class AsyncSheetsClient:
+    """Minimal asyncio client for the Sheets v4 values/batchUpdate endpoints.
+
+    Runs on the caller's event loop over one pooled httpx connection set,
+    so concurrent calls cost sockets instead of threads. Authentication
+    reuses the service account from sheets_client; the token refresh (rare,
+    blocking) is pushed to a thread. With credentials=None no Authorization
+    header is sent, which is what sheets_standin.py expects.
+    """
+
+    def __init__(self, spreadsheet_id, base_url=None, credentials=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.base_url = (base_url or config.SHEETS_API_URL).rstrip("/")
+        self.credentials = credentials
+        self._http = None
+        self._refresh_lock = None
+
+    def _client(self):
+        # Created lazily so the pool binds to the running application loop
+        if self._http is None:
+            limits = httpx.Limits(max_connections=config.SHEETS_POOL_SIZE,
+                                  max_keepalive_connections=config.SHEETS_POOL_SIZE)
+            self._http = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30.0)
+        return self._http
+
+    async def _headers(self):
+        if self.credentials is None:
+            return {}
+        if not self.credentials.valid:
+            if self._refresh_lock is None:
+                self._refresh_lock = asyncio.Lock()
+            async with self._refresh_lock:
+                if not self.credentials.valid:
+                    from google.auth.transport.requests import Request
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def _request(self, method, path, params=None, body=None):
+        url = f"/v4/spreadsheets/{self.spreadsheet_id}{path}"
+        response = await self._client().request(method, url, params=params, json=body, headers=await self._headers())
+        if response.status_code >= 300:
+            try:
+                message = response.json().get("error", {}).get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise SheetsAPIError(response.status_code, message)
+        return response.json() if response.content else {}
+
+    async def get(self, range_name, value_render_option="FORMATTED_VALUE"):
+        """Rows of one range (trailing empty rows and cells omitted, as in the API)."""
+        data = await self._request("GET", f"/values/{quote(range_name, safe='')}",
+                                   params={"valueRenderOption": value_render_option})
+        return data.get("values", [])
+
+    async def batch_get(self, ranges, value_render_option="FORMATTED_VALUE"):
+        """Rows of several ranges in one call, in request order."""
+        data = await self._request("GET", "/values:batchGet",
+                                   params=[("ranges", r) for r in ranges] + [("valueRenderOption", value_render_option)])
+        return [vr.get("values", []) for vr in data.get("valueRanges", [])]
+
+    async def append(self, range_name, rows, value_input_option="USER_ENTERED"):
+        """Append rows after the table found in range_name; returns the API response
+        (its updates.updatedRange tells where the rows landed)."""
+        return await self._request("POST", f"/values/{quote(range_name, safe='')}:append",
+                                   params={"valueInputOption": value_input_option, "insertDataOption": "INSERT_ROWS"},
+                                   body={"values": rows})
+
+    async def values_batch_update(self, data, value_input_option="USER_ENTERED"):
+        """Write several ranges in one call; data is [{"range": ..., "values": [[...]]}, ...]."""
+        return await self._request("POST", "/values:batchUpdate",
+                                   body={"valueInputOption": value_input_option, "data": data})
+
+    async def batch_update(self, requests):
+        """Structural spreadsheets.batchUpdate (deleteRange, addSheet, ...)."""
+        return await self._request("POST", ":batchUpdate", body={"requests": requests})
+
+    async def find(self, title, column_letter, value):
+        """1-based row of the first cell in the column equal to value, or None.
+
+        The API has no search endpoint; like gspread's find this downloads
+        the column, but only that one column.
+        """
+        rows = await self.get(a1(title, f"{column_letter}:{column_letter}"))
+        for index, row in enumerate(rows, start=1):
+            if row and str(row[0]) == str(value):
+                return index
+        return None
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows: concurrent runs are not locked against each other
+    fcntl = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Rows per stored object: appending to a month only rewrites its last chunk
+CHUNK_ROWS = 500
+# K1:L1 legacy total plus the summary block's rows-written (L2), live total (L3) and checksum (L4)
+FINGERPRINT_CELLS = "L1:L4"
+
+
+def _a1(title, rng=None):
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{rng}" if rng else quoted
+
+
+def is_month_title(title):
+    """True for the bot's '<name> mm/yyyy' worksheets."""
+    prefix = f"{config.GOOGLE_SHEET_NAME} "
+    return title.startswith(prefix) and re.fullmatch(r'\d{2}/\d{4}', title[len(prefix):]) is not None
+
+
+class BackupStore:
+    """Content-addressed archive of worksheet contents on local disk.
+
+        objects/<sha256>.gz     gzipped JSON list of up to CHUNK_ROWS rows
+        manifests/<stamp>.json  {"created": ..., "worksheets": {title: {"fingerprint", "rows", "chunks", "fetched"}}}
+
+    Objects are named by the hash of their content, so identical chunks of
+    different runs (or months) are stored once; a manifest is a complete
+    point-in-time view even when most of its chunks were written earlier.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.manifests_dir = os.path.join(directory, "manifests")
+
+    @contextmanager
+    def locked(self):
+        """Exclusive flock over the archive, so the bot's job and the admin CLI never
+        prune objects that a concurrent run is about to reference."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "backup.lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_rows(self, rows):
+        """Store rows as chunks; returns their hashes (only new chunks touch the disk)."""
+        hashes = []
+        for start in range(0, len(rows), CHUNK_ROWS):
+            raw = json.dumps(rows[start:start + CHUNK_ROWS], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            digest = hashlib.sha256(raw).hexdigest()
+            path = os.path.join(self.objects_dir, f"{digest}.gz")
+            if not os.path.exists(path):
+                self._write_atomic(path, gzip.compress(raw, mtime=0))
+            hashes.append(digest)
+        return hashes
+
+    def get_rows(self, hashes):
+        rows = []
+        for digest in hashes:
+            with open(os.path.join(self.objects_dir, f"{digest}.gz"), "rb") as f:
+                raw = gzip.decompress(f.read())
+            if hashlib.sha256(raw).hexdigest() != digest:
+                raise ValueError(f"Backup object {digest} is corrupted")
+            rows.extend(json.loads(raw))
+        return rows
+
+    def manifests(self):
+        """Manifest names, oldest first."""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.manifests_dir) if name.endswith(".json"))
+
+    def load_manifest(self, name=None):
+        """A manifest by name, or the latest one; None when there is none."""
+        if name is None:
+            names = self.manifests()
+            if not names:
+                return None
+            name = names[-1]
+        path = os.path.join(self.manifests_dir, f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(manifest["created"]))
+        data = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+        self._write_atomic(os.path.join(self.manifests_dir, f"{name}.json"), data)
+        return name
+
+    def prune(self, keep):
+        """Drop all but the newest `keep` manifests and the objects no remaining manifest uses."""
+        names = self.manifests()
+        for name in names[:-keep] if keep else []:
+            os.remove(os.path.join(self.manifests_dir, f"{name}.json"))
+        referenced = set()
+        for name in self.manifests():
+            for entry in self.load_manifest(name)["worksheets"].values():
+                referenced.update(entry["chunks"])
+        removed = 0
+        if os.path.isdir(self.objects_dir):
+            for filename in os.listdir(self.objects_dir):
+                if filename.endswith(".gz") and filename[:-3] not in referenced:
+                    os.remove(os.path.join(self.objects_dir, filename))
+                    removed += 1
+        return removed
+
+
+def backup_spreadsheet(spreadsheet, store, full_every_days=None):
+    """Incremental backup of the month worksheets; returns (manifest name, refetched titles).
+
+    API calls: one metadata fetch, one batch read of every month's L1:L4
+    and, only if something changed, one batch read of the changed months.
+    A month is refetched when its fingerprint differs from the last
+    manifest, when it has no summary block (no row count to compare), or
+    when its stored copy is older than full_every_days, as a safety net for
+    edits beyond the checksum's CHECKSUM_WIDTH characters of a row.
+    """
+    full_every = (full_every_days or config.BACKUP_FULL_EVERY_DAYS) * 86400
+    previous = (store.load_manifest() or {}).get("worksheets", {})
+    titles = [ws.title for ws in spreadsheet.worksheets() if is_month_title(ws.title)]
+    now = time.time()
+
+    fingerprints = {}
+    if titles:
+        response = spreadsheet.values_batch_get([_a1(t, FINGERPRINT_CELLS) for t in titles],
+                                                params={"valueRenderOption": "UNFORMATTED_VALUE"})
+        for title, value_range in zip(titles, response.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            fingerprints[title] = [row[0] if row else None for row in values] + [None] * (4 - len(values))
+
+    changed = []
+    for title in titles:
+        old = previous.get(title)
+        fingerprint = fingerprints.get(title)
+        if (old is None or fingerprint is None or fingerprint[1] is None
+                or old["fingerprint"] != fingerprint or now - old.get("fetched", 0) > full_every):
+            changed.append(title)
+
+    entries = {title: previous[title] for title in titles if title not in changed}
+    if changed:
+        # FORMULA keeps the K1:L1 and summary formulas restorable as formulas; dates and
+        # times come back as the text shown in the sheet instead of serial numbers
+        response = spreadsheet.values_batch_get([_a1(t) for t in changed], params={
+            "valueRenderOption": "FORMULA", "dateTimeRenderOption": "FORMATTED_STRING"})
+        for title, value_range in zip(changed, response.get("valueRanges", [])):
+            rows = value_range.get("values", [])
+            entries[title] = {
+                "fingerprint": fingerprints.get(title),
+                "rows": len(rows),
+                "chunks": store.put_rows(rows),
+                "fetched": now,
+            }
+
+    name = store.save_manifest({"created": now, "spreadsheet": config.GOOGLE_SHEET_NAME, "worksheets": entries})
+    return name, changed
+
+
+def run_backup(spreadsheet, store, keep=None):
+    """Backup plus retention under the store lock; returns (manifest name, refetched titles, objects removed)."""
+    with store.locked():
+        name, changed = backup_spreadsheet(spreadsheet, store)
+        removed = store.prune(keep or config.BACKUP_KEEP)
+    return name, changed, removed
+
+
+def restore_worksheet(spreadsheet, store, manifest_name, title, target_title=None):
+    """Write a month as it was in a manifest into target_title (default: a new
+    '<title> (backup <manifest>)' worksheet, leaving the live month alone).
+    An existing target worksheet is cleared first. Returns (target title, rows written)."""
+    with store.locked(): # a concurrent prune must not drop the chunks being read
+        manifest = store.load_manifest(manifest_name)
+        if manifest is None:
+            raise ValueError(f"No backup manifest {manifest_name or '(none yet)'}")
+        entry = manifest["worksheets"].get(title)
+        if entry is None:
+            raise ValueError(f"'{title}' is not in backup {manifest_name or 'latest'}")
+        rows = store.get_rows(entry["chunks"])
+    target_title = target_title or f"{title} (backup {time.strftime('%Y%m%d-%H%M%S', time.localtime(manifest['created']))})"
+
+    existing = {ws.title: ws for ws in spreadsheet.worksheets()}
+    if target_title in existing:
+        worksheet = existing[target_title]
+        worksheet.clear()
+    else:
+        width = max((len(row) for row in rows), default=1)
+        worksheet = spreadsheet.add_worksheet(title=target_title, rows=max(len(rows) + 100, 1000), cols=max(width, 15))
+    if rows:
+        worksheet.update(range_name="A1", values=rows, value_input_option="USER_ENTERED")
+    return target_title, len(rows)
@@ -1,21 +1,37 @@
 import logging
 import asyncio
+import functools
 from datetime import datetime, timedelta, time, date
 import re
 import matplotlib.pyplot as plt
 import io
 import os
+import tempfile
 import pytz
 
 # Config Vietnam Timezone
 vn_tz = pytz.timezone('Asia/Ho_Chi_Minh')
 
 from telegram import Update, ReplyKeyboardRemove
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes
 
 import config
 from expense_manager import ExpenseManager
+from notifier import Broadcaster
+from pagination import CALLBACK_PREFIX, ReportPaginator, render_expense_lines
+from budgets import ALL_PERSONS
+import backup
+import importer
+import leader
+import recurring
+from profiler import HandlerProfiler
+from response_cache import ResponseCache
+import snapshot
+from categories import EXPENSE_CATEGORIES, classify_expense
+from trends import build_pivot, format_trend, parse_mode, period_count, render_trend_chart
+import keep_alive as keep_alive_server
 from keep_alive import keep_alive  # Import keep_alive server
+from work_queue import Busy, ChatWorkQueues
 
 # Enable logging
 logging.basicConfig(
@@ -24,7 +40,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-expense_mgr = ExpenseManager()
+# Read-only until main() settles leadership: followers must not create or migrate worksheets
+expense_mgr = ExpenseManager(read_only=True)
+broadcaster = Broadcaster()
+paginator = ReportPaginator()
+profiler = HandlerProfiler()
+# Rendered /month, /week, /stats, /person replies keyed by the month's data version
+response_cache = ResponseCache()
+# Per-chat ordered handling with a global concurrency cap and load shedding
+work_queues = ChatWorkQueues()
+recurring_store = recurring.RecurringStore(os.path.join(config.DATA_DIR, "recurring.json"))
+
+# Several instances can overlap during redeploys: only the lease holder runs jobs and writes to Sheets,
+# followers forward new expenses through the spool
+lease = leader.Lease(leader.FileLeaseStore(os.path.join(config.DATA_DIR, "lease")))
+write_spool = leader.WriteSpool(os.path.join(config.DATA_DIR, "spool"))
 
 # Track processed updates to prevent duplicates
 processed_updates = set()
@@ -34,22 +64,67 @@ update_lock = asyncio.Lock()
 # Logic: Simple, Telegram-only, resets daily
 today_cache = {
     'date': None, # Format: YYYY-MM-DD
-    'items': []   # List of dicts: {'amount': int, 'desc': str}
+    'items': []   # List of dicts: {'amount': int, 'desc': str, 'id': expense ID}
 }
 
+# Warm state (month frames, dedupe IDs, today's ledger) kept across restarts
+SNAPSHOT_PATH = os.path.join(config.DATA_DIR, "snapshot.pkl")
+# Content-addressed archive written by the nightly backup job
+backup_store = backup.BackupStore(os.path.join(config.DATA_DIR, "backups"))
+
 def authorized_only(func):
     """Decorator to check if the user is authorized."""
+    @functools.wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         if user_id not in config.AUTHORIZED_USER_IDS:
-            await update.message.reply_text("⛔ Bạn không có quyền sử dụng bot này.")
+            if update.callback_query:
+                await update.callback_query.answer("⛔ Bạn không có quyền sử dụng bot này.")
+            else:
+                await update.message.reply_text("⛔ Bạn không có quyền sử dụng bot này.")
+            return
+
+        async def handle():
+            if profiler.active:
+                return await profiler.run(func.__name__, lambda: func(update, context), context.bot)
+            return await func(update, context)
+
+        if not update.effective_chat:
+            return await handle()
+        try:
+            return await work_queues.run(update.effective_chat.id, handle)
+        except Busy:
+            logger.warning(f"Shed update {update.update_id} from chat {update.effective_chat.id}")
+            if update.callback_query:
+                await update.callback_query.answer("⏳ Bot đang bận, vui lòng thử lại sau giây lát.")
+            elif update.message:
+                await update.message.reply_text("⏳ Bot đang bận, vui lòng thử lại sau giây lát.")
+    return wrapper
+
+def leader_only(func):
+    """Decorator for scheduled jobs: followers skip the run."""
+    @functools.wraps(func)
+    async def wrapper(context: ContextTypes.DEFAULT_TYPE):
+        if not lease.is_leader:
+            logger.info(f"Skipping {func.__name__}: not the leader")
+            return
+        return await func(context)
+    return wrapper
+
+FOLLOWER_REPLY = "⏳ Bot đang chuyển phiên bản, vui lòng thử lại sau ít phút."
+
+def leader_writes(func):
+    """Decorator for commands that rewrite Sheets data: followers ask the user to retry."""
+    @functools.wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not lease.is_leader:
+            await update.message.reply_text(FOLLOWER_REPLY)
             return
         return await func(update, context)
     return wrapper
 
-@authorized_only
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send a message when the command /start is issued."""
+async def send_help(update: Update):
+    """Reply with the usage guide (shared by /start and /help, outside the chat queue)."""
     help_text = (
         "👋 Chào mừng bạn đến với Bot Quản Lý Chi Tiêu!\n\n"
         "Cơ chế nhập liệu:\n"
@@ -64,16 +139,28 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/search <từ khóa> - Tìm kiếm\n"
         "/edit <id> <tiền> <mô tả> - Sửa\n"
         "/delete <id> - Xóa\n"
+        "/undo - Khôi phục giao dịch vừa xóa\n"
         "/person <tên> - Xem chi tiêu theo người\n"
+        "/trend [tháng|năm|người] [số kỳ] - Xu hướng nhiều tháng/năm\n"
+        "/budget <tiền> <danh mục> [@người] - Đặt ngân sách tháng\n"
+        "/recurring - Giao dịch định kỳ (thuê nhà, lương...)\n"
+        "/reclassify [apply] - Phân loại lại theo quy tắc mới\n"
+        "Gửi file sao kê CSV/XLSX để nhập hàng loạt\n"
         "/help - Xem lại hướng dẫn này"
     )
     # Remove Mini App button, restore default keyboard (none)
     await update.message.reply_text(help_text, parse_mode='Markdown', reply_markup=ReplyKeyboardRemove())
 
+@authorized_only
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a message when the command /start is issued."""
+    await send_help(update)
+
 @authorized_only
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /help is issued."""
-    await start(update, context)
+    # Not start(): the chat's queue slot is already held by this update
+    await send_help(update)
 
 @authorized_only
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -143,8 +230,15 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             today_cache['date'] = today_str
             today_cache['items'] = []
 
+        if not lease.is_leader:
+            await spool_expense(update, amount, description, person, record_date, today_str)
+            return
+
         # Use update_id as a unique identifier to prevent double-processing across instances
-        record = expense_mgr.add_expense(amount, description, person=person, date=record_date, force_id=update.update_id)
+        if config.SHEETS_BACKEND == "async":
+            record = await expense_mgr.add_expense_async(amount, description, person=person, date=record_date, force_id=update.update_id)
+        else:
+            record = await asyncio.to_thread(expense_mgr.add_expense, amount, description, person=person, date=record_date, force_id=update.update_id)
 
         # If this update was already processed (is_duplicate=True), we stop here
         # to avoid double-summing in the cache and sending double replies.
@@ -152,8 +246,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.info(f"Deduplication triggered: Update {update.update_id} already in sheet. Ignoring.")
             return
 
+        # Record in today's ledger (income positive, spending negative)
+        if record_date_str == today_str:
+            signed = amount if record['Danh mục'] == "Thu nhập" else -amount
+            today_cache['items'].append({'amount': signed, 'desc': description, 'id': str(record['ID'])})
+
         # Always fetch monthly summary for the recorded month to show "Tổng bù trừ"
-        summary = expense_mgr.get_monthly_summary(month=record_date.month, year=record_date.year)
+        summary = await asyncio.to_thread(expense_mgr.get_monthly_summary, month=record_date.month, year=record_date.year)
         
         display_balance = ""
         if summary:
@@ -179,10 +278,44 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"📅 ID: `{record['ID']}`"
         )
         await update.message.reply_text(response, parse_mode='Markdown')
+
+        # Budget alerts from the maintained running totals; the expense is already saved,
+        # so a failure here must not be reported as a failed save
+        try:
+            for alert in await asyncio.to_thread(expense_mgr.check_budgets, record_date, record['Danh mục'], record['Người'], amount):
+                await update.message.reply_text(format_budget_alert(*alert), parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Error checking budgets: {e}")
     except Exception as e:
         logger.error(f"Error recording expense: {e}")
         await update.message.reply_text("❌ Có lỗi xảy ra khi lưu dữ liệu.")
 
+async def spool_expense(update, amount, description, person, record_date, today_str):
+    """Follower path: queue the expense for the leader instead of writing to Sheets."""
+    category = classify_expense(description)
+    write_spool.put({
+        "ID": str(update.update_id),
+        "amount": amount,
+        "description": description,
+        "person": person,
+        "category": category,
+        "date": record_date.replace(tzinfo=None),
+    })
+    if record_date.strftime("%Y-%m-%d") == today_str:
+        signed = amount if category == "Thu nhập" else -amount
+        today_cache['items'].append({'amount': signed, 'desc': description, 'id': str(update.update_id)})
+    sign = "➕" if category == "Thu nhập" else "➖"
+    await update.message.reply_text(
+        f"✅ **Đã nhận!** (sẽ ghi vào Sheets trong giây lát)\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n"
+        f"👤 Người: {person}\n"
+        f"💰 Số tiền: {sign} {amount:,} {config.CURRENCY}\n"
+        f"📂 Danh mục: {category}\n"
+        f"📝 Mô tả: {description}\n"
+        f"📅 ID: `{update.update_id}`",
+        parse_mode='Markdown'
+    )
+
 @authorized_only
 async def view_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """View today's expenses using the internal cache."""
@@ -224,32 +357,42 @@ async def view_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
     now = datetime.now(vn_tz)
     start_of_week = now - timedelta(days=now.weekday())
     start_of_week = datetime(start_of_week.year, start_of_week.month, start_of_week.day)
-    df = expense_mgr.get_expenses(start_date=start_of_week, end_date=now)
-    
-    # Calculate Income vs Spent
-    income_df = df[df['Danh mục'] == "Thu nhập"]
-    spent_df = df[df['Danh mục'] != "Thu nhập"]
-    
-    total_income = income_df['Số tiền'].sum()
-    total_spent = spent_df['Số tiền'].sum()
-    net = total_income - total_spent
+    versions = (expense_mgr.data_version(start_of_week.year, start_of_week.month), expense_mgr.data_version(now.year, now.month))
+    key = ("week", (start_of_week.date(), now.date()), None, versions)
+    cached = response_cache.get(key)
+    if cached:
+        await send_paginated(update, *cached)
+        return
 
-    report = "📅 **Tài chính tuần này:**\n\n"
-    for _, row in df.iterrows():
-        sign = "➕" if row['Danh mục'] == "Thu nhập" else "➖"
-        report += f"{sign} {row['Ngày']} - {row['Số tiền']:,} đ: {row['Mô tả']}\n"
+    df = await asyncio.to_thread(expense_mgr.get_expenses, start_date=start_of_week, end_date=now)
     
-    report += "━━━━━━━━━━━━━━━━━━━━\n"
-    report += f"➕ Tổng Thu: {total_income:,} đ\n"
-    report += f"➖ Tổng Chi: {total_spent:,} đ\n"
-    report += f"💰 **Số dư: {net:,} {config.CURRENCY}**"
-    await update.message.reply_text(report, parse_mode='Markdown')
+    # Income vs Spent from the pre-aggregated rollup
+    totals = await asyncio.to_thread(expense_mgr.get_period_summary, start_of_week, now)
+    total_income = totals['income']
+    total_spent = totals['total_spent']
+    net = totals['net']
+
+    header = "📅 **Tài chính tuần này:**\n\n"
+    footer = "━━━━━━━━━━━━━━━━━━━━\n"
+    footer += f"➕ Tổng Thu: {total_income:,} đ\n"
+    footer += f"➖ Tổng Chi: {total_spent:,} đ\n"
+    footer += f"💰 **Số dư: {net:,} {config.CURRENCY}**"
+    lines = render_expense_lines(df)
+    response_cache.put(key, (header, lines, footer))
+    await send_paginated(update, header, lines, footer)
 
 
 @authorized_only
 async def view_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """View this month's summary."""
-    summary = expense_mgr.get_monthly_summary()
+    now = datetime.now(vn_tz)
+    key = ("month", (now.year, now.month), None, expense_mgr.data_version(now.year, now.month))
+    cached = response_cache.get(key)
+    if cached:
+        await update.message.reply_text(cached, parse_mode='Markdown')
+        return
+
+    summary = await asyncio.to_thread(expense_mgr.get_monthly_summary, month=now.month, year=now.year)
     if not summary:
         await update.message.reply_text("📅 Tháng này chưa có dữ liệu chi tiêu.")
         return
@@ -269,12 +412,21 @@ async def view_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
     report += f"➖ Tổng chi: {summary['total_spent']:,} {config.CURRENCY}\n"
     report += f"💰 **Số dư tháng: {summary['net']:,} {config.CURRENCY}**"
     
+    response_cache.put(key, report)
     await update.message.reply_text(report, parse_mode='Markdown')
 
 @authorized_only
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Generate and send a pie chart of monthly expenses."""
-    summary = expense_mgr.get_monthly_summary()
+    """Generate and send a pie chart of monthly expenses (re-sent by file_id while unchanged)."""
+    now = datetime.now(vn_tz)
+    caption = f"📊 Biểu đồ chi tiêu tháng {now.month}/{now.year}"
+    key = ("stats", (now.year, now.month), None, expense_mgr.data_version(now.year, now.month))
+    cached = response_cache.get(key)
+    if cached:
+        await update.message.reply_photo(photo=cached, caption=caption)
+        return
+
+    summary = await asyncio.to_thread(expense_mgr.get_monthly_summary, month=now.month, year=now.year)
     if not summary:
         await update.message.reply_text("📅 Không có dữ liệu để tạo biểu đồ.")
         return
@@ -293,18 +445,19 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     buf.seek(0)
     plt.close()
     
-    await update.message.reply_photo(photo=buf, caption=f"📊 Biểu đồ chi tiêu tháng {summary['month']}/{summary['year']}")
+    message = await update.message.reply_photo(photo=buf, caption=caption)
+    if message and message.photo:
+        response_cache.put(key, message.photo[-1].file_id)
 
 
 @authorized_only
 async def recent_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show last 10 transactions."""
-    df = expense_mgr.get_expenses()
-    if df.empty:
+    recent = await asyncio.to_thread(expense_mgr.get_recent_expenses, 10)
+    if recent.empty:
         await update.message.reply_text("📅 Chưa có dữ liệu chi tiêu.")
         return
         
-    recent = df.tail(10)
     report = "🕒 **10 Giao dịch gần nhất:**\n\n"
     for _, row in recent.iloc[::-1].iterrows(): # Reverse to show newest first
         report += f"ID: `{row['ID']}` | {row['Số tiền']:,} đ | {row['Mô tả']}\n"
@@ -312,6 +465,7 @@ async def recent_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(report, parse_mode='Markdown')
 
 @authorized_only
+@leader_writes
 async def delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Delete an expense record by ID."""
     if not context.args:
@@ -320,14 +474,32 @@ async def delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         expense_id = int(context.args[0])
-        if expense_mgr.delete_expense(expense_id):
-            await update.message.reply_text(f"✅ Đã xóa giao dịch ID: `{expense_id}`", parse_mode='Markdown')
+        if config.SHEETS_BACKEND == "async":
+            deleted = await expense_mgr.delete_expense_async(expense_id, actor=update.effective_user.id)
+        else:
+            deleted = await asyncio.to_thread(expense_mgr.delete_expense, expense_id, actor=update.effective_user.id)
+        if deleted:
+            await update.message.reply_text(f"✅ Đã xóa giao dịch ID: `{expense_id}` (gõ /undo để khôi phục)", parse_mode='Markdown')
         else:
             await update.message.reply_text("❌ Không tìm thấy giao dịch với ID này.")
     except ValueError:
         await update.message.reply_text("❌ ID không hợp lệ.")
 
 @authorized_only
+@leader_writes
+async def undo_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Restore the user's most recently deleted expense."""
+    record = await asyncio.to_thread(expense_mgr.undo_delete, actor=update.effective_user.id)
+    if not record:
+        await update.message.reply_text("❌ Không có giao dịch nào để khôi phục.")
+        return
+    await update.message.reply_text(
+        f"↩️ Đã khôi phục ID: `{record['ID']}` | {record['Số tiền']:,} đ | {record['Mô tả']}",
+        parse_mode='Markdown'
+    )
+
+@authorized_only
+@leader_writes
 async def edit_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Edit an expense record: /edit <id> <amount> <description>"""
     if len(context.args) < 2:
@@ -339,19 +511,17 @@ async def edit_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
         amount_str = context.args[1]
         
         # Handle k/m suffixes in edit
-        amount = 0
-        match = re.match(r'^(\d+)(k|m|K|M)?$', amount_str)
-        if match:
-            amount = int(match.group(1))
-            suffix = match.group(2)
-            if suffix and suffix.lower() == 'k': amount *= 1000
-            elif suffix and suffix.lower() == 'm': amount *= 1000000
-        else:
+        amount = parse_amount(amount_str)
+        if amount is None:
             amount = int(amount_str)
 
         description = " ".join(context.args[2:]) if len(context.args) > 2 else None
         
-        if expense_mgr.edit_expense(expense_id, new_amount=amount, new_description=description):
+        if config.SHEETS_BACKEND == "async":
+            edited = await expense_mgr.edit_expense_async(expense_id, new_amount=amount, new_description=description)
+        else:
+            edited = await asyncio.to_thread(expense_mgr.edit_expense, expense_id, new_amount=amount, new_description=description)
+        if edited:
             await update.message.reply_text(f"✅ Đã cập nhật giao dịch ID: `{expense_id}`", parse_mode='Markdown')
         else:
             await update.message.reply_text("❌ Không tìm thấy giao dịch với ID này.")
@@ -366,22 +536,45 @@ async def search_items(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     keyword = " ".join(context.args).lower()
-    df = expense_mgr.get_expenses()
+    df = await asyncio.to_thread(expense_mgr.get_expenses)
     if df.empty:
         await update.message.reply_text("📅 Chưa có dữ liệu để tìm kiếm.")
         return
         
-    results = df[df['Mô tả'].str.lower().str.contains(keyword) | df['Danh mục'].str.lower().str.contains(keyword)]
+    results = df[df['Mô tả'].str.lower().str.contains(keyword, regex=False) | df['Danh mục'].str.lower().str.contains(keyword, regex=False)]
     
     if results.empty:
         await update.message.reply_text(f"❌ Không tìm thấy kết quả cho: `{keyword}`", parse_mode='Markdown')
         return
         
-    report = f"🔍 **Kết quả tìm kiếm cho '{keyword}':**\n\n"
-    for _, row in results.tail(15).iterrows(): # Show last 15 matches
-        report += f"• {row['Ngày']} | ID: `{row['ID']}` | {row['Số tiền']:,} đ | {row['Mô tả']}\n"
-        
-    await update.message.reply_text(report, parse_mode='Markdown')
+    header = f"🔍 **Kết quả tìm kiếm cho '{keyword}' ({len(results)}):**\n\n"
+    await send_paginated(update, header, render_expense_lines(results, with_id=True))
+
+async def send_paginated(update: Update, header, lines, footer=""):
+    """Reply with the first page of a report; further pages are served from the paginator cache."""
+    cursor, total = paginator.create(header, lines, footer)
+    text, _ = paginator.get(cursor, 0)
+    await update.message.reply_text(text, parse_mode='Markdown', reply_markup=paginator.keyboard(cursor, 0, total))
+
+@authorized_only
+async def paginate_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the prev/next inline buttons of paginated reports."""
+    query = update.callback_query
+    try:
+        _, cursor, page = query.data.split(":")
+        page = int(page)
+    except ValueError:
+        await query.answer()
+        return
+
+    result = paginator.get(cursor, page)
+    if result is None:
+        await query.answer("⌛ Kết quả đã hết hạn, vui lòng chạy lại lệnh.", show_alert=True)
+        return
+
+    text, total = result
+    await query.answer()
+    await query.edit_message_text(text, parse_mode='Markdown', reply_markup=paginator.keyboard(cursor, page, total))
 
 @authorized_only
 async def view_by_person(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -391,9 +584,16 @@ async def view_by_person(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     person = " ".join(context.args)
-    summary = expense_mgr.get_monthly_summary(person=person)
+    now = datetime.now(vn_tz)
+    key = ("person", (now.year, now.month), person.strip().lower(), expense_mgr.data_version(now.year, now.month))
+    cached = response_cache.get(key)
+    if cached:
+        await update.message.reply_text(cached, parse_mode='Markdown')
+        return
+
+    summary = await asyncio.to_thread(expense_mgr.get_monthly_summary, month=now.month, year=now.year, person=person)
     
-    if not summary or summary['total'] == 0:
+    if not summary or summary['total_spent'] == 0:
         await update.message.reply_text(f"📅 Tháng này chưa có chi tiêu của {person}.")
         return
         
@@ -401,19 +601,303 @@ async def view_by_person(update: Update, context: ContextTypes.DEFAULT_TYPE):
     report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
     
     for cat, amt in summary['categories'].items():
-        percent = (amt / summary['total']) * 100
+        if cat == "Thu nhập": continue
+        percent = (amt / summary['total_spent']) * 100
         report += f"• {cat}: {amt:,} {config.CURRENCY} ({percent:.1f}%)\n"
         
     report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    report += f"💰 **TỔNG: {summary['total']:,} {config.CURRENCY}**"
+    report += f"💰 **TỔNG: {summary['total_spent']:,} {config.CURRENCY}**"
     
+    response_cache.put(key, report)
+    await update.message.reply_text(report, parse_mode='Markdown')
+
+def parse_amount(text):
+    """Parse '100', '100k' or '2m' into an int amount, or None."""
+    match = re.match(r'^(\d+)(k|m|K|M)?$', text)
+    if not match:
+        return None
+    amount = int(match.group(1))
+    suffix = match.group(2)
+    if suffix and suffix.lower() == 'k': amount *= 1000
+    elif suffix and suffix.lower() == 'm': amount *= 1000000
+    return amount
+
+def format_budget_alert(category, person, limit, spent, threshold):
+    icon = "🚨" if threshold >= 1 else "⚠️"
+    who = "" if person == ALL_PERSONS else f" ({person})"
+    return (
+        f"{icon} **Ngân sách {category}{who}:** đã dùng {spent:,}/{limit:,} {config.CURRENCY} "
+        f"({spent / limit * 100:.0f}%)"
+    )
+
+@authorized_only
+async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Monthly budgets: /budget, /budget <tiền> <danh mục> [@người], /budget xoa <danh mục> [@người]"""
+    args = list(context.args or [])
+    person = None
+    if args and args[-1].startswith("@"):
+        person = args.pop()[1:]
+
+    if not args:
+        items = expense_mgr.budgets.items()
+        if not items:
+            await update.message.reply_text(
+                "💼 Chưa có ngân sách nào.\nHD: `/budget 3m Ăn uống` hoặc `/budget 500k Xăng xe @vợ`\nXóa: `/budget xoa Ăn uống`",
+                parse_mode='Markdown'
+            )
+            return
+        report = "💼 **NGÂN SÁCH THÁNG NÀY**\n━━━━━━━━━━━━━━━━━━━━\n"
+        for category, who, limit in items:
+            spent = await asyncio.to_thread(expense_mgr.get_month_total, category, None if who == ALL_PERSONS else who)
+            label = category if who == ALL_PERSONS else f"{category} ({who})"
+            report += f"• {label}: {spent:,}/{limit:,} {config.CURRENCY} ({spent / limit * 100:.0f}%)\n"
+        await update.message.reply_text(report, parse_mode='Markdown')
+        return
+
+    if not lease.is_leader: # budgets.json is written by the leader only
+        await update.message.reply_text(FOLLOWER_REPLY)
+        return
+
+    remove = args[0].lower() in ("xoa", "xóa", "del")
+    amount = None if remove else parse_amount(args[0])
+    category_text = " ".join(args[1:]).strip().lower()
+    category = next((c for c in EXPENSE_CATEGORIES if c.lower() == category_text), None)
+    if (not remove and not amount) or not category:
+        await update.message.reply_text(
+            f"❌ Sai cú pháp hoặc danh mục không tồn tại.\nDanh mục: {', '.join(EXPENSE_CATEGORIES)}"
+        )
+        return
+
+    if remove:
+        if expense_mgr.budgets.remove(category, person):
+            await update.message.reply_text(f"🗑 Đã xóa ngân sách {category}.")
+        else:
+            await update.message.reply_text("❌ Không tìm thấy ngân sách này.")
+        return
+
+    expense_mgr.budgets.set(category, amount, person)
+    who = f" cho {person}" if person else ""
+    await update.message.reply_text(f"✅ Ngân sách {category}{who}: {amount:,} {config.CURRENCY}/tháng")
+
+@authorized_only
+async def recurring_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Recurring transactions: /recurring, /recurring add <lịch> <tham số> <tiền> <mô tả> [@người], /recurring xoa <id>"""
+    args = list(context.args or [])
+    usage = (
+        "🔁 HD:\n"
+        "`/recurring add thang 5 8m thuê nhà` - ngày 5 hàng tháng\n"
+        "`/recurring add tuan t2 200k đi chợ @vợ` - thứ 2 hàng tuần\n"
+        "`/recurring add ngay 14 300k internet` - mỗi 14 ngày\n"
+        "`/recurring xoa <id>` - xóa"
+    )
+
+    if not args:
+        rules = recurring_store.rules
+        if not rules:
+            await update.message.reply_text("🔁 Chưa có giao dịch định kỳ nào.\n\n" + usage, parse_mode='Markdown')
+            return
+        report = "🔁 **GIAO DỊCH ĐỊNH KỲ**\n━━━━━━━━━━━━━━━━━━━━\n"
+        for rule in rules:
+            report += f"#{rule['id']} | {rule['amount']:,} đ | {rule['description']} | {rule['person']} | {recurring.describe(rule)}\n"
+        await update.message.reply_text(report, parse_mode='Markdown')
+        return
+
+    if not lease.is_leader: # recurring.json is written by the leader only
+        await update.message.reply_text(FOLLOWER_REPLY)
+        return
+
+    action = args.pop(0).lower()
+    if action in ("xoa", "xóa", "del") and args and args[0].isdigit():
+        if recurring_store.remove(int(args[0])):
+            await update.message.reply_text(f"🗑 Đã xóa giao dịch định kỳ #{args[0]}.")
+        else:
+            await update.message.reply_text("❌ Không tìm thấy giao dịch định kỳ này.")
+        return
+
+    person = "Bản thân"
+    if args and args[-1].startswith("@"):
+        person = args.pop()[1:]
+    if action != "add" or len(args) < 4:
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+
+    kind, param_text, amount_text = args[0].lower(), args[1].lower(), args[2]
+    description = " ".join(args[3:])
+    amount = parse_amount(amount_text)
+    schedule, param = None, None
+    if kind in ("thang", "tháng") and param_text.isdigit() and 1 <= int(param_text) <= 31:
+        schedule, param = "monthly", int(param_text)
+    elif kind in ("tuan", "tuần") and param_text in recurring.WEEKDAY_NAMES:
+        schedule, param = "weekly", recurring.WEEKDAY_NAMES.index(param_text)
+    elif kind in ("ngay", "ngày") and param_text.isdigit() and int(param_text) > 0:
+        schedule, param = "every", int(param_text)
+
+    if not schedule or not amount:
+        await update.message.reply_text(usage, parse_mode='Markdown')
+        return
+
+    rule = recurring_store.add(schedule, param, amount, description, person=person, start=datetime.now(vn_tz).date())
+    await update.message.reply_text(
+        f"✅ Đã tạo #{rule['id']}: {amount:,} đ {description} ({recurring.describe(rule)})"
+    )
+    # Materialize right away in case today is already due
+    await run_recurring(context)
+
+@leader_only
+async def run_recurring(context: ContextTypes.DEFAULT_TYPE):
+    """Scheduled task: write all due recurring transactions, catching up on missed days."""
+    try:
+        written = await asyncio.to_thread(
+            recurring.materialize, recurring_store, expense_mgr, datetime.now(vn_tz).date()
+        )
+    except Exception as e:
+        logger.error(f"Error materializing recurring transactions: {e}")
+        return
+    if written:
+        logger.info(f"Recurring: wrote {len(written)} transactions")
+
+@authorized_only
+@leader_writes
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Import a CSV/XLSX bank statement sent as a document (caption may name a person: @vợ)."""
+    document = update.message.document
+    suffix = os.path.splitext(document.file_name or "")[1].lower()
+    caption = (update.message.caption or "").strip()
+    person = caption[1:] if caption.startswith("@") else "Bản thân"
+
+    status = await update.message.reply_text(f"📥 Đang nhập `{document.file_name}`...", parse_mode='Markdown')
+    loop = asyncio.get_running_loop()
+
+    def report_progress(read, written):
+        # Called from the worker thread after each chunk
+        asyncio.run_coroutine_threadsafe(
+            status.edit_text(f"📥 Đang nhập... đã đọc {read:,} dòng, ghi mới {written:,}"), loop
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"statement{suffix}")
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+        try:
+            read, written, skipped = await asyncio.to_thread(
+                importer.import_statement, path, expense_mgr, person, report_progress
+            )
+        except Exception as e:
+            logger.error(f"Error importing statement: {e}")
+            await status.edit_text(f"❌ Không nhập được file: {e}")
+            return
+
+    await status.edit_text(
+        f"✅ Nhập xong `{document.file_name}`\n"
+        f"• Đọc: {read:,} dòng\n"
+        f"• Ghi mới: {written:,}\n"
+        f"• Bỏ qua (trùng/không hợp lệ): {skipped:,}",
+        parse_mode='Markdown'
+    )
+
+@authorized_only
+@leader_writes
+async def reclassify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Re-run category rules on all rows: /reclassify (dry run) or /reclassify apply"""
+    apply = bool(context.args) and context.args[0].lower() in ("apply", "ap-dung", "áp-dụng")
+    await update.message.reply_text("⏳ Đang quét toàn bộ dữ liệu..." if not apply else "⏳ Đang phân loại lại...")
+    try:
+        result = await asyncio.to_thread(expense_mgr.reclassify, apply)
+    except Exception as e:
+        logger.error(f"Error reclassifying: {e}")
+        await update.message.reply_text("❌ Có lỗi xảy ra khi phân loại lại.")
+        return
+
+    changed = sum(result['sheets'].values())
+    title = "ĐÃ PHÂN LOẠI LẠI" if apply else "XEM TRƯỚC PHÂN LOẠI LẠI"
+    report = f"🏷 **{title}**\n━━━━━━━━━━━━━━━━━━━━\n"
+    report += f"• Đã quét: {result['rows']:,} dòng\n"
+    report += f"• {'Đã đổi' if apply else 'Sẽ đổi'}: {changed:,} dòng\n"
+    for (old, new), count in sorted(result['transitions'].items(), key=lambda kv: kv[1], reverse=True)[:15]:
+        report += f"  {old or '(trống)'} → {new}: {count:,}\n"
+    for sheet_title, count in result['sheets'].items():
+        report += f"• {sheet_title}: {count:,}\n"
+    if not apply and changed:
+        report += "\nGõ `/reclassify apply` để áp dụng."
+    await update.message.reply_text(report, parse_mode='Markdown')
+
+@authorized_only
+async def view_trend(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Multi-month trends: /trend [tháng|năm|người] [số kỳ]"""
+    args = context.args or []
+    mode = parse_mode(args[0]) if args and not args[0].isdigit() else "month"
+    if mode is None:
+        await update.message.reply_text("📈 HD: `/trend [tháng|năm|người] [số kỳ]`\nVí dụ: `/trend`, `/trend năm 5`, `/trend người 6`", parse_mode='Markdown')
+        return
+    # Clamped: /trend năm 3000 would otherwise ask for year -997
+    count = period_count(mode, next((int(a) for a in args if a.isdigit()), None))
+
+    now = datetime.now(vn_tz)
+    if mode == "year":
+        start_date = date(now.year - count + 1, 1, 1)
+        title = f"Chi tiêu theo năm ({count} năm)"
+    else:
+        months = now.year * 12 + now.month - 1 - (count - 1)
+        start_date = date(months // 12, months % 12 + 1, 1)
+        title = f"Chi tiêu theo {'người' if mode == 'person' else 'tháng'} ({count} tháng)"
+
+    await update.message.reply_text("⏳ Đang tổng hợp dữ liệu...")
+    df = await asyncio.to_thread(expense_mgr.get_history, start_date=start_date, end_date=now.date())
+    pivot, income = build_pivot(df, period="Y" if mode == "year" else "M", by="Người" if mode == "person" else "Danh mục")
+
+    report = format_trend(pivot, income, title)
+    if not report:
+        await update.message.reply_text("📅 Không có dữ liệu trong khoảng thời gian này.")
+        return
+
+    await update.message.reply_text(report, parse_mode='Markdown')
+    # Render off the event loop
+    chart = await asyncio.to_thread(render_trend_chart, pivot, title)
+    await update.message.reply_photo(photo=chart, caption=f"📈 {title}")
+
+@authorized_only
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin: /profile <n> [mem] profiles the next n handled updates, /profile off cancels."""
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text("⛔ Lệnh này chỉ dành cho quản trị viên.")
+        return
+    args = [a.lower() for a in (context.args or [])]
+    if args and args[0] in ("off", "tat", "tắt"):
+        profiler.disarm()
+        await update.message.reply_text("🔬 Đã tắt profile.")
+        return
+    if not args or not args[0].isdigit() or not 1 <= int(args[0]) <= 100:
+        await update.message.reply_text("🔬 HD: `/profile <1-100> [mem]`, `/profile off`", parse_mode='Markdown')
+        return
+    count, with_memory = int(args[0]), "mem" in args[1:]
+    profiler.arm(count, update.effective_chat.id, with_memory=with_memory)
+    await update.message.reply_text(
+        f"🔬 Sẽ profile {count} lệnh/tin nhắn tiếp theo{' (kèm bộ nhớ)' if with_memory else ''}."
+    )
+
+@authorized_only
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin: queue depth, wait times and cache hit rates."""
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text("⛔ Lệnh này chỉ dành cho quản trị viên.")
+        return
+    m = runtime_metrics()
+    q = m["queues"]
+    report = (
+        "📟 **METRICS**\n"
+        f"• Đang xử lý: {q['running']} | chờ: {q['queued']} | chat bận: {q['busy_chats']} (sâu nhất {q['max_chat_depth']})\n"
+        f"• Đã xử lý: {q['processed']} | từ chối: {q['shed']}\n"
+        f"• Chờ TB: {q['wait_avg_ms']} ms | chờ max: {q['wait_max_ms']} ms | chạy TB: {q['run_avg_ms']} ms\n"
+        f"• Cache báo cáo: {m['response_cache']['hits']} trúng / {m['response_cache']['misses']} trượt\n"
+        f"• Leader: {'có' if m['leader'] else 'không'}"
+    )
     await update.message.reply_text(report, parse_mode='Markdown')
 
 @authorized_only
 async def debug_sheet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Hidden command to diagnose sheet issues."""
     try:
-        rows = expense_mgr._sheet.get_all_values()
+        rows = await asyncio.to_thread(expense_mgr._sheet.get_all_values)
         if not rows:
             await update.message.reply_text("Sheet trống rỗng.")
             return
@@ -431,30 +915,59 @@ async def debug_sheet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"Lỗi debug: {e}")
 
+def build_monthly_report(summary):
+    """Render the scheduled monthly report once; the same text goes to every user."""
+    report = f"📢 **BÁO CÁO TỔNG KẾT THÁNG {summary['month']}/{summary['year']}**\n"
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    report += f"📈 **Thu nhập:** {summary['income']:,} {config.CURRENCY}\n"
+    for cat, amt in summary['categories'].items():
+        if cat == "Thu nhập": continue
+        percent = (amt / summary['total_spent']) * 100 if summary['total_spent'] > 0 else 0
+        report += f"• {cat}: {amt:,} {config.CURRENCY} ({percent:.1f}%)\n"
+
+    if summary.get('persons'):
+        report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
+        report += "👤 **Theo người:**\n"
+        for person, amt in sorted(summary['persons'].items(), key=lambda kv: kv[1], reverse=True):
+            report += f"• {person}: {amt:,} {config.CURRENCY}\n"
+
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    report += f"➖ **TỔNG CHI: {summary['total_spent']:,} {config.CURRENCY}**\n"
+    report += f"💰 **Số dư tháng: {summary['net']:,} {config.CURRENCY}**"
+    return report
+
+def _ledger_items_from_frame(df):
+    """Convert sheet rows into today's ledger format (income positive, spending negative)."""
+    items = []
+    for _, row in df.iterrows():
+        amount = int(row['Số tiền'])
+        signed = amount if row['Danh mục'] == "Thu nhập" else -amount
+        items.append({'amount': signed, 'desc': row['Mô tả']})
+    return items
+
+@leader_only
 async def send_monthly_report(context: ContextTypes.DEFAULT_TYPE):
-    """Scheduled task to send monthly report."""
-    now = datetime.now()
-    if now.day != config.REPORT_DAY:
+    """Scheduled task (runs only on REPORT_DAY) to send last month's report."""
+    now = datetime.now(vn_tz)
+    last_month_date = now.replace(day=1) - timedelta(days=1)
+
+    # Compute once for everyone, off the event loop
+    try:
+        summary = await asyncio.to_thread(
+            expense_mgr.get_monthly_summary, month=last_month_date.month, year=last_month_date.year
+        )
+    except Exception as e:
+        logger.error(f"Error in monthly report: {e}")
         return
 
-    for user_id in config.AUTHORIZED_USER_IDS:
-        try:
-            last_month_date = now.replace(day=1) - timedelta(days=1)
-            summary = expense_mgr.get_monthly_summary(month=last_month_date.month, year=last_month_date.year)
-            
-            if summary:
-                report = f"📢 **BÁO CÁO TỔNG KẾT THÁNG {summary['month']}/{summary['year']}**\n"
-                report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
-                for cat, amt in summary['categories'].items():
-                    percent = (amt / summary['total']) * 100
-                    report += f"• {cat}: {amt:,} {config.CURRENCY} ({percent:.1f}%)\n"
-                report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
-                report += f"💰 **TỔNG CHI: {summary['total']:,} {config.CURRENCY}**"
-                
-                await context.bot.send_message(chat_id=user_id, text=report, parse_mode='Markdown')
-        except Exception as e:
-            logger.error(f"Error in monthly report: {e}")
+    if not summary:
+        return
+
+    report = build_monthly_report(summary)
+    sent = await broadcaster.broadcast(context.bot, config.AUTHORIZED_USER_IDS, report, parse_mode='Markdown')
+    logger.info(f"Monthly report {summary['month']}/{summary['year']} delivered to {sent}/{len(config.AUTHORIZED_USER_IDS)} users")
 
+@leader_only
 async def send_daily_summary(context: ContextTypes.DEFAULT_TYPE):
     """Scheduled task to send daily summary at 23:00."""
     now = datetime.now(vn_tz)
@@ -464,13 +977,10 @@ async def send_daily_summary(context: ContextTypes.DEFAULT_TYPE):
     if today_cache['date'] != today_str:
         # This might happen if no messages were processed today
         # We try to load from sheet to be accurate
-        df = expense_mgr.get_expenses(start_date=now, end_date=now)
+        df = await asyncio.to_thread(expense_mgr.get_expenses, start_date=now, end_date=now)
         if df.empty:
             return # Don't push if nothing was spent
-        
-        items = []
-        for _, row in df.iterrows():
-            items.append({'amount': row['Số tiền'], 'desc': row['Mô tả']})
+        items = _ledger_items_from_frame(df)
     else:
         items = today_cache['items']
 
@@ -494,14 +1004,125 @@ async def send_daily_summary(context: ContextTypes.DEFAULT_TYPE):
     report += f"💰 **Số dư: {net:,} {config.CURRENCY}**\n\n"
     report += "Chúc bạn ngủ ngon! 😴"
 
-    for user_id in config.AUTHORIZED_USER_IDS:
+    await broadcaster.broadcast(context.bot, config.AUTHORIZED_USER_IDS, report, parse_mode='Markdown')
+
+def run_backup():
+    """Incremental backup of the month worksheets, then retention."""
+    name, changed, removed = backup.run_backup(expense_mgr._get_spreadsheet(), backup_store)
+    logger.info(f"Backup {name}: {len(changed)} worksheets re-read, {removed} old objects removed")
+
+@leader_only
+async def backup_sheets(context: ContextTypes.DEFAULT_TYPE):
+    """Scheduled task (quiet hours): archive month worksheets that changed since the last run."""
+    try:
+        await asyncio.to_thread(run_backup)
+    except Exception as e:
+        logger.error(f"Error backing up sheets: {e}")
+
+@leader_only
+async def compact_sheets(context: ContextTypes.DEFAULT_TYPE):
+    """Scheduled task (quiet hours): physically remove soft-deleted rows."""
+    try:
+        removed = await asyncio.to_thread(expense_mgr.compact_tombstones)
+    except Exception as e:
+        logger.error(f"Error compacting sheets: {e}")
+        return
+    if removed:
+        logger.info(f"Compaction removed {sum(removed.values())} rows from {len(removed)} worksheets")
+
+def local_stores():
+    """JSON state files on the shared disk that only the leader may write, then the
+    manager itself (worksheet creation and migration; it reloads after the files)."""
+    return [expense_mgr.rollup, expense_mgr.schema, expense_mgr.budgets, expense_mgr.undo_log, recurring_store, expense_mgr]
+
+def add_to_today_cache(records):
+    """Put today's records written on behalf of followers into the leader's ledger."""
+    today_str = datetime.now(vn_tz).strftime("%Y-%m-%d")
+    if today_cache['date'] != today_str:
+        today_cache['date'] = today_str
+        today_cache['items'] = []
+    known = {item.get('id') for item in today_cache['items']}
+    for record in records:
+        # A promoted follower drains its own spool: those are already in its ledger
+        if record['Ngày'] == today_str and str(record['ID']) not in known:
+            amount = int(record['Số tiền'])
+            signed = amount if record['Danh mục'] == "Thu nhập" else -amount
+            today_cache['items'].append({'amount': signed, 'desc': record['Mô tả'], 'id': str(record['ID'])})
+
+async def maintain_lease(context: ContextTypes.DEFAULT_TYPE):
+    """Renew the leader lease; the leader also flushes expenses forwarded by followers."""
+    was_leader = lease.is_leader
+    is_leader = await asyncio.to_thread(lease.renew)
+    if is_leader != was_leader:
+        await asyncio.to_thread(leader.set_writable, local_stores(), is_leader)
+    if not is_leader:
+        return
+    written = []
+    try:
+        drained = await asyncio.to_thread(write_spool.drain, lambda records: written.extend(expense_mgr.add_expenses_batch(records)))
+        if drained:
+            logger.info(f"Wrote {len(written)} of {drained} forwarded expenses")
+            add_to_today_cache(written)
+    except Exception as e:
+        logger.error(f"Error draining write spool: {e}")
+
+def save_snapshot():
+    expense_mgr.rollup.flush()
+    snapshot.save(SNAPSHOT_PATH, {
+        "manager": expense_mgr.export_state(),
+        "processed_updates": sorted(processed_updates),
+        "today_cache": {'date': today_cache['date'], 'items': list(today_cache['items'])},
+    })
+
+def restore_snapshot():
+    """Load the last snapshot; month frames are kept only if their sheet is unchanged."""
+    state = snapshot.load(SNAPSHOT_PATH)
+    if not state:
+        return
+    processed_updates.update(state.get("processed_updates", []))
+    saved_today = state.get("today_cache") or {}
+    if saved_today.get('date') == datetime.now(vn_tz).strftime("%Y-%m-%d"):
+        today_cache.update(saved_today)
+    try:
+        restored = expense_mgr.restore_state(state.get("manager", {}))
+        logger.info(f"Snapshot: restored {restored} month frames")
+    except Exception as e:
+        logger.warning(f"Snapshot frames not restored: {e}")
+
+@leader_only
+async def snapshot_job(context: ContextTypes.DEFAULT_TYPE):
+    """Scheduled task: persist warm state so a restart after a crash is warm too."""
+    try:
+        await asyncio.to_thread(save_snapshot)
+    except Exception as e:
+        logger.error(f"Error saving snapshot: {e}")
+
+async def post_shutdown(application):
+    """Save warm state, then hand leadership over instead of letting the lease expire."""
+    try:
+        expense_mgr.rollup.flush()
+    except Exception as e:
+        logger.error(f"Error saving rollup: {e}")
+    if lease.is_leader:
         try:
-            await context.bot.send_message(chat_id=user_id, text=report, parse_mode='Markdown')
+            save_snapshot()
         except Exception as e:
-            logger.error(f"Error sending daily summary to {user_id}: {e}")
+            logger.error(f"Error saving snapshot: {e}")
+    if expense_mgr._async_sheets is not None:
+        await expense_mgr._async_sheets.aclose()
+    lease.release()
+
+def runtime_metrics():
+    """Metrics served by /metrics (bot command and HTTP route)."""
+    return {
+        "queues": work_queues.metrics(),
+        "response_cache": {"hits": response_cache.hits, "misses": response_cache.misses},
+        "leader": lease.is_leader,
+    }
 
 async def post_init(application):
-    """Set up the bot's commands menu."""
+    """Restore the warm-cache snapshot and set up the bot's commands menu."""
+    await asyncio.to_thread(restore_snapshot)
     commands = [
         ("start", "Bắt đầu sử dụng bot"),
         ("help", "Xem hướng dẫn"),
@@ -512,16 +1133,23 @@ async def post_init(application):
         ("recent", "Xem 10 giao dịch gần nhất"),
         ("search", "Tìm kiếm chi tiêu theo từ khóa"),
         ("person", "Xem chi tiêu theo người (vợ, con...)"),
+        ("trend", "Xu hướng chi tiêu theo tháng/năm/người"),
+        ("budget", "Xem/đặt ngân sách theo danh mục"),
+        ("recurring", "Giao dịch định kỳ"),
+        ("reclassify", "Phân loại lại toàn bộ (xem trước / apply)"),
         ("edit", "Sửa chi tiêu (ID Tiền Mô tả)"),
         ("delete", "Xóa chi tiêu (ID)"),
+        ("undo", "Khôi phục giao dịch vừa xóa"),
     ]
     await application.bot.set_my_commands(commands)
 
 def main():
     """Start the bot with Polling and Keep-Alive Server."""
+    keep_alive_server.metrics_provider = runtime_metrics
     keep_alive()  # Start Flask server for Render
     
-    application = ApplicationBuilder().token(config.TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    leader.set_writable(local_stores(), lease.renew())
+    application = ApplicationBuilder().token(config.TELEGRAM_BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).concurrent_updates(True).build()
 
     # Commands
     application.add_handler(CommandHandler("start", start))
@@ -533,20 +1161,44 @@ def main():
     application.add_handler(CommandHandler("stats", stats))
     application.add_handler(CommandHandler("recent", recent_expenses))
     application.add_handler(CommandHandler("delete", delete_item))
+    application.add_handler(CommandHandler("undo", undo_delete))
     application.add_handler(CommandHandler("edit", edit_item))
     application.add_handler(CommandHandler("search", search_items))
     application.add_handler(CommandHandler("person", view_by_person))
+    application.add_handler(CommandHandler("trend", view_trend))
+    application.add_handler(CommandHandler("budget", budget_command))
+    application.add_handler(CommandHandler("recurring", recurring_command))
+    application.add_handler(CommandHandler("reclassify", reclassify_command))
     application.add_handler(CommandHandler("debug_sheet", debug_sheet))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("metrics", metrics_command))
+    application.add_handler(CallbackQueryHandler(paginate_callback, pattern=f"^{CALLBACK_PREFIX}:"))
+
+    # Bank statement import (CSV / XLSX documents)
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("xlsx"), import_document
+    ))
 
     # General messages
     application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message))
 
     # Scheduler 
     if application.job_queue:
-        # Monthly report at 08:00
-        application.job_queue.run_daily(send_monthly_report, time=time(hour=8, minute=0, tzinfo=vn_tz))
+        # Leader lease renewal (and spool flush) for multi-instance overlaps
+        application.job_queue.run_repeating(maintain_lease, interval=config.LEADER_RENEW_INTERVAL, first=config.LEADER_RENEW_INTERVAL)
+        # Monthly report at 08:00, only on REPORT_DAY
+        application.job_queue.run_monthly(send_monthly_report, when=time(hour=8, minute=0, tzinfo=vn_tz), day=config.REPORT_DAY)
         # Daily EOD Summary at 23:00
         application.job_queue.run_daily(send_daily_summary, time=time(hour=23, minute=0, tzinfo=vn_tz))
+        # Recurring transactions shortly after midnight, plus a catch-up run at startup
+        application.job_queue.run_daily(run_recurring, time=time(hour=0, minute=5, tzinfo=vn_tz))
+        application.job_queue.run_once(run_recurring, when=30)
+        # Periodic warm-cache snapshot
+        application.job_queue.run_repeating(snapshot_job, interval=config.SNAPSHOT_INTERVAL, first=config.SNAPSHOT_INTERVAL)
+        # Nightly incremental backup, ahead of compaction
+        application.job_queue.run_daily(backup_sheets, time=time(hour=config.BACKUP_HOUR, minute=0, tzinfo=vn_tz))
+        # Remove soft-deleted rows during quiet hours
+        application.job_queue.run_daily(compact_sheets, time=time(hour=config.COMPACTION_HOUR, minute=30, tzinfo=vn_tz))
 
     logger.info("Bot is running (Polling Mode)...")
     application.run_polling()
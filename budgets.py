@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+ALL_PERSONS = "*"
+
+
+class BudgetStore:
+    """Monthly budget limits per (category, person), persisted as JSON.
+
+    A person of ALL_PERSONS means the limit applies to everyone's spending
+    in that category combined.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.read_only = False # followers keep changes in memory (see leader.set_writable)
+        self._lock = threading.Lock()
+        self._budgets = {} # "category|person" -> limit
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._budgets = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._budgets = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Could not load budgets from {self.path}: {e}")
+
+    @staticmethod
+    def _key(category, person):
+        return f"{category}|{str(person or ALL_PERSONS).strip().lower()}"
+
+    def _save(self):
+        if self.read_only:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._budgets, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def set(self, category, limit, person=None):
+        with self._lock:
+            self._budgets[self._key(category, person)] = int(limit)
+            self._save()
+
+    def remove(self, category, person=None):
+        with self._lock:
+            removed = self._budgets.pop(self._key(category, person), None) is not None
+            if removed:
+                self._save()
+            return removed
+
+    def items(self):
+        """List of (category, person, limit); person is ALL_PERSONS for shared budgets."""
+        result = []
+        for key, limit in sorted(self._budgets.items()):
+            category, person = key.rsplit("|", 1)
+            result.append((category, person, limit))
+        return result
+
+    def for_expense(self, category, person):
+        """Budgets affected by a write: the shared one and the person's own one."""
+        found = []
+        for who in (ALL_PERSONS, str(person).strip().lower()):
+            limit = self._budgets.get(f"{category}|{who}")
+            if limit:
+                found.append((who, limit))
+        return found
+
+
+def crossed_thresholds(before, after, limit, thresholds=None):
+    """Thresholds (fractions of limit) crossed by going from `before` to `after`."""
+    thresholds = thresholds or config.BUDGET_THRESHOLDS
+    return [t for t in thresholds if before < t * limit <= after]
+
+
+def evaluate(store, rollup, year, month, category, person, amount):
+    """Alerts for one new expense, using the rollup's running totals (O(1) per budget).
+
+    Must be called after the rollup already includes the new amount.
+    Returns a list of (category, person, limit, spent, threshold).
+    """
+    alerts = []
+    for who, limit in store.for_expense(category, person):
+        spent = rollup.month_total(year, month, category, None if who == ALL_PERSONS else who)
+        crossed = crossed_thresholds(spent - amount, spent, limit)
+        if crossed:
+            alerts.append((category, who, limit, spent, max(crossed)))
+    return alerts
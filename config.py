@@ -9,6 +9,10 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_BOT_TOKEN_HERE")
 user_ids_env = os.getenv("AUTHORIZED_USER_IDS", "12345678")
 AUTHORIZED_USER_IDS = [int(uid.strip()) for uid in user_ids_env.split(",")]
 
+# Admins (diagnostic commands such as /profile); defaults to the first authorized user
+admin_ids_env = os.getenv("ADMIN_USER_IDS", user_ids_env.split(",")[0])
+ADMIN_USER_IDS = [int(uid.strip()) for uid in admin_ids_env.split(",")]
+
 # Web App URL (Disabled for now)
 WEB_APP_URL = os.getenv("WEB_APP_URL", "")
 
@@ -18,6 +22,60 @@ CURRENCY = "vnd"
 # Monthly report day
 REPORT_DAY = 5
 
+# Scheduled report delivery: max concurrent sends and min seconds between messages to one chat
+BROADCAST_CONCURRENCY = 8
+PER_CHAT_SEND_INTERVAL = 1.0
+
+# Update handling: handlers running at once, updates queued per chat and in total before shedding
+WORK_CONCURRENCY = 4
+WORK_QUEUE_DEPTH = 10
+WORK_QUEUE_TOTAL = 100
+# Token required by the keep-alive server's /metrics route; the route is off when empty
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Local directory for derived data (rollups, caches, registries)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Budget alert thresholds (fractions of the monthly limit)
+BUDGET_THRESHOLDS = [0.8, 1.0]
+
+# Statement import: rows parsed and written per batch
+IMPORT_CHUNK_SIZE = 2000
+
+# Paginated reports: cached result sets, their lifetime (seconds) and rows per page
+PAGINATION_CACHE_SIZE = 200
+PAGINATION_TTL = 3600
+PAGINATION_PAGE_ROWS = 40
+
+# Multi-instance coordination: leader lease lifetime and renewal period (seconds)
+LEADER_LEASE_TTL = 60
+LEADER_RENEW_INTERVAL = 15
+
+# Soft deletes: deletes remembered per user for /undo, and the nightly compaction
+# that physically removes tombstoned rows (hour of day, row ranges per batchUpdate call)
+UNDO_HISTORY = 20
+COMPACTION_HOUR = 3
+COMPACTION_BATCH_SIZE = 200
+
+# Nightly incremental backups of the month worksheets (data/backups): hour of day,
+# manifests kept, and the age after which a month is re-read even if unchanged
+BACKUP_HOUR = 2
+BACKUP_KEEP = 30
+BACKUP_FULL_EVERY_DAYS = 7
+
+# Rendered report replies kept in memory (LRU), and the seconds after which an entry
+# expires so edits made directly in the sheet (not seen by data_version) show up
+RESPONSE_CACHE_SIZE = 128
+RESPONSE_CACHE_TTL = 60
+
+# Seconds between warm-cache snapshots (also written on graceful shutdown)
+SNAPSHOT_INTERVAL = 600
+
+# Rollup cube (data/rollup.json): seconds between disk writes (the rest is flushed with
+# the snapshot and at shutdown), and between re-checks of a month against its sheet fingerprint
+ROLLUP_SAVE_INTERVAL = 30
+ROLLUP_VERIFY_INTERVAL = 60
+
 # --- Google Sheets Configuration ---
 # File name of the Google Sheet you created
 GOOGLE_SHEET_NAME = "Quản lý chi tiêu"
@@ -26,6 +84,18 @@ GOOGLE_SHEET_NAME = "Quản lý chi tiêu"
 # For Render: we will load from GOOGLE_CREDENTIALS_JSON environment variable
 GOOGLE_CREDENTIALS_PATH = "service_account.json" 
 
+# Max keep-alive HTTP connections kept open to the Sheets API
+SHEETS_POOL_SIZE = 10
+
+# Sheets client for recording, editing and deleting expenses: "gspread" (threads) or "async"
+# (asyncio REST client, async_sheets.py). Pointing SHEETS_API_URL at sheets_standin.py sends
+# every Sheets call, gspread included, to that local server instead of Google.
+SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "gspread")
+SHEETS_API_URL = os.getenv("SHEETS_API_URL", "https://sheets.googleapis.com")
+
+# Worker threads used to fetch month worksheets concurrently (trend analytics)
+HISTORY_FETCH_WORKERS = 8
+
 def get_google_credentials():
     """Get Google Cloud Credentials from Env Var or File."""
     env_creds = os.getenv("GOOGLE_CREDENTIALS_JSON")
@@ -1,46 +1,201 @@
+import asyncio
+import functools
+import threading
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import httpx
 import pandas as pd
 from datetime import datetime, date, timedelta
 import config
+import sheets_client
+import async_sheets
 from categories import classify_expense
 import logging
-import unicodedata
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+import budgets
+import schema
+import sheet_summary
+from rollup import Rollup
+from undo import UndoLog
 
 logger = logging.getLogger(__name__)
 
+# Schema field -> standard DataFrame column name used by the bot
+FRAME_COLUMNS = {
+    "id": "ID", "date": "Ngày", "time": "Giờ", "person": "Người",
+    "category": "Danh mục", "amount": "Số tiền", "description": "Mô tả",
+}
+
+def _parse_day(d):
+    """Parse a sheet date cell (YYYY-MM-DD or day-first) into a normalized Timestamp or NaT."""
+    if not d or str(d).strip() == "": return pd.NaT # Use NaT for missing/invalid dates
+    try:
+        d_str = str(d).strip()
+        # Try to parse with multiple formats
+        dt = pd.to_datetime(d_str, errors='coerce', format='%Y-%m-%d')
+        if pd.isna(dt):
+            dt = pd.to_datetime(d_str, errors='coerce', dayfirst=True)
+        
+        if not pd.isna(dt):
+            return dt.normalize() # Strip time component
+        return pd.NaT
+    except:
+        return pd.NaT
+
+def _parse_days(series):
+    """Vectorized _parse_day: ISO dates in one pass, per-cell fallback only for the rest."""
+    parsed = pd.to_datetime(series, errors='coerce', format='%Y-%m-%d')
+    missing = parsed.isna() & series.astype(str).str.strip().ne("")
+    if missing.any():
+        parsed[missing] = series[missing].apply(_parse_day)
+    return parsed.dt.normalize()
+
+def _parse_times(series):
+    """Vectorized 'HH:MM[:SS]' -> timedelta; blank or invalid cells become 0."""
+    text = series.fillna('').astype(str).str.strip()
+    text = text.where(text.str.count(':') != 1, text + ':00')
+    return pd.to_timedelta(text, errors='coerce').fillna(pd.Timedelta(0))
+
+def _clean_amounts(series):
+    """'1.234.000', '50,000 đ' -> int64 (digits only, 0 when empty)."""
+    digits = series.astype(str).str.replace(r'[^\d]', '', regex=True)
+    return pd.to_numeric(digits, errors='coerce').fillna(0).astype('int64')
+
+# dtypes of the canonical in-memory frame; 'Ngày' carries the date and time together
+FRAME_DTYPES = {
+    "ID": object, "Ngày": "datetime64[ns]", "Người": "category",
+    "Danh mục": "category", "Số tiền": "int64", "Mô tả": object,
+}
+
+def _empty_frame():
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in FRAME_DTYPES.items()})
+
+def _compact_frame(df):
+    """Cast a raw sheet frame to the canonical typed schema.
+
+    'Ngày' and 'Giờ' are merged into a single datetime64 column, person and
+    category become categoricals and amounts int64; rows without a valid
+    date are dropped. Already-compact frames (e.g. after a concat, which
+    turns categoricals back into objects) are only re-cast.
+    """
+    if df.empty:
+        return _empty_frame()
+    df = df.copy()
+    if 'Giờ' in df.columns:
+        df['Ngày'] = _parse_days(df['Ngày']) + _parse_times(df['Giờ'])
+        df = df.drop(columns=['Giờ'])
+        df = df[df['Ngày'].notna()]
+    if df['Số tiền'].dtype != 'int64':
+        df['Số tiền'] = _clean_amounts(df['Số tiền'])
+    return df.astype(FRAME_DTYPES)[list(FRAME_DTYPES)].reset_index(drop=True)
+
+def _is_tombstone(row, columns):
+    """True for a raw sheet row soft-deleted through its status column."""
+    idx = columns.get("status")
+    return idx is not None and idx < len(row) and str(row[idx]).strip() == schema.TOMBSTONE
+
+def _live_rows(values, columns):
+    """Raw sheet rows that are neither blank nor tombstoned."""
+    return [r for r in values if any(str(v).strip() for v in r) and not _is_tombstone(r, columns)]
+
+def _append_row(worksheet, row):
+    """Append one row; table_range keeps gspread looking at columns A-H only."""
+    try:
+        return worksheet.append_row(row, value_input_option='USER_ENTERED', table_range='A:H')
+    except TypeError:
+        return worksheet.append_row(row, value_input_option='USER_ENTERED')
+
+def _cell(values, row):
+    """Stripped text of sheet row `row` in a single-column read that starts at row 2."""
+    index = row - 2
+    return str(values[index][0]).strip() if 0 <= index < len(values) and values[index] else ""
+
+def _col_letter(index):
+    """0-based column index -> A1 column letter(s)."""
+    return gspread.utils.rowcol_to_a1(1, index + 1)[:-1]
+
+def _month_range(year, month):
+    """First and last date of a month."""
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    return start_date, end_date
+
+def _serialized(method):
+    """Run a sheet-writing method under the manager's write lock.
+
+    Handlers call the manager from worker threads; writes (and the row
+    lookups they depend on) must not interleave, reads may.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class ExpenseManager:
-    def __init__(self):
+    def __init__(self, read_only=False):
         self._client = None
         self._sheet = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._frame_cache = {} # worksheet title -> parsed frame, shared by get_expenses and get_history
+        self._frame_fingerprints = {} # worksheet title -> summary-block fingerprint read before the frame
+        self._data_versions = {} # (year, month) -> counter bumped by every write through this manager
+        self.schema = schema.SchemaRegistry(os.path.join(config.DATA_DIR, "schema.json"))
+        self.rollup = Rollup(os.path.join(config.DATA_DIR, "rollup.json"))
+        self.budgets = budgets.BudgetStore(os.path.join(config.DATA_DIR, "budgets.json"))
+        self.undo_log = UndoLog(os.path.join(config.DATA_DIR, "undo.json"))
+        self._async_sheets = None # AsyncSheetsClient, when config.SHEETS_BACKEND == "async"
+        self._write_lock = threading.RLock()
+        self._async_write_lock = asyncio.Lock() # async writers among themselves (see _write_locked_async)
+        # Read-only (a follower, or leadership not yet decided): connect lazily, on the first
+        # read, without creating or migrating worksheets; reload() on promotion does both
+        self.read_only = read_only
+        if not read_only:
+            self._connect_to_sheets()
+
+    def reload(self):
+        """Promotion to leader (see leader.set_writable): create this month's worksheet
+        and start the schema migrator."""
+        self.read_only = False
         self._connect_to_sheets()
 
-    def _connect_to_sheets(self):
-        """Connect to Google Sheets API."""
-        creds_source = config.get_google_credentials()
-        
-        if not creds_source:
-            logger.error("❌ No Google Credentials found!")
+    def _connect_to_sheets(self, reconnect=False):
+        """Connect to Google Sheets API using the shared, cached client.
+
+        With reconnect=True the pooled session is dropped first, so a broken
+        connection is not reused for the retry.
+        """
+        if reconnect:
+            sheets_client.reset_client()
+        self._client = sheets_client.get_client()
+        if not self._client:
             return
 
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        
         try:
-            if isinstance(creds_source, dict):
-                # Load from dict (Env Var)
-                creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_source, scope)
-            else:
-                # Load from file path (Local)
-                creds = ServiceAccountCredentials.from_json_keyfile_name(creds_source, scope)
-
-            self._client = gspread.authorize(creds)
-            
             # Open the spreadsheet
-            spreadsheet = self._client.open(config.GOOGLE_SHEET_NAME)
+            self._spreadsheet = self._client.open(config.GOOGLE_SHEET_NAME)
+            self._worksheets = {}
             
             # Default to current month's sheet immediately
             now = datetime.now()
-            self._sheet = self._get_or_create_worksheet(now, spreadsheet)
+            if self.read_only:
+                # Only the leader creates and migrates worksheets
+                try:
+                    self._sheet = self._spreadsheet.worksheet(self._get_worksheet_name(now))
+                except gspread.exceptions.WorksheetNotFound:
+                    self._sheet = None
+                return
+            self._sheet = self._get_or_create_worksheet(now, self._spreadsheet)
+
+            # Bring legacy month sheets up to date once, off the request path
+            schema.start_background_migration(self._spreadsheet, self.schema, config.GOOGLE_SHEET_NAME)
             
             # (Optional) If the default 'Sheet1' still exists and is empty, we could delete it, 
             # but usually it's safer to just leave it and work in the new monthly sheets.
@@ -48,40 +203,71 @@ class ExpenseManager:
         except Exception as e:
             logger.error(f"Google Sheets Connection Error: {e}")
 
+    def _get_spreadsheet(self):
+        """Return the opened spreadsheet, opening it once per connection."""
+        if self._spreadsheet is None:
+            if not self._client: self._connect_to_sheets()
+            if self._spreadsheet is None:
+                self._spreadsheet = self._client.open(config.GOOGLE_SHEET_NAME)
+        return self._spreadsheet
+
     def _get_worksheet_name(self, date_obj):
         """Format worksheet name as '[Spreadsheet Name] mm/yyyy'."""
         return f"{config.GOOGLE_SHEET_NAME} {date_obj.strftime('%m/%Y')}"
 
     def _get_or_create_worksheet(self, date_obj, spreadsheet=None):
         """Get or create a worksheet for the given month."""
-        if spreadsheet is None:
-            if not self._client: self._connect_to_sheets()
-            spreadsheet = self._client.open(config.GOOGLE_SHEET_NAME)
-            
         ws_name = self._get_worksheet_name(date_obj)
+        if ws_name in self._worksheets:
+            return self._worksheets[ws_name]
+
+        with self._write_lock:
+            if ws_name in self._worksheets: # created by another thread meanwhile
+                return self._worksheets[ws_name]
+            worksheet = self._open_or_create_worksheet(ws_name, spreadsheet or self._get_spreadsheet())
+            self._worksheets[ws_name] = worksheet
+            return worksheet
+
+    def _open_or_create_worksheet(self, ws_name, spreadsheet):
+        """Open a month worksheet (checking its layout once) or create it with header, totals and summary block."""
         try:
             worksheet = spreadsheet.worksheet(ws_name)
-            # Check if header needs update (legacy 'Ngày' -> 'Ngày hôm nay')
-            first_row = worksheet.row_values(1)
-            if len(first_row) > 1 and first_row[1] == "Ngày":
-                worksheet.update_cell(1, 2, "Ngày hôm nay")
+            # One-time layout check; afterwards the schema registry answers without a header fetch
+            if not self.schema.is_current(ws_name):
+                schema.migrate_worksheet(worksheet, self.schema)
         except gspread.exceptions.WorksheetNotFound:
             # Create new worksheet for the month
             worksheet = spreadsheet.add_worksheet(title=ws_name, rows="1000", cols="15")
             # Headers (Using 'Ngày hôm nay')
-            worksheet.append_row(["ID", "Ngày hôm nay", "Giờ", "Người", "Danh mục", "Số tiền", "Mô tả"])
+            worksheet.append_row(schema.CANONICAL_HEADER)
+            columns = schema.detect_columns(schema.CANONICAL_HEADER)
+            self.schema.record(ws_name, columns, rows=1)
             
             # Add Total Summary formula in K1:L1
             try:
                 worksheet.update_acell('K1', 'TỔNG CHI TIÊU:')
-                worksheet.update_acell('L1', '=SUM(F2:F)')
+                worksheet.update_acell('L1', f'=SUMIF(H2:H,"<>{schema.TOMBSTONE}",F2:F)')
+                sheet_summary.write_block(worksheet, columns, ["Bản thân"])
                 # Basic formatting for the header
-                worksheet.format("A1:G1", {"textFormat": {"bold": True}, "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9}})
+                worksheet.format("A1:H1", {"textFormat": {"bold": True}, "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9}})
             except Exception as e:
                 logger.warning(f"Could not format sheet: {e}")
-                
         return worksheet
 
+    def _columns_for(self, worksheet, header=None):
+        """Column map for a worksheet from the schema registry.
+
+        Unregistered sheets are detected from an already-fetched header, or
+        migrated (one header fetch) when no header is at hand.
+        """
+        columns = self.schema.columns(worksheet.title)
+        if columns:
+            return columns
+        if header is not None:
+            return schema.detect_columns([str(h).strip() for h in header])
+        return schema.migrate_worksheet(worksheet, self.schema)
+
+    @_serialized
     def add_expense(self, amount, description, person="Bản thân", date=None, force_id=None):
         """Add a new expense record to Google Sheets with deduplication support."""
         if not self._sheet: self._connect_to_sheets()
@@ -103,20 +289,25 @@ class ExpenseManager:
 
         # IDEMPOTENCY CHECK: Check if this ID already exists in the sheet
         try:
-            # We search only in the ID column (A) for efficiency
+            cols = self._columns_for(target_sheet)
+            # We search only in the ID column for efficiency
             # To be safe, we check if the ID is already there
-            cell = target_sheet.find(expense_id, in_column=1)
+            cell = target_sheet.find(expense_id, in_column=cols.get("id", 0) + 1)
             if cell:
                 logger.info(f"Duplicate detected! ID {expense_id} already exists at row {cell.row}. Skipping write.")
                 # Retrieve existing row data to return it
                 row_data = target_sheet.row_values(cell.row)
+                def existing(field, default):
+                    idx = cols.get(field)
+                    return row_data[idx] if idx is not None and len(row_data) > idx else default
+                stored_amount = existing("amount", "")
                 return {
                     "ID": str(expense_id),
-                    "Ngày": row_data[1] if len(row_data) > 1 else day_str,
-                    "Người": row_data[3] if len(row_data) > 3 else person,
-                    "Danh mục": row_data[4] if len(row_data) > 4 else category,
-                    "Số tiền": int(row_data[5]) if len(row_data) > 5 and str(row_data[5]).isdigit() else amount,
-                    "Mô tả": row_data[6] if len(row_data) > 6 else description,
+                    "Ngày": existing("date", day_str),
+                    "Người": existing("person", person),
+                    "Danh mục": existing("category", category),
+                    "Số tiền": int(stored_amount) if str(stored_amount).isdigit() else amount,
+                    "Mô tả": existing("description", description),
                     "is_duplicate": True
                 }
         except:
@@ -128,205 +319,729 @@ class ExpenseManager:
         ]
         
         try:
-            # We use append_row with table_range to ensure it only looks at columns A-G
-            try:
-                target_sheet.append_row(row, value_input_option='USER_ENTERED', table_range='A:G')
-            except TypeError:
-                target_sheet.append_row(row, value_input_option='USER_ENTERED')
-            
-            self._sheet = target_sheet # Update active sheet
-            return {
-                "ID": expense_id,
-                "Ngày": day_str,
-                "Người": person,
-                "Danh mục": category,
-                "Số tiền": amount,
-                "Mô tả": description,
-                "is_duplicate": False
-            }
+            response = _append_row(target_sheet, row)
         except Exception as e:
+            # Fresh connection, then one retry into the same month unless the first attempt did land
             logger.error(f"Error adding row: {e}")
-            self._connect_to_sheets()
-            self._sheet.append_row(row)
-            return {
-                "ID": expense_id,
-                "Ngày": day_str,
-                "Người": person,
-                "Danh mục": category,
-                "Số tiền": amount,
-                "Mô tả": description,
-                "is_duplicate": False
-            }
+            self._connect_to_sheets(reconnect=True)
+            target_sheet = self._get_or_create_worksheet(date)
+            cols = self._columns_for(target_sheet)
+            if target_sheet.find(expense_id, in_column=cols.get("id", 0) + 1):
+                response = None
+                self.schema.update(target_sheet.title, rows=None) # Row count unknown
+            else:
+                response = _append_row(target_sheet, row)
+
+        if response is not None:
+            self._note_appended(target_sheet, response, 1)
+        self._mark_changed(target_sheet.title)
+        self._sheet = target_sheet # Update active sheet
+        self.rollup.add(day_str, category, person, amount)
+        return {
+            "ID": expense_id,
+            "Ngày": day_str,
+            "Người": person,
+            "Danh mục": category,
+            "Số tiền": amount,
+            "Mô tả": description,
+            "is_duplicate": False
+        }
+
+    def _get_async_sheets(self):
+        """The asyncio REST client for this spreadsheet, created on first use."""
+        if self._async_sheets is None:
+            credentials = None if sheets_client.using_standin() else sheets_client.get_credentials()
+            self._async_sheets = async_sheets.AsyncSheetsClient(self._get_spreadsheet().id, credentials=credentials)
+        return self._async_sheets
+
+    async def _columns_async(self, worksheet):
+        """Column map from the registry; an unregistered sheet is migrated in a thread."""
+        return self.schema.columns(worksheet.title) or await asyncio.to_thread(self._columns_for, worksheet)
+
+    @asynccontextmanager
+    async def _write_locked_async(self):
+        """Hold _write_lock around an async lookup-then-write, so it cannot interleave
+        with the sync writers (compaction deletes rows and shifts the ones below).
+
+        The lock is taken by the event loop thread without blocking it; coroutines
+        queue on an asyncio.Lock first, since the RLock lets its owner thread in again.
+        """
+        async with self._async_write_lock:
+            while not self._write_lock.acquire(blocking=False):
+                await asyncio.sleep(0.05)
+            try:
+                yield
+            finally:
+                self._write_lock.release()
+
+    async def _find_row_async(self, title, cols, expense_id):
+        """(1-based row, row values) of an ID: one read of the ID column, one of the row."""
+        client = self._get_async_sheets()
+        row_index = await client.find(title, _col_letter(cols.get("id", 0)), str(expense_id))
+        if not row_index:
+            return None, None
+        rows = await client.get(async_sheets.a1(title, f"{row_index}:{row_index}"))
+        return row_index, rows[0] if rows else []
+
+    async def add_expense_async(self, amount, description, person="Bản thân", date=None, force_id=None):
+        """add_expense over the asyncio REST client: the duplicate check, row read and
+        append run on the event loop instead of pinning a thread each.
+
+        Opening or creating the month worksheet (once per month) still goes
+        through gspread in a thread.
+        """
+        if date is None:
+            date = datetime.now()
+        title = self._get_worksheet_name(date)
+        target_sheet = self._worksheets.get(title) or await asyncio.to_thread(self._get_or_create_worksheet, date)
+        cols = await self._columns_async(target_sheet)
+        client = self._get_async_sheets()
+
+        category = classify_expense(description)
+        day_str = date.strftime("%Y-%m-%d")
+        time_str = date.strftime("%H:%M:%S")
+        expense_id = str(force_id) if force_id else str(int(datetime.timestamp(datetime.now()) * 1000))
+        record = {
+            "ID": expense_id,
+            "Ngày": day_str,
+            "Người": person,
+            "Danh mục": category,
+            "Số tiền": amount,
+            "Mô tả": description,
+            "is_duplicate": False
+        }
+
+        async with self._write_locked_async():
+            # IDEMPOTENCY CHECK on the ID column only; a failed check does not block the write
+            try:
+                row_index, row_data = await self._find_row_async(title, cols, expense_id)
+            except (async_sheets.SheetsAPIError, httpx.HTTPError) as e:
+                logger.warning(f"Duplicate check failed for {expense_id}: {e}")
+                row_index = None
+            if row_index:
+                logger.info(f"Duplicate detected! ID {expense_id} already exists at row {row_index}. Skipping write.")
+                def existing(field, default):
+                    idx = cols.get(field)
+                    return row_data[idx] if idx is not None and len(row_data) > idx else default
+                stored_amount = existing("amount", "")
+                record.update({
+                    "Ngày": existing("date", day_str),
+                    "Người": existing("person", person),
+                    "Danh mục": existing("category", category),
+                    "Số tiền": int(stored_amount) if str(stored_amount).isdigit() else amount,
+                    "Mô tả": existing("description", description),
+                    "is_duplicate": True
+                })
+                return record
+
+            row = [expense_id, day_str, time_str, person, category, amount, description]
+            try:
+                response = await client.append(async_sheets.a1(title, "A:H"), [row])
+            except (async_sheets.SheetsAPIError, httpx.HTTPError) as e:
+                # Fresh connections, then one retry unless the first attempt did land
+                logger.error(f"Error adding row: {e}")
+                await client.aclose()
+                written, _ = await self._find_row_async(title, cols, expense_id)
+                response = None if written else await client.append(async_sheets.a1(title, "A:H"), [row])
+                if written:
+                    self.schema.update(title, rows=None) # Row count unknown
+        if response is not None:
+            self._note_appended(target_sheet, response, 1)
+        self._mark_changed(title)
+        self._sheet = target_sheet
+        self.rollup.add(day_str, category, person, amount)
+        return record
+
+    async def edit_expense_async(self, expense_id, new_amount=None, new_description=None):
+        """edit_expense over the asyncio REST client: every changed cell in one values:batchUpdate."""
+        if not self._sheet: await asyncio.to_thread(self._connect_to_sheets)
+        title = self._sheet.title
+        try:
+            cols = await self._columns_async(self._sheet)
+            client = self._get_async_sheets()
+            async with self._write_locked_async():
+                row_idx, old_row = await self._find_row_async(title, cols, expense_id)
+                if not row_idx or _is_tombstone(old_row, cols):
+                    return False
+                new_row = list(old_row) + [""] * (max(cols.values()) + 1 - len(old_row))
+                changes = {}
+                if new_amount is not None:
+                    changes["amount"] = new_amount
+                if new_description is not None:
+                    changes["description"] = new_description
+                    changes["category"] = classify_expense(new_description)
+                if not changes:
+                    return True
+                await client.values_batch_update([
+                    {"range": async_sheets.a1(title, f"{_col_letter(cols[field])}{row_idx}"), "values": [[value]]}
+                    for field, value in changes.items()
+                ])
+            for field, value in changes.items():
+                new_row[cols[field]] = value
+            self._rollup_remove_row(old_row, cols)
+            self._rollup_add_row(new_row, cols)
+            self._mark_changed(title)
+            return True
+        except Exception as e:
+            logger.error(f"Error editing: {e}")
+            return False
+
+    async def delete_expense_async(self, expense_id, actor=None):
+        """delete_expense over the asyncio REST client (soft delete: one status-cell write)."""
+        if not self._sheet: await asyncio.to_thread(self._connect_to_sheets)
+        title = self._sheet.title
+        try:
+            cols = await self._columns_async(self._sheet)
+            if "status" not in cols:
+                # Hard delete shifts rows: done by the sync path under the write lock
+                return await asyncio.to_thread(self.delete_expense, expense_id, actor)
+            client = self._get_async_sheets()
+            async with self._write_locked_async():
+                row_idx, old_row = await self._find_row_async(title, cols, expense_id)
+                if not row_idx or _is_tombstone(old_row, cols):
+                    return False
+                await client.values_batch_update([
+                    {"range": async_sheets.a1(title, f"{_col_letter(cols['status'])}{row_idx}"), "values": [[schema.TOMBSTONE]]}
+                ])
+            self._mark_changed(title)
+            self._rollup_remove_row(old_row, cols)
+            self.undo_log.push(actor, title, expense_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting: {e}")
+            return False
+
+    def _mark_changed(self, title):
+        """A write touched this worksheet: drop its cached frame and bump the month's data version."""
+        self._frame_cache.pop(title, None)
+        month = self._worksheet_month(title)
+        if month:
+            self.rollup.mark_written(*month)
+            with self._write_lock:
+                self._data_versions[month] = self._data_versions.get(month, 0) + 1
+
+    def data_version(self, year, month):
+        """Counter that changes whenever this process writes to the month (for response caching)."""
+        return self._data_versions.get((year, month), 0)
+
+    def _row_count(self, worksheet):
+        """Last used row of a worksheet (header included), from the registry when known."""
+        cols = self._columns_for(worksheet)
+        rows = (self.schema.get(worksheet.title) or {}).get("rows")
+        if rows:
+            return rows
+        # One-time count from the ID column only
+        rows = len(worksheet.col_values(cols.get("id", 0) + 1))
+        self.schema.update(worksheet.title, rows=rows)
+        return rows
+
+    def _note_appended(self, worksheet, response, count):
+        """Keep the registry row count in sync after an append.
+
+        Concurrent appends (async backend) can answer out of order, so a
+        reported last row never lowers the count.
+        """
+        updated_range = (response or {}).get("updates", {}).get("updatedRange", "") if isinstance(response, dict) else ""
+        match = re.search(r'(\d+)$', updated_range)
+        with self._write_lock:
+            rows = (self.schema.get(worksheet.title) or {}).get("rows")
+            if match:
+                self.schema.update(worksheet.title, rows=max(int(match.group(1)), rows or 0))
+            elif rows:
+                self.schema.update(worksheet.title, rows=rows + count)
+
+    def _worksheet_month(self, title):
+        """(year, month) of a '<name> mm/yyyy' worksheet title, or None."""
+        prefix = f"{config.GOOGLE_SHEET_NAME} "
+        if not title.startswith(prefix): return None
+        match = re.fullmatch(r'(\d{2})/(\d{4})', title[len(prefix):])
+        return (int(match.group(2)), int(match.group(1))) if match else None
+
+    def _month_worksheets(self, newest_first=True):
+        """All '<name> mm/yyyy' worksheets, sorted by month (one metadata call)."""
+        dated = []
+        for ws in self._get_spreadsheet().worksheets():
+            month = self._worksheet_month(ws.title)
+            if month:
+                dated.append((month, ws))
+        dated.sort(key=lambda item: item[0], reverse=newest_first)
+        return [ws for _, ws in dated]
+
+    def get_recent_expenses(self, n=10):
+        """Last n records across month worksheets, reading only each sheet's trailing rows.
+
+        Walks back from the newest month until n live rows are collected, reading
+        further up a sheet whose tail is tombstoned. Returns the rows oldest-first
+        (like df.tail(n)).
+        """
+        frames = []
+        remaining = n
+        try:
+            for ws in self._month_worksheets():
+                last = self._row_count(ws)
+                if last <= 1:
+                    continue
+                cols = self._columns_for(ws)
+                first = max(2, last - remaining + 1)
+                last_col = _col_letter(max(cols.values()))
+                # Open-ended range: picks up rows added outside the bot as well
+                values = ws.get(f"A{first}:{last_col}")
+                if not values and first > 2:
+                    # Stored count was too high (rows removed by hand): recount once
+                    self.schema.update(ws.title, rows=None)
+                    last = self._row_count(ws)
+                    first = max(2, last - remaining + 1)
+                    values = ws.get(f"A{first}:{last_col}") if last > 1 else []
+                if values and first + len(values) - 1 != last:
+                    self.schema.update(ws.title, rows=first + len(values) - 1)
+                values = _live_rows(values, cols)
+                # Tombstones in the tail: keep reading up this sheet before falling back a month
+                while len(values) < remaining and first > 2:
+                    end = first - 1
+                    first = max(2, end - (remaining - len(values)) + 1)
+                    values = _live_rows(ws.get(f"A{first}:{last_col}{end}"), cols) + values
+                values = values[-remaining:]
+                if not values:
+                    continue
+                frames.insert(0, self._rows_to_frame(values, cols))
+                remaining -= len(values)
+                if remaining <= 0:
+                    break
+        except Exception as e:
+            logger.error(f"Error reading recent expenses: {e}")
+
+        if not frames:
+            return _empty_frame()
+        return _compact_frame(pd.concat(frames, ignore_index=True))
+
+    @_serialized
+    def add_expenses_batch(self, records):
+        """Append many records with one API call per month worksheet.
+
+        Each record is a dict with "ID", "amount", "description" and optional
+        "person", "date" and "category" (classified from the description when
+        missing). IDs already present in the target sheet are skipped, so
+        replaying a batch never double-inserts. Returns the records written.
+        """
+        by_sheet = {}
+        for record in records:
+            record_date = record.get("date") or datetime.now()
+            by_sheet.setdefault(self._get_worksheet_name(record_date), []).append((record_date, record))
+
+        written = []
+        for records_in_sheet in by_sheet.values():
+            target_sheet = self._get_or_create_worksheet(records_in_sheet[0][0])
+            cols = self._columns_for(target_sheet)
+            existing_ids = set(target_sheet.col_values(cols.get("id", 0) + 1))
+
+            rows, added = [], []
+            for record_date, record in records_in_sheet:
+                expense_id = str(record["ID"])
+                if expense_id in existing_ids:
+                    continue
+                existing_ids.add(expense_id)
+                person = record.get("person") or "Bản thân"
+                category = record.get("category") or classify_expense(record["description"])
+                day_str = record_date.strftime("%Y-%m-%d")
+                rows.append([expense_id, day_str, record_date.strftime("%H:%M:%S"), person, category, record["amount"], record["description"]])
+                added.append({
+                    "ID": expense_id,
+                    "Ngày": day_str,
+                    "Người": person,
+                    "Danh mục": category,
+                    "Số tiền": record["amount"],
+                    "Mô tả": record["description"],
+                    "is_duplicate": False
+                })
+            if not rows:
+                continue
+
+            response = target_sheet.append_rows(rows, value_input_option='USER_ENTERED', table_range='A:H')
+            self._note_appended(target_sheet, response, len(rows))
+            self._mark_changed(target_sheet.title)
+            self.rollup.add_many((item["Ngày"], item["Danh mục"], item["Người"], item["Số tiền"]) for item in added)
+            written.extend(added)
+        return written
+
+    def reclassify(self, apply=False, progress=None):
+        """Re-run classify_expense over every month worksheet.
+
+        Reads only the description and category columns of each sheet, and
+        (when apply=True) writes just the changed category cells with one
+        batch update per worksheet. Rows currently marked as income are kept,
+        since income can also come from the entry itself (e.g. statement inflows).
+        A dry run takes no lock; apply holds the write lock per worksheet, from
+        its read to its write, so the row numbers cannot move in between.
+        Returns {"sheets": {title: changed}, "transitions": {(old, new): count}, "rows": scanned}.
+        """
+        result = {"sheets": {}, "transitions": {}, "rows": 0}
+        cache = {}
+        for ws in self._month_worksheets(newest_first=False):
+            with self._write_lock if apply else nullcontext():
+                updates = self._reclassify_sheet(ws, cache, result)
+                if updates:
+                    result["sheets"][ws.title] = len(updates)
+                    if apply:
+                        ws.batch_update(updates, value_input_option='USER_ENTERED')
+                        # Category totals changed: rebuild this month's rollup on next use
+                        month = self._worksheet_month(ws.title)
+                        self.rollup.invalidate_month(*month)
+                        self._mark_changed(ws.title)
+            if progress and updates is not None:
+                progress(ws.title, len(updates))
+        return result
+
+    def _reclassify_sheet(self, ws, cache, result):
+        """Changed category cells of one worksheet (None when it has no such columns);
+        scanned rows and transitions are counted into `result`."""
+        cols = self._columns_for(ws)
+        if "description" not in cols or "category" not in cols:
+            return None
+        desc_letter, cat_letter = _col_letter(cols["description"]), _col_letter(cols["category"])
+        ranges = [f"{desc_letter}2:{desc_letter}", f"{cat_letter}2:{cat_letter}"]
+        if "status" in cols:
+            status_letter = _col_letter(cols["status"])
+            ranges.append(f"{status_letter}2:{status_letter}")
+        descriptions, categories, *rest = ws.batch_get(ranges)
+        statuses = rest[0] if rest else []
+        count = max(len(descriptions), len(categories))
+
+        updates = []
+        for i in range(count):
+            # Soft-deleted rows are neither counted nor rewritten
+            if i < len(statuses) and statuses[i] and str(statuses[i][0]).strip() == schema.TOMBSTONE:
+                continue
+            result["rows"] += 1
+            desc = descriptions[i][0] if i < len(descriptions) and descriptions[i] else ""
+            current = categories[i][0] if i < len(categories) and categories[i] else ""
+            if not desc or current == "Thu nhập":
+                continue
+            if desc not in cache:
+                cache[desc] = classify_expense(desc)
+            new = cache[desc]
+            if new != current:
+                updates.append({"range": f"{cat_letter}{i + 2}", "values": [[new]]})
+                key = (current, new)
+                result["transitions"][key] = result["transitions"].get(key, 0) + 1
+        return updates
 
     def get_expenses(self, start_date=None, end_date=None, person=None):
         """Retrieve expenses across monthly worksheets."""
-        if not self._client: self._connect_to_sheets()
-        
         try:
-            spreadsheet = self._client.open(config.GOOGLE_SHEET_NAME)
-            all_data = []
-            final_header = ["ID", "Ngày", "Giờ", "Người", "Danh mục", "Số tiền", "Mô tả"]
-            
-            # Determine which worksheets to read
-            target_worksheets = []
-            if start_date and end_date:
-                # Collect months between start and end
-                curr = start_date
-                while curr <= end_date:
-                    name = self._get_worksheet_name(curr)
-                    if name not in [ws.title for ws in target_worksheets]:
-                        try:
-                            target_worksheets.append(spreadsheet.worksheet(name))
-                        except: pass
-                    # Next month
-                    if curr.month == 12: curr = curr.replace(year=curr.year+1, month=1)
-                    else: curr = curr.replace(month=curr.month+1)
+            return self._load_expenses(start_date, end_date, person)
+        except Exception as e:
+            logger.error(f"FATAL Error in get_expenses: {e}")
+            return _empty_frame()
+
+    def _load_expenses(self, start_date=None, end_date=None, person=None):
+        """Same as get_expenses, but lets Sheets errors propagate to the caller."""
+        spreadsheet = self._get_spreadsheet()
+
+        # Determine which worksheets to read (one metadata call)
+        by_title = {ws.title: ws for ws in spreadsheet.worksheets()}
+        target_worksheets = []
+        if start_date and end_date:
+            # Collect months between start and end (day 1 avoids replace() overflow on the 31st)
+            curr = start_date.replace(day=1)
+            while curr <= end_date:
+                name = self._get_worksheet_name(curr)
+                if name in by_title and by_title[name] not in target_worksheets:
+                    target_worksheets.append(by_title[name])
+                # Next month
+                if curr.month == 12: curr = curr.replace(year=curr.year+1, month=1)
+                else: curr = curr.replace(month=curr.month+1)
+        else:
+            # No specific range, try current month or all '<name> mm/yyyy' sheets (not restored backups)
+            current = by_title.get(self._get_worksheet_name(datetime.now()))
+            if current:
+                target_worksheets.append(current)
             else:
-                # No specific range, try current month or all sheets matching the prefix in config
-                prefix = config.GOOGLE_SHEET_NAME
-                try:
-                    target_worksheets.append(spreadsheet.worksheet(self._get_worksheet_name(datetime.now())))
-                except:
-                    # Fallback to all sheets starting with the config name
-                    for ws in spreadsheet.worksheets():
-                        if ws.title.startswith(prefix):
-                            target_worksheets.append(ws)
-
-            if not target_worksheets:
-                return pd.DataFrame()
-
-            for ws in target_worksheets:
-                rows = ws.get_all_values()
-                if len(rows) > 1:
-                    raw_header = [str(h).strip() for h in rows[0]]
-                    df_temp = pd.DataFrame(rows[1:], columns=raw_header)
-                    all_data.append(df_temp)
-            
-            if not all_data:
-                return pd.DataFrame()
-                
-            df = pd.concat(all_data, ignore_index=True)
-            
-            # Normalize headers to NFC and lowercase for comparison
-            def normalize_str(s):
-                if not s: return ""
-                return unicodedata.normalize('NFC', str(s)).strip().lower()
+                target_worksheets = [ws for title, ws in by_title.items() if self._worksheet_month(title)]
 
-            raw_header = [str(h).strip() for h in rows[0]]
-            normalized_header = [normalize_str(h) for h in raw_header]
-            data = rows[1:]
+        if not target_worksheets:
+            return _empty_frame()
 
-            # Map normalized headers to original ones
-            header_map = {normalize_str(h): h for h in raw_header}
-            
-            # Find columns using normalized names
-            # Prioritize exact match, then fallback to common variations
-            date_col = header_map.get("ngày hôm nay") or header_map.get("ngày") or header_map.get("date") or next((h for h in raw_header if "ngày" in normalize_str(h)), None)
-            amt_col = header_map.get("số tiền") or header_map.get("amount") or next((h for h in raw_header if normalize_str(h) == "số tiền"), None)
-            person_col = header_map.get("người") or header_map.get("person") or next((h for h in raw_header if normalize_str(h) == "người"), None)
-            desc_col = header_map.get("mô tả") or header_map.get("description") or next((h for h in raw_header if normalize_str(h) == "mô tả"), None)
-            cat_col = header_map.get("danh mục") or header_map.get("category") or next((h for h in raw_header if normalize_str(h) == "danh mục"), None)
-
-            # Fallback to absolute positions if names fail (ID=0, Date=1, Time=2, Person=3, Cat=4, Amount=5, Desc=6)
-            if not date_col and len(raw_header) > 1: date_col = raw_header[1]
-            if not amt_col and len(raw_header) > 5: amt_col = raw_header[5]
-            if not person_col and len(raw_header) > 3: person_col = raw_header[3]
-            if not desc_col and len(raw_header) > 6: desc_col = raw_header[6]
-            if not cat_col and len(raw_header) > 4: cat_col = raw_header[4]
-
-            # If essential columns are still not found (very unlikely now), return empty DataFrame
-            if not date_col or not amt_col:
-                logger.warning("Essential columns (Ngày, Số tiền) not found even with fallback.")
-                return pd.DataFrame()
-
-            df = pd.DataFrame(data, columns=raw_header)
+        all_data = [frame for frame in self._month_frames(target_worksheets).values() if not frame.empty]
+        if not all_data:
+            return _empty_frame()
             
-            # Standardization for date column
-            def standardize_date(d):
-                if not d or str(d).strip() == "": return pd.NaT # Use NaT for missing/invalid dates
-                try:
-                    d_str = str(d).strip()
-                    # Try to parse with multiple formats
-                    dt = pd.to_datetime(d_str, errors='coerce', format='%Y-%m-%d')
-                    if pd.isna(dt):
-                        dt = pd.to_datetime(d_str, errors='coerce', dayfirst=True)
-                    
-                    if not pd.isna(dt):
-                        return dt.normalize() # Strip time component
-                    return pd.NaT
-                except:
-                    return pd.NaT
-
-            # Apply standardization to create a helper column for matching
-            if date_col in df.columns:
-                df['__match_date'] = df[date_col].apply(standardize_date)
+        df = _compact_frame(pd.concat(all_data, ignore_index=True))
+        days = df['Ngày'].dt.normalize()
+        keep = pd.Series(True, index=df.index)
+
+        if start_date:
+            if isinstance(start_date, (date, datetime)):
+                s_dt = pd.Timestamp(start_date.year, start_date.month, start_date.day)
             else:
-                df['__match_date'] = pd.NaT # If date_col not found, all dates are invalid for filtering
+                s_dt = pd.to_datetime(start_date, errors='coerce', dayfirst=True)
+            if not pd.isna(s_dt):
+                keep &= days >= s_dt.normalize()
 
-            # Filter out rows with invalid dates
-            df = df.dropna(subset=['__match_date'])
-            
-            # Filter logic using ISO string comparison (bulletproof for YYYY-MM-DD)
-            if start_date:
-                if isinstance(start_date, (date, datetime)):
-                    s_dt = pd.Timestamp(start_date.year, start_date.month, start_date.day)
-                else:
-                    s_dt = pd.to_datetime(start_date, errors='coerce', dayfirst=True)
-                if not pd.isna(s_dt):
-                    s_dt = s_dt.normalize()
-                    df = df[df['__match_date'] >= s_dt]
-
-            if end_date:
-                if isinstance(end_date, (date, datetime)):
-                    e_dt = pd.Timestamp(end_date.year, end_date.month, end_date.day)
-                else:
-                    e_dt = pd.to_datetime(end_date, errors='coerce', dayfirst=True)
-                if not pd.isna(e_dt):
-                    e_dt = e_dt.normalize()
-                    df = df[df['__match_date'] <= e_dt]
-
-            if person and person_col and person_col in df.columns:
-                df = df[df[person_col].astype(str).str.strip().str.lower() == str(person).strip().lower()]
-
-            # Clean amounts for numeric use
-            if amt_col in df.columns:
-                df['Số tiền'] = df[amt_col].astype(str).str.replace(r'[^\d]', '', regex=True)
-                df['Số tiền'] = pd.to_numeric(df['Số tiền'], errors='coerce').fillna(0).astype(int)
+        if end_date:
+            if isinstance(end_date, (date, datetime)):
+                e_dt = pd.Timestamp(end_date.year, end_date.month, end_date.day)
             else:
-                df['Số tiền'] = 0 # Default to 0 if amount column is missing or invalid
+                e_dt = pd.to_datetime(end_date, errors='coerce', dayfirst=True)
+            if not pd.isna(e_dt):
+                keep &= days <= e_dt.normalize()
 
-            # Map important columns to standard names for the bot
-            # Ensure these columns exist, even if empty, for consistent output
-            df['Mô tả'] = df[desc_col] if desc_col and desc_col in df.columns else ''
-            df['Ngày'] = df[date_col] if date_col and date_col in df.columns else ''
-            df['Danh mục'] = df[cat_col] if cat_col and cat_col in df.columns else ''
-            
-            # Drop the temporary match date column
-            df = df.drop(columns=['__match_date'])
-            
-            return df
-            
-        except Exception as e:
-            logger.error(f"FATAL Error in get_expenses: {e}")
-            return pd.DataFrame()
+        if person:
+            keep &= df['Người'].astype(str).str.strip().str.lower() == str(person).strip().lower()
+
+        return df[keep].reset_index(drop=True)
+
+    def _fetch_month_frame(self, worksheet):
+        """Download and parse one month worksheet into the standard frame."""
+        rows = worksheet.get_all_values()
+        if len(rows) <= 1:
+            return _empty_frame()
+        columns = self._columns_for(worksheet, rows[0])
+        # If essential columns are not found (very unlikely), skip this sheet
+        if "date" not in columns or "amount" not in columns:
+            logger.warning(f"Essential columns (Ngày, Số tiền) not found in {worksheet.title}.")
+            return _empty_frame()
+        return _compact_frame(self._rows_to_frame(rows[1:], columns))
+
+    def _read_fingerprints(self, titles):
+        """title -> summary-block fingerprint (None without a readable block), in one API call."""
+        if not titles:
+            return {}
+        ranges = [async_sheets.a1(t, sheet_summary.FINGERPRINT_RANGE) for t in titles]
+        response = self._get_spreadsheet().values_batch_get(ranges, params={"valueRenderOption": "UNFORMATTED_VALUE"})
+        return {title: sheet_summary.parse_fingerprint(value_range.get("values", []))
+                for title, value_range in zip(titles, response.get("valueRanges", []))}
+
+    def _month_frames(self, worksheets):
+        """Parsed frames of month worksheets, {title: frame}, served from the frame cache.
 
-    def delete_expense(self, expense_id):
-        """Delete an expense by ID."""
+        One batch read of the summary-block fingerprints decides which months
+        to download: the ones not cached, the ones whose fingerprint moved
+        (edits by hand, other instances) and the ones without a block. The
+        fingerprint is read before the data, so a write racing the download
+        leaves a mismatch behind and the month is simply read again next time.
+        """
+        fingerprints = self._read_fingerprints([ws.title for ws in worksheets])
+        todo = [ws for ws in worksheets
+                if ws.title not in self._frame_cache or fingerprints.get(ws.title) is None
+                or self._frame_fingerprints.get(ws.title) != fingerprints[ws.title]]
+        if todo:
+            with ThreadPoolExecutor(max_workers=config.HISTORY_FETCH_WORKERS) as pool:
+                for ws, frame in zip(todo, pool.map(self._fetch_month_frame, todo)):
+                    self._frame_cache[ws.title] = frame
+                    self._frame_fingerprints[ws.title] = fingerprints.get(ws.title)
+        return {ws.title: self._frame_cache[ws.title] for ws in worksheets}
+
+    def export_state(self):
+        """Warm caches worth keeping across restarts (see snapshot.py)."""
+        frames = {t: f for t, f in list(self._frame_cache.items()) if self._frame_fingerprints.get(t) is not None}
+        return {"frames": frames, "fingerprints": {t: self._frame_fingerprints[t] for t in frames}}
+
+    def restore_state(self, state):
+        """Re-use snapshot frames whose worksheet has not changed since they were read.
+
+        Every candidate is checked with one values_batch_get of the summary
+        block's row count, live total and checksum; frames that do not match
+        (or whose sheet is gone) are dropped and re-read on demand. Returns
+        the number of frames restored.
+        """
+        frames = state.get("frames", {})
+        fingerprints = state.get("fingerprints", {})
+        existing = {ws.title for ws in self._month_worksheets()}
+        titles = [t for t in frames if t in fingerprints and t in existing]
+        restored = 0
+        for title, current in self._read_fingerprints(titles).items():
+            if current is not None and current == tuple(fingerprints[title]):
+                self._frame_cache[title] = frames[title]
+                self._frame_fingerprints[title] = current
+                restored += 1
+        return restored
+
+    def get_history(self, start_date=None, end_date=None):
+        """Expenses across many month worksheets, fetched concurrently.
+
+        Months come from the frame cache, re-read only when their
+        fingerprint moved (see _month_frames).
+        """
+        start_key = (start_date.year, start_date.month) if start_date else (0, 0)
+        end_key = (end_date.year, end_date.month) if end_date else (9999, 12)
+        worksheets = [ws for ws in self._month_worksheets(newest_first=False)
+                      if start_key <= self._worksheet_month(ws.title) <= end_key]
+
+        frames = [frame for frame in self._month_frames(worksheets).values() if not frame.empty]
+        if not frames:
+            return _empty_frame()
+        # concat of differing categoricals falls back to object; re-cast once
+        return _compact_frame(pd.concat(frames, ignore_index=True))
+
+    def _rows_to_frame(self, rows, columns):
+        """Build a frame with the standard column names from raw rows and a column map.
+
+        Soft-deleted rows are left out here, so every read path skips them.
+        """
+        rows = [r for r in rows if not _is_tombstone(r, columns)]
+        data = {}
+        for field, name in FRAME_COLUMNS.items():
+            idx = columns.get(field)
+            default = 'Bản thân' if field == "person" else ''
+            data[name] = [r[idx] if idx is not None and idx < len(r) else default for r in rows]
+        return pd.DataFrame(data)
+
+    @_serialized
+    def delete_expense(self, expense_id, actor=None):
+        """Soft-delete an expense by ID: one status-cell write, no row shift.
+
+        The row stays in the sheet (hidden from every read) until
+        compact_tombstones removes it; the delete is recorded in the undo log.
+        Sheets without a status column (column H used for something else)
+        get the row deleted outright instead.
+        """
         if not self._sheet: self._connect_to_sheets()
         
         try:
-            # Find the cell with the ID
-            cell = self._sheet.find(str(expense_id))
-            if cell:
-                self._sheet.delete_rows(cell.row)
+            cols = self._columns_for(self._sheet)
+            cell = self._sheet.find(str(expense_id), in_column=cols.get("id", 0) + 1)
+            if not cell:
+                return False
+            old_row = self._sheet.row_values(cell.row)
+            if "status" not in cols:
+                # Column H was already taken, so no status column: delete the row (no undo).
+                # Only A:H shift up, like compaction, so the summary block in J:L stays put
+                title = self._sheet.title
+                width = max(max(cols.values()) + 1, len(schema.CANONICAL_HEADER))
+                self._get_spreadsheet().batch_update({"requests": [{"deleteRange": {
+                    "range": {"sheetId": self._sheet.id, "startRowIndex": cell.row - 1, "endRowIndex": cell.row,
+                              "startColumnIndex": 0, "endColumnIndex": width},
+                    "shiftDimension": "ROWS",
+                }}]})
+                rows = (self.schema.get(title) or {}).get("rows")
+                if rows:
+                    self.schema.update(title, rows=rows - 1)
+                self._mark_changed(title)
+                self._rollup_remove_row(old_row, cols)
                 return True
-            return False
+            if _is_tombstone(old_row, cols):
+                return False
+            self._sheet.update_cell(cell.row, cols["status"] + 1, schema.TOMBSTONE)
+            self._mark_changed(self._sheet.title)
+            self._rollup_remove_row(old_row, cols)
+            self.undo_log.push(actor, self._sheet.title, expense_id)
+            return True
         except gspread.exceptions.CellNotFound:
             return False
         except Exception as e:
             logger.error(f"Error deleting: {e}")
             return False
 
+    @_serialized
+    def undo_delete(self, actor=None):
+        """Restore the actor's most recent soft delete.
+
+        Returns the restored record (same keys as add_expense) or None when
+        there is nothing to undo or the row was already compacted away.
+        """
+        entry = self.undo_log.pop(actor)
+        if not entry:
+            return None
+        try:
+            worksheet = self._worksheets.get(entry["sheet"]) or self._get_spreadsheet().worksheet(entry["sheet"])
+            cols = self._columns_for(worksheet)
+            cell = worksheet.find(entry["id"], in_column=cols.get("id", 0) + 1)
+            if not cell:
+                return None
+            row = worksheet.row_values(cell.row)
+            if not _is_tombstone(row, cols):
+                return None
+            worksheet.update_cell(cell.row, cols["status"] + 1, "")
+            self._mark_changed(worksheet.title)
+            self._rollup_add_row(row, cols)
+            key = self._rollup_row_key(row, cols)
+            def value(field):
+                idx = cols.get(field)
+                return row[idx] if idx is not None and idx < len(row) else ""
+            return {
+                "ID": entry["id"],
+                "Ngày": value("date"),
+                "Người": value("person") or "Bản thân",
+                "Danh mục": value("category"),
+                "Số tiền": key[3] if key else 0,
+                "Mô tả": value("description"),
+            }
+        except gspread.exceptions.WorksheetNotFound:
+            return None
+        except Exception as e:
+            logger.error(f"Error undoing delete: {e}")
+            return None
+
+    @_serialized
+    def compact_tombstones(self):
+        """Physically remove soft-deleted rows from every month worksheet.
+
+        Reads only the ID and status columns, merges adjacent tombstones into
+        ranges and deletes them bottom-up with batched deleteRange requests
+        (COMPACTION_BATCH_SIZE ranges per call), so earlier deletions never
+        shift rows still waiting to be removed. Only the data columns shift
+        up; the summary block in J:L stays where it is.
+
+        Rows can still move under us (edits by hand, another instance), so
+        before every batch after the first the two columns are read again;
+        when a row no longer holds the tombstone with the ID seen first, the
+        rest of that worksheet is left for the next run.
+        Returns {worksheet title: rows removed}.
+        """
+        removed = {}
+        spreadsheet = self._get_spreadsheet()
+        for ws in self._month_worksheets():
+            cols = self._columns_for(ws)
+            if "status" not in cols:
+                continue
+            id_letter, status_letter = _col_letter(cols.get("id", 0)), _col_letter(cols["status"])
+            ranges = [f"{id_letter}2:{id_letter}", f"{status_letter}2:{status_letter}"]
+            ids, statuses = ws.batch_get(ranges)
+            rows = [i + 2 for i, r in enumerate(statuses) if r and str(r[0]).strip() == schema.TOMBSTONE]
+            if not rows:
+                continue
+            expected = {row: _cell(ids, row) for row in rows}
+
+            # Contiguous runs as 0-based [start, end) row ranges, bottom-up
+            runs = []
+            for row in sorted(rows, reverse=True):
+                if runs and runs[-1][0] == row:
+                    runs[-1][0] = row - 1
+                else:
+                    runs.append([row - 1, row])
+            width = max(cols.values()) + 1
+            deleted = []
+            for i in range(0, len(runs), config.COMPACTION_BATCH_SIZE):
+                batch = runs[i:i + config.COMPACTION_BATCH_SIZE]
+                batch_rows = [row for start, end in batch for row in range(start + 1, end + 1)]
+                if i:
+                    # Rows above the ones just deleted keep their index unless someone else moved them
+                    ids_now, statuses_now = ws.batch_get(ranges)
+                    if any(_cell(ids_now, row) != expected[row] or _cell(statuses_now, row) != schema.TOMBSTONE
+                           for row in batch_rows):
+                        logger.warning(f"Rows of {ws.title} moved during compaction; the rest waits for the next run")
+                        break
+                spreadsheet.batch_update({"requests": [
+                    {"deleteRange": {
+                        "range": {"sheetId": ws.id, "startRowIndex": start, "endRowIndex": end, "startColumnIndex": 0, "endColumnIndex": width},
+                        "shiftDimension": "ROWS",
+                    }}
+                    for start, end in batch
+                ]})
+                deleted.extend(batch_rows)
+            if not deleted:
+                continue
+
+            row_count = (self.schema.get(ws.title) or {}).get("rows")
+            if row_count:
+                self.schema.update(ws.title, rows=row_count - len(deleted))
+            self._mark_changed(ws.title)
+            self.undo_log.discard(ws.title, [expected[row] for row in deleted if expected[row]])
+            removed[ws.title] = len(deleted)
+            logger.info(f"Compacted {len(deleted)} deleted rows from {ws.title}")
+        return removed
+
+    @_serialized
     def edit_expense(self, expense_id, new_amount=None, new_description=None):
         """Edit an expense by ID."""
         if not self._sheet: self._connect_to_sheets()
@@ -336,59 +1051,189 @@ class ExpenseManager:
             if not cell: return False
             
             row_idx = cell.row
+            cols = self._columns_for(self._sheet)
+            old_row = self._sheet.row_values(row_idx)
+            if _is_tombstone(old_row, cols): return False
+            new_row = list(old_row) + [""] * (max(cols.values()) + 1 - len(old_row))
             
             if new_amount is not None:
-                # Column 6 is "Số tiền" (F)
-                self._sheet.update_cell(row_idx, 6, new_amount)
+                self._sheet.update_cell(row_idx, cols["amount"] + 1, new_amount)
+                new_row[cols["amount"]] = new_amount
                 
             if new_description is not None:
-                # Column 7 is "Mô tả" (G)
-                self._sheet.update_cell(row_idx, 7, new_description)
-                # Recalculate Category - Column 5 is "Danh mục" (E)
+                self._sheet.update_cell(row_idx, cols["description"] + 1, new_description)
+                # Recalculate Category
                 new_category = classify_expense(new_description)
-                self._sheet.update_cell(row_idx, 5, new_category)
-                
+                self._sheet.update_cell(row_idx, cols["category"] + 1, new_category)
+                new_row[cols["category"]] = new_category
+            
+            self._rollup_remove_row(old_row, cols)
+            self._rollup_add_row(new_row, cols)
+            self._mark_changed(self._sheet.title)
             return True
         except Exception as e:
             logger.error(f"Error editing: {e}")
             return False
 
-    def get_monthly_summary(self, month=None, year=None, person=None):
-        """Get monthly stats using the robust get_expenses logic."""
-        now = datetime.now()
-        if month is None: month = now.month
-        if year is None: year = now.year
-        
-        # Calculate date range for the month
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(year, month + 1, 1) - timedelta(days=1)
-            
-        df = self.get_expenses(start_date=start_date, end_date=end_date, person=person)
-        
-        if df.empty: return None
-        
-        # We need "Danh mục" column. If missing, use "Other"
-        rows = self._sheet.get_all_values()
-        header = [str(h).strip().lower() for h in rows[0]]
-        cat_col = next((h for i, h in enumerate(rows[0]) if h.strip().lower() == "danh mục"), None)
-        
-        if cat_col and cat_col in df.columns:
-            summary = df.groupby(cat_col)['Số tiền'].sum().to_dict()
-        else:
-            summary = {"Khác": df['Số tiền'].sum()}
-            
+    def _rollup_row_key(self, row, cols):
+        """Extract (day, category, person, amount) from a raw sheet row, or None."""
+        def cell(field):
+            idx = cols.get(field)
+            return row[idx] if idx is not None and idx < len(row) else ""
+        day = _parse_day(cell("date"))
+        if pd.isna(day): return None
+        digits = re.sub(r'[^\d]', '', str(cell("amount")))
+        if not digits: return None
+        return day.strftime("%Y-%m-%d"), cell("category"), cell("person") or "Bản thân", int(digits)
+
+    def _rollup_add_row(self, row, cols):
+        key = self._rollup_row_key(row, cols)
+        if key: self.rollup.add(*key)
+
+    def _rollup_remove_row(self, row, cols):
+        key = self._rollup_row_key(row, cols)
+        if key: self.rollup.remove(*key)
+
+    def _ensure_rollup_month(self, year, month):
+        """Build the rollup for a month from the sheet the first time it is needed.
+
+        A loaded month is re-checked against the sheet's fingerprint at most
+        every ROLLUP_VERIFY_INTERVAL seconds and rebuilt when it was edited
+        elsewhere (by hand, another instance, a lost save).
+        """
+        title = self._get_worksheet_name(date(year, month, 1))
+        if self.rollup.has_month(year, month):
+            if not self.rollup.check_due(year, month):
+                return
+            try:
+                if self.rollup.check_month(year, month, self._read_fingerprints([title]).get(title)):
+                    return
+            except Exception as e:
+                logger.warning(f"Could not check rollup of {month}/{year}: {e}")
+                return
+            logger.info(f"Rollup of {month}/{year} is out of date; rebuilding")
+        start_date, end_date = _month_range(year, month)
+        df = self._load_expenses(start_date=start_date, end_date=end_date)
+        rows = []
+        if not df.empty:
+            days = df['Ngày'].dt.strftime("%Y-%m-%d")
+            for day, category, person, amount in zip(days, df['Danh mục'], df['Người'], df['Số tiền']):
+                rows.append((day, category, person or "Bản thân", int(amount)))
+        # The frame cache read the fingerprint just before the rows
+        self.rollup.build_month(year, month, rows, self._frame_fingerprints.get(title))
+
+    def get_period_summary(self, start_date, end_date, person=None):
+        """Income/spending totals between two dates, answered from the rollup cube."""
+        if isinstance(start_date, datetime): start_date = start_date.date()
+        if isinstance(end_date, datetime): end_date = end_date.date()
+
+        curr = start_date.replace(day=1)
+        while curr <= end_date:
+            self._ensure_rollup_month(curr.year, curr.month)
+            if curr.month == 12: curr = curr.replace(year=curr.year+1, month=1)
+            else: curr = curr.replace(month=curr.month+1)
+
+        result = self.rollup.query(start_date, end_date, person=person)
+        summary = result['categories']
         income = summary.get("Thu nhập", 0)
         total_spent = sum(v for k, v in summary.items() if k != "Thu nhập")
-        
         return {
             "categories": summary,
+            "persons": result['persons'],
             "total_spent": int(total_spent),
             "income": int(income),
             "net": int(income - total_spent),
-            "month": month,
-            "year": year,
             "person": person
         }
+
+    def get_month_total(self, category, person=None, month=None, year=None):
+        """Running total of one category this month (or the given one), from the rollup."""
+        now = datetime.now()
+        year, month = year or now.year, month or now.month
+        self._ensure_rollup_month(year, month)
+        return self.rollup.month_total(year, month, category, person)
+
+    def check_budgets(self, record_date, category, person, amount):
+        """Budget alerts triggered by a just-recorded expense (no sheet reads once the month is loaded)."""
+        if category == "Thu nhập":
+            return []
+        try:
+            self._ensure_rollup_month(record_date.year, record_date.month)
+            return budgets.evaluate(self.budgets, self.rollup, record_date.year, record_date.month, category, person, amount)
+        except Exception as e:
+            logger.error(f"Error checking budgets: {e}")
+            return []
+
+    def _read_summary_block(self, year, month):
+        """(worksheet, parsed block or None) for a month with one small range read; (None, None) if no sheet."""
+        title = self._get_worksheet_name(date(year, month, 1))
+        try:
+            worksheet = self._worksheets.get(title) or self._get_spreadsheet().worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            return None, None
+        values = worksheet.get(sheet_summary.BLOCK_RANGE, value_render_option="UNFORMATTED_VALUE")
+        return worksheet, (sheet_summary.parse_block(values), values)
+
+    def get_monthly_summary(self, month=None, year=None, person=None):
+        """Get monthly stats.
+
+        From the rollup cube when the month is loaded; otherwise from the
+        sheet's SUMIFS block (one range read) when it is consistent, and only
+        then by aggregating the downloaded rows, which also refreshes a
+        missing or stale block.
+        """
+        now = datetime.now()
+        if month is None: month = now.month
+        if year is None: year = now.year
+
+        refresh = None
+        if person is None and not self.rollup.has_month(year, month):
+            try:
+                worksheet, found = self._read_summary_block(year, month)
+                if worksheet is None:
+                    return None
+                block, values = found
+                if sheet_summary.is_consistent(block):
+                    if not block["total"]:
+                        return None
+                    return {
+                        "categories": {k: v for k, v in block["categories"].items() if v},
+                        "persons": {k: v for k, v in block["persons"].items() if v},
+                        "total_spent": block["spent"],
+                        "income": block["income"],
+                        "net": block["income"] - block["spent"],
+                        "person": None,
+                        "month": month,
+                        "year": year,
+                    }
+                # Rewrite our own block when stale; never overwrite foreign content in J2
+                if block or not values:
+                    refresh = (worksheet, block["height"] if block else 0)
+            except Exception as e:
+                logger.warning(f"Summary block unavailable for {month}/{year}: {e}")
+
+        start_date, end_date = _month_range(year, month)
+        try:
+            summary = self.get_period_summary(start_date, end_date, person=person)
+        except Exception as e:
+            logger.error(f"Error building monthly summary: {e}")
+            return None
+
+        if refresh:
+            worksheet, height = refresh
+            try:
+                # SUMIFS matches case-insensitively, so one row per person regardless of spelling
+                persons = {"bản thân": "Bản thân"}
+                for name in summary["persons"]:
+                    persons.setdefault(str(name).strip().lower(), str(name).strip())
+                persons = list(persons.values())
+                categories = sheet_summary.block_categories(summary["categories"])
+                sheet_summary.write_block(worksheet, self._columns_for(worksheet), persons,
+                                          previous_height=height, categories=categories)
+            except Exception as e:
+                logger.warning(f"Could not refresh summary block of {worksheet.title}: {e}")
+        
+        if not summary['categories']: return None
+        
+        summary.update({"month": month, "year": year})
+        return summary
@@ -0,0 +1,226 @@
+import csv
+import hashlib
+import logging
+import unicodedata
+
+import pandas as pd
+
+import config
+from categories import classify_expense
+
+logger = logging.getLogger(__name__)
+
+INCOME_CATEGORY = "Thu nhập"
+
+# Error for a statement whose header row cannot be mapped (CSV and XLSX alike)
+UNRECOGNIZED_COLUMNS = "Không nhận diện được cột ngày / mô tả / số tiền"
+
+# Statement header spellings (normalized: NFC + lowercase), checked as substrings.
+# "type" comes first so a "Debit/Credit" indicator column is not taken for an amount column.
+COLUMN_HINTS = {
+    "type": ["loại giao dịch", "loại gd", "nợ/có", "debit/credit", "dr/cr", "transaction type", "type"],
+    "date": ["ngày giao dịch", "ngày", "ngay", "date", "thời gian"],
+    "description": ["mô tả", "nội dung", "diễn giải", "description", "details", "narrative", "remark"],
+    "debit": ["ghi nợ", "số tiền ghi nợ", "debit", "rút", "withdrawal", "tiền ra"],
+    "credit": ["ghi có", "số tiền ghi có", "credit", "nạp", "deposit", "tiền vào"],
+    "amount": ["số tiền", "amount", "so tien"],
+}
+
+# Type column values (normalized) that mark money coming in
+CREDIT_TYPES = {"c", "cr", "credit", "có", "ghi có", "tiền vào", "nạp tiền", "in", "+"}
+
+
+def _normalize(s):
+    return unicodedata.normalize('NFC', str(s or "")).strip().lower()
+
+
+def detect_statement_columns(header):
+    """Map date/description/amount (or debit + credit) to header names, or None if unusable."""
+    normalized = {_normalize(h): h for h in header if h is not None}
+    found = {}
+    for field, hints in COLUMN_HINTS.items():
+        for hint in hints:
+            match = next((orig for norm, orig in normalized.items() if hint in norm and orig not in found.values()), None)
+            if match is not None:
+                found[field] = match
+                break
+    if "date" not in found or "description" not in found:
+        return None
+    if "amount" not in found and not ("debit" in found or "credit" in found):
+        return None
+    return found
+
+
+def parse_amounts(series):
+    """Vectorized '1.234.567', '1,234,567.00', '-50000' -> signed int (NaN-safe).
+
+    Numeric cells (XLSX) are taken as numbers: 150000.0 must not become 1500000.
+    """
+    numeric = series.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+    text = series.fillna("").astype(str).str.strip()
+    negative = text.str.startswith("-") | text.str.startswith("(")
+    # Drop a 1-2 digit decimal tail, then every separator
+    text = text.str.replace(r'[.,]\d{1,2}$', '', regex=True).str.replace(r'[^\d]', '', regex=True)
+    amounts = pd.to_numeric(text, errors='coerce').fillna(0).astype("int64")
+    amounts = amounts.where(~negative, -amounts)
+    if numeric.any():
+        amounts[numeric] = pd.to_numeric(series[numeric], errors='coerce').fillna(0).round().astype("int64")
+    return amounts
+
+
+def has_signed_amounts(df, columns):
+    """True when a single amount column carries the direction in its sign (some amounts are negative)."""
+    return "amount" in columns and bool((parse_amounts(df[columns["amount"]]) < 0).any())
+
+
+def parse_dates(series):
+    """Vectorized ISO-then-day-first date parsing."""
+    text = series.astype(str).str.strip()
+    parsed = pd.to_datetime(text, errors='coerce', format='%Y-%m-%d')
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(text[missing], errors='coerce', dayfirst=True)
+    return parsed
+
+
+def normalize_chunk(df, columns, signed_amounts=False):
+    """Statement rows -> frame of date, amount (>0), description, income flag.
+
+    The direction comes from a type column when there is one, else from
+    separate debit/credit columns, else from the sign of a single amount
+    column when the statement uses signs (signed_amounts); unsigned amounts
+    without any of these are spending.
+    """
+    if "amount" in columns:
+        signed = parse_amounts(df[columns["amount"]])
+        income = signed > 0 if signed_amounts else pd.Series(False, index=df.index)
+    else:
+        debit = parse_amounts(df[columns["debit"]]).abs() if "debit" in columns else 0
+        credit = parse_amounts(df[columns["credit"]]).abs() if "credit" in columns else 0
+        signed = credit - debit
+        income = signed > 0
+    if "type" in columns:
+        income = df[columns["type"]].map(_normalize).isin(CREDIT_TYPES)
+    out = pd.DataFrame({
+        "date": parse_dates(df[columns["date"]]),
+        "amount": signed.abs(),
+        "income": income,
+        "description": df[columns["description"]].fillna("").astype(str).str.strip(),
+    })
+    return out[out["date"].notna() & (out["amount"] > 0)]
+
+
+def classify_bulk(descriptions, income, cache):
+    """Classify each distinct description once; income rows are always 'Thu nhập'."""
+    for desc in descriptions.unique():
+        if desc not in cache:
+            cache[desc] = classify_expense(desc)
+    categories = descriptions.map(cache)
+    return categories.where(~income, INCOME_CATEGORY)
+
+
+def iter_statement_chunks(path, chunk_size=None):
+    """Yield the statement as DataFrames of at most chunk_size rows (flat memory)."""
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    if path.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = None
+            buffer = []
+            for row in rows:
+                if header is None:
+                    # Statements often start with a title block; the header is the first row we can map
+                    if row and detect_statement_columns([str(c) if c is not None else "" for c in row]):
+                        header = [str(c) if c is not None else f"col{i}" for i, c in enumerate(row)]
+                    continue
+                buffer.append(["" if c is None else c for c in row[:len(header)]])
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame(buffer, columns=header)
+                    buffer = []
+            if header is None:
+                # Same reply as a CSV without a mappable header, not "0 rows imported"
+                raise ValueError(UNRECOGNIZED_COLUMNS)
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header)
+        finally:
+            workbook.close()
+        return
+
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(8192)
+    # Skip the title block the same way as for XLSX: the header is the first line we can map
+    found = _find_csv_header(sample.splitlines())
+    if found:
+        skip, delimiter = found
+    else:
+        skip = 0
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+        except csv.Error:
+            delimiter = ","
+    for chunk in pd.read_csv(path, sep=delimiter, dtype=str, chunksize=chunk_size, encoding="utf-8-sig",
+                             skiprows=skip, on_bad_lines="skip"):
+        yield chunk
+
+
+def _find_csv_header(lines):
+    """(line index, delimiter) of the first line that maps as a statement header, or None."""
+    for index, line in enumerate(lines):
+        for delimiter in ",;\t":
+            cells = next(csv.reader([line], delimiter=delimiter), [])
+            if len(cells) > 1 and detect_statement_columns(cells):
+                return index, delimiter
+    return None
+
+
+def content_id(day, amount, income, description, seen):
+    """Content-hash ID; identical lines in one statement get an occurrence suffix."""
+    base = f"{day:%Y-%m-%d}|{amount}|{int(income)}|{_normalize(description)}"
+    seen[base] = seen.get(base, 0) + 1
+    digest = hashlib.sha1(f"{base}|{seen[base]}".encode("utf-8")).hexdigest()[:16]
+    return f"h{digest}"
+
+
+def import_statement(path, expense_mgr, person="Bản thân", progress=None):
+    """Stream a CSV/XLSX statement into the month worksheets.
+
+    Each chunk is classified in bulk, deduplicated by content hash against
+    existing sheet IDs and written with one append per month worksheet.
+    `progress(rows_read, rows_written)` is called after every chunk.
+    Returns (rows_read, rows_written, rows_skipped).
+    """
+    columns = None
+    signed_amounts = False
+    category_cache = {}
+    seen = {}
+    read = written = 0
+    for chunk in iter_statement_chunks(path):
+        if columns is None:
+            columns = detect_statement_columns(list(chunk.columns))
+            if columns is None:
+                raise ValueError(UNRECOGNIZED_COLUMNS)
+            # One sign convention per statement, decided on the first chunk
+            signed_amounts = has_signed_amounts(chunk, columns)
+        rows = normalize_chunk(chunk, columns, signed_amounts)
+        read += len(chunk)
+        if rows.empty:
+            continue
+        rows = rows.assign(category=classify_bulk(rows["description"], rows["income"], category_cache))
+
+        records = [
+            {
+                "ID": content_id(day, amount, income, desc, seen),
+                "amount": int(amount),
+                "description": desc,
+                "person": person,
+                "category": category,
+                "date": day.to_pydatetime(),
+            }
+            for day, amount, income, desc, category in zip(rows["date"], rows["amount"], rows["income"], rows["description"], rows["category"])
+        ]
+        written += len(expense_mgr.add_expenses_batch(records))
+        if progress:
+            progress(read, written)
+    return read, written, read - written
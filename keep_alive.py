@@ -1,8 +1,14 @@
-from flask import Flask
+import hmac
+from flask import Flask, abort, jsonify, request
 from threading import Thread
 
+import config
+
 app = Flask('')
 
+# Callable returning a dict of runtime metrics, registered by the bot
+metrics_provider = None
+
 @app.route('/')
 def home():
     return "Mira dậy rồi ạ!"    
@@ -11,6 +17,17 @@ def home():
 def health():
     return "OK"
 
+@app.route('/metrics')
+def metrics():
+    # Only served with METRICS_TOKEN set, as "Authorization: Bearer <token>" or ?token=<token>
+    if not config.METRICS_TOKEN or metrics_provider is None:
+        abort(404)
+    header = request.headers.get("Authorization", "")
+    token = header[len("Bearer "):] if header.startswith("Bearer ") else request.args.get("token", "")
+    if not hmac.compare_digest(token.encode(), config.METRICS_TOKEN.encode()):
+        abort(403)
+    return jsonify(metrics_provider())
+
 def run():
     app.run(host='0.0.0.0', port=8080)
 
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: # Windows: leases still expire, but the read-modify-write is not locked
+    fcntl = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryLeaseStore:
+    """In-process lease store; stand-in for a shared backend (and for local testing)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases = {} # name -> (holder, expires_at)
+
+    def acquire(self, name, holder, ttl):
+        """Take or renew the lease if it is free, expired or already ours."""
+        now = time.time()
+        with self._lock:
+            current, expires_at = self._leases.get(name, (None, 0))
+            if current not in (None, holder) and expires_at > now:
+                return False
+            self._leases[name] = (holder, now + ttl)
+            return True
+
+    def release(self, name, holder):
+        with self._lock:
+            if self._leases.get(name, (None, 0))[0] == holder:
+                del self._leases[name]
+
+    def holder(self, name):
+        current, expires_at = self._leases.get(name, (None, 0))
+        return current if expires_at > time.time() else None
+
+
+class FileLeaseStore:
+    """Leases as small JSON files, updated under an exclusive flock.
+
+    Works for every instance that shares the same disk (e.g. the old and
+    new process during a redeploy on one host).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.lease")
+
+    @contextmanager
+    def _locked(self, name):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{name}.lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, name):
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("holder"), float(data.get("expires_at", 0))
+        except (OSError, ValueError):
+            return None, 0
+
+    def _write(self, name, holder, expires_at):
+        tmp_path = f"{self._path(name)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"holder": holder, "expires_at": expires_at}, f)
+        os.replace(tmp_path, self._path(name))
+
+    def acquire(self, name, holder, ttl):
+        now = time.time()
+        with self._locked(name):
+            current, expires_at = self._read(name)
+            if current not in (None, holder) and expires_at > now:
+                return False
+            self._write(name, holder, now + ttl)
+            return True
+
+    def release(self, name, holder):
+        with self._locked(name):
+            if self._read(name)[0] == holder:
+                os.remove(self._path(name))
+
+    def holder(self, name):
+        current, expires_at = self._read(name)
+        return current if expires_at > time.time() else None
+
+
+class Lease:
+    """Leadership of one named lease, kept alive by calling renew() every few seconds.
+
+    Only the leader runs scheduled jobs and writes to Sheets; a follower
+    loses nothing by polling renew() until the previous leader releases the
+    lease or lets it expire.
+    """
+
+    def __init__(self, store, name="bot", holder=None, ttl=None):
+        self.store = store
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl or config.LEADER_LEASE_TTL
+        self._expires_at = 0
+
+    @property
+    def is_leader(self):
+        return time.time() < self._expires_at
+
+    def renew(self):
+        """Acquire or extend the lease. Returns True while this instance is the leader."""
+        was_leader = self.is_leader
+        started = time.time()
+        try:
+            acquired = self.store.acquire(self.name, self.holder, self.ttl)
+        except Exception as e:
+            logger.error(f"Lease renewal failed: {e}")
+            acquired = False
+        # Count the TTL from before the store call so we never believe in a lease longer than the store does
+        self._expires_at = started + self.ttl if acquired else 0
+        if acquired and not was_leader:
+            logger.info(f"Became leader ({self.holder})")
+        elif was_leader and not acquired:
+            logger.warning(f"Lost leadership ({self.holder})")
+        return acquired
+
+    def release(self):
+        if self._expires_at:
+            self._expires_at = 0
+            try:
+                self.store.release(self.name, self.holder)
+            except Exception as e:
+                logger.warning(f"Lease release failed: {e}")
+
+
+def set_writable(stores, writable):
+    """Let only the leader write local JSON state (rollup, schema, budgets, undo, recurring).
+
+    Followers keep their changes in memory, so they never overwrite the
+    leader's files; on promotion each store first reloads what the previous
+    leader saved.
+    """
+    for store in stores:
+        if writable and store.read_only:
+            store.reload()
+        store.read_only = not writable
+
+
+class WriteSpool:
+    """Expense records forwarded by followers, one JSON file each, drained by the leader."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def put(self, record):
+        """Queue a record for add_expenses_batch ("date" may be a datetime)."""
+        os.makedirs(self.directory, exist_ok=True)
+        payload = dict(record)
+        if isinstance(payload.get("date"), datetime):
+            payload["date"] = payload["date"].strftime("%Y-%m-%d %H:%M:%S")
+        name = f"{time.time_ns()}-{os.getpid()}-{payload['ID']}.json"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def pending(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+
+    def drain(self, write_batch):
+        """Pass every queued record to write_batch(records) in one call, then delete them.
+
+        Files are only removed after the write succeeds; replays are safe
+        because add_expenses_batch skips IDs already in the sheet.
+        """
+        names = self.pending()
+        if not names:
+            return 0
+        records = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable spool file {name}: {e}")
+                continue
+            if record.get("date"):
+                record["date"] = datetime.strptime(record["date"], "%Y-%m-%d %H:%M:%S")
+            records.append(record)
+        if records:
+            write_batch(records)
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        return len(records)
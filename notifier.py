@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Broadcaster:
+    """Deliver one prepared message to many chats concurrently.
+
+    A global semaphore bounds the number of in-flight sends and every chat
+    gets its own lock + minimum interval, so Telegram's per-chat flood limits
+    are respected even when several jobs target the same user.
+    """
+
+    def __init__(self, max_concurrency=None, per_chat_interval=None):
+        self.max_concurrency = max_concurrency or config.BROADCAST_CONCURRENCY
+        self.per_chat_interval = per_chat_interval if per_chat_interval is not None else config.PER_CHAT_SEND_INTERVAL
+        self._semaphore = None
+        self._chat_locks = {}
+        self._last_sent = {}
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running application loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _throttle(self, chat_id):
+        """Sleep until this chat is allowed to receive the next message."""
+        wait = self._last_sent.get(chat_id, 0) + self.per_chat_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_sent[chat_id] = time.monotonic()
+
+    async def send(self, bot, chat_id, text, **kwargs):
+        """Send a message to one chat, honouring rate limits. Returns True on success."""
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            for attempt in range(2):
+                await self._throttle(chat_id)
+                try:
+                    async with self._get_semaphore():
+                        await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                    return True
+                except RetryAfter as e:
+                    delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                    logger.warning(f"Flood control for {chat_id}, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    logger.error(f"Error sending message to {chat_id}: {e}")
+                    return False
+        return False
+
+    async def broadcast(self, bot, chat_ids, text, **kwargs):
+        """Send the same text to every chat concurrently. Returns the number delivered."""
+        results = await asyncio.gather(*(self.send(bot, chat_id, text, **kwargs) for chat_id in chat_ids))
+        return sum(1 for ok in results if ok)
@@ -0,0 +1,99 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import MessageLimit
+
+import config
+
+CALLBACK_PREFIX = "pg"
+
+
+def render_expense_lines(df, with_id=False):
+    """Render one line per row with vectorized string ops (no iterrows)."""
+    if df.empty:
+        return []
+    sign = pd.Series(np.where(df['Danh mục'] == "Thu nhập", "➕", "➖"), index=df.index)
+    amount = df['Số tiền'].map("{:,}".format)
+    lines = sign + " " + df['Ngày'].dt.strftime('%Y-%m-%d')
+    if with_id:
+        lines = lines + " | ID: `" + df['ID'].astype(str) + "`"
+    lines = lines + " | " + amount + " đ: " + df['Mô tả'].astype(str)
+    return lines.tolist()
+
+
+def split_pages(lines, budget, max_rows):
+    """Greedy page boundaries so each page stays under `budget` characters."""
+    pages, current, size = [], [], 0
+    for line in lines:
+        line = line[:budget]
+        cost = len(line) + 1
+        if current and (size + cost > budget or len(current) >= max_rows):
+            pages.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += cost
+    if current:
+        pages.append(current)
+    return pages
+
+
+class ReportPaginator:
+    """Cache of paged query results addressed by an opaque cursor.
+
+    A report is rendered and split once; "next/prev" callbacks only look the
+    page up here, so browsing a large result set costs a single query.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, page_rows=None):
+        self.max_entries = max_entries or config.PAGINATION_CACHE_SIZE
+        self.ttl = ttl or config.PAGINATION_TTL
+        self.page_rows = page_rows or config.PAGINATION_PAGE_ROWS
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, header, lines, footer=""):
+        """Store a report and return (cursor, total_pages)."""
+        # Leave room for header, footer and the page indicator
+        budget = MessageLimit.MAX_TEXT_LENGTH - len(header) - len(footer) - 64
+        pages = split_pages(lines, budget, self.page_rows) or [[]]
+        cursor = secrets.token_urlsafe(6)
+        with self._lock:
+            self._entries[cursor] = {"header": header, "footer": footer, "pages": pages, "created": time.monotonic()}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cursor, len(pages)
+
+    def get(self, cursor, page):
+        """Return (text, total_pages) for a page, or None if the cursor expired."""
+        with self._lock:
+            entry = self._entries.get(cursor)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["created"] > self.ttl:
+                del self._entries[cursor]
+                return None
+            self._entries.move_to_end(cursor)
+        pages = entry["pages"]
+        page = max(0, min(page, len(pages) - 1))
+        text = entry["header"] + "\n".join(pages[page])
+        if len(pages) > 1:
+            text += f"\n\n📄 Trang {page + 1}/{len(pages)}"
+        if entry["footer"]:
+            text += "\n" + entry["footer"]
+        return text, len(pages)
+
+    def keyboard(self, cursor, page, total):
+        """Inline prev/next buttons, or None for a single page."""
+        if total <= 1:
+            return None
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀️ Trước", callback_data=f"{CALLBACK_PREFIX}:{cursor}:{page - 1}"))
+        if page < total - 1:
+            buttons.append(InlineKeyboardButton("Sau ▶️", callback_data=f"{CALLBACK_PREFIX}:{cursor}:{page + 1}"))
+        return InlineKeyboardMarkup([buttons])
@@ -0,0 +1,144 @@
+import cProfile
+import logging
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Event loop plumbing that would otherwise top every cumulative ranking
+_LOOP_FRAMES = ("asyncio", "selectors.py")
+# Telegram's maximum message length
+MESSAGE_LIMIT = 4096
+# Per-call timing lines listed before the rest are summarised
+MAX_CALL_LINES = 30
+
+
+class HandlerProfiler:
+    """cProfile (and optionally tracemalloc) over the next N handler invocations.
+
+    While idle the only cost per update is reading `active`. Once armed,
+    the profiler is enabled when the first handler starts and disabled when
+    no profiled handler is running, so concurrent handlers share one
+    session. Work pushed to threads with asyncio.to_thread is not captured;
+    cProfile only follows the event loop thread.
+    """
+
+    def __init__(self, top=15):
+        self.top = top
+        self.remaining = 0
+        self.chat_id = None
+        self.with_memory = False
+        self._profile = None
+        self._depth = 0
+        self._calls = [] # (handler name, wall seconds)
+        self._memory_started = False
+
+    @property
+    def active(self):
+        return self.remaining > 0
+
+    def arm(self, count, chat_id, with_memory=False):
+        self.remaining = count
+        self.chat_id = chat_id
+        self.with_memory = with_memory
+        self._profile = cProfile.Profile()
+        self._calls = []
+
+    def disarm(self):
+        if self._depth:
+            self._profile.disable()
+            self._depth = 0
+        self._stop_memory()
+        self.remaining = 0
+        self._profile = None
+
+    def _stop_memory(self):
+        snapshot = None
+        if self._memory_started:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._memory_started = False
+        return snapshot
+
+    async def run(self, name, handler, bot):
+        """Await handler() under the profiler; send the report after the last counted call."""
+        profile = self._profile
+        if self._depth == 0:
+            if self.with_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._memory_started = True
+            profile.enable()
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            return await handler()
+        finally:
+            if profile is self._profile: # not disarmed meanwhile
+                self._calls.append((name, time.perf_counter() - started))
+                self._depth -= 1
+                self.remaining -= 1
+                if self._depth == 0:
+                    profile.disable()
+                    if self.remaining <= 0:
+                        await self._finish(bot)
+
+    def _hotspots(self, profile):
+        stats = pstats.Stats(profile)
+        ranked = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        lines = []
+        for (filename, line, func), (_, calls, own, cumulative, _) in ranked:
+            if any(part in filename for part in _LOOP_FRAMES) or "select." in func or "_contextvars" in func:
+                continue
+            if len(lines) >= self.top:
+                break
+            where = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{cumulative:7.3f}s {own:7.3f}s {calls:6d}  {where} {func}")
+        return lines
+
+    def _report(self, calls, hotspots, memory):
+        """Markdown report; every name sits inside a code block (a bare `_` would open
+        an entity), and hotspot lines are dropped until it fits one message."""
+        memory_block = ""
+        if memory:
+            memory_block = "🧠 **Bộ nhớ (top 5):**\n```\n"
+            for stat in memory.statistics("lineno")[:5]:
+                frame = stat.traceback[0]
+                memory_block += f"{stat.size / 1024:8.1f} KiB {os.path.basename(frame.filename)}:{frame.lineno}\n"
+            memory_block += "```"
+        call_lines = [f"{name}: {seconds * 1000:.0f} ms" for name, seconds in calls[:MAX_CALL_LINES]]
+        if len(calls) > MAX_CALL_LINES:
+            call_lines.append(f"... +{len(calls) - MAX_CALL_LINES}")
+
+        while True:
+            report = (
+                "🔬 **PROFILE**\n"
+                "```\n" + "\n".join(call_lines) + "\n```\n"
+                "```\n    cum     self  calls  function\n" + "\n".join(hotspots) + "\n```\n"
+                + memory_block
+            )
+            if len(report) <= MESSAGE_LIMIT or not hotspots:
+                return report
+            hotspots = hotspots[:-1]
+
+    async def _finish(self, bot):
+        profile, chat_id, calls = self._profile, self.chat_id, self._calls
+        memory = self._stop_memory()
+        self.remaining = 0
+        self._profile = None
+
+        try:
+            await bot.send_message(chat_id, self._report(calls, self._hotspots(profile), memory), parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Could not send profile report: {e}")
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "profile.pstats")
+                profile.dump_stats(path)
+                with open(path, "rb") as f:
+                    await bot.send_document(chat_id, document=f, filename="profile.pstats",
+                                            caption="Mở bằng: python -m pstats profile.pstats")
+        except Exception as e:
+            logger.error(f"Could not send profile data: {e}")
@@ -0,0 +1,148 @@
+import calendar
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Schedule kinds: "monthly" (param = day of month), "weekly" (param = weekday, 0 = Monday),
+# "every" (param = interval in days, counted from the rule's start date)
+SCHEDULES = ("monthly", "weekly", "every")
+
+WEEKDAY_NAMES = ["t2", "t3", "t4", "t5", "t6", "t7", "cn"]
+
+
+def _to_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if isinstance(value, str) else value
+
+
+def occurrences(rule, until):
+    """Due dates of a rule after its last run, up to and including `until`."""
+    start = _to_date(rule["start"])
+    last_run = _to_date(rule["last_run"]) if rule.get("last_run") else start - timedelta(days=1)
+    day = max(start, last_run + timedelta(days=1))
+    param = int(rule["param"])
+    found = []
+    while day <= until:
+        if rule["schedule"] == "monthly":
+            # Day 31 falls back to the last day of shorter months
+            if day.day == min(param, calendar.monthrange(day.year, day.month)[1]):
+                found.append(day)
+        elif rule["schedule"] == "weekly":
+            if day.weekday() == param:
+                found.append(day)
+        elif rule["schedule"] == "every":
+            if (day - start).days % param == 0:
+                found.append(day)
+        day += timedelta(days=1)
+    return found
+
+
+def occurrence_id(rule, day):
+    """Deterministic sheet ID for one occurrence, so replays are deduplicated like update_ids."""
+    return f"r{rule['id']}-{day.strftime('%Y%m%d')}"
+
+
+def describe(rule):
+    if rule["schedule"] == "monthly":
+        return f"ngày {rule['param']} hàng tháng"
+    if rule["schedule"] == "weekly":
+        return f"{WEEKDAY_NAMES[int(rule['param'])].upper()} hàng tuần"
+    return f"mỗi {rule['param']} ngày"
+
+
+class RecurringStore:
+    """Recurring transaction rules, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.read_only = False # followers keep changes in memory (see leader.set_writable)
+        self._lock = threading.Lock()
+        self._data = {"next_id": 1, "rules": []}
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._data = {"next_id": 1, "rules": []}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._data = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Could not load recurring rules from {self.path}: {e}")
+
+    def _save(self):
+        if self.read_only:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def rules(self):
+        return list(self._data["rules"])
+
+    def add(self, schedule, param, amount, description, person="Bản thân", start=None):
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule: {schedule}")
+        start = start or date.today()
+        with self._lock:
+            rule = {
+                "id": self._data["next_id"],
+                "schedule": schedule,
+                "param": int(param),
+                "amount": int(amount),
+                "description": description,
+                "person": person,
+                "start": start.strftime("%Y-%m-%d"),
+                "last_run": None,
+            }
+            self._data["next_id"] += 1
+            self._data["rules"].append(rule)
+            self._save()
+            return rule
+
+    def remove(self, rule_id):
+        with self._lock:
+            before = len(self._data["rules"])
+            self._data["rules"] = [r for r in self._data["rules"] if r["id"] != rule_id]
+            if len(self._data["rules"]) != before:
+                self._save()
+                return True
+            return False
+
+    def mark_run(self, rule_ids, day):
+        with self._lock:
+            for rule in self._data["rules"]:
+                if rule["id"] in rule_ids:
+                    rule["last_run"] = day.strftime("%Y-%m-%d")
+            self._save()
+
+
+def materialize(store, expense_mgr, today=None):
+    """Write every due occurrence (including missed ones) in batched appends.
+
+    Returns the records actually written; occurrences already in the sheet
+    are skipped by their deterministic IDs.
+    """
+    today = today or date.today()
+    rules = store.rules
+    records = []
+    for rule in rules:
+        for day in occurrences(rule, today):
+            records.append({
+                "ID": occurrence_id(rule, day),
+                "amount": rule["amount"],
+                "description": rule["description"],
+                "person": rule["person"],
+                "date": datetime.combine(day, datetime.min.time()),
+            })
+    written = expense_mgr.add_expenses_batch(records) if records else []
+    store.mark_run({rule["id"] for rule in rules}, today)
+    return written
@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class ResponseCache:
+    """LRU of rendered report responses.
+
+    Keys are (command, period, person, data version); the version changes on
+    every write this process makes to the month. Edits made in the sheet by
+    hand or by another process don't bump it, so entries also expire after
+    ttl seconds.
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or config.RESPONSE_CACHE_SIZE
+        self.ttl = config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import config
+
+logger = logging.getLogger(__name__)
+
+INCOME_CATEGORY = "Thu nhập"
+
+
+def _day_key(value):
+    """Normalize a date/datetime/'YYYY-MM-DD' string to the 'YYYY-MM-DD' key."""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+def _month_key(year, month):
+    return f"{year:04d}-{month:02d}"
+
+
+class Rollup:
+    """Pre-aggregated amounts keyed by day -> category -> person.
+
+    Built once per month from the worksheet and then kept up to date by
+    add/edit/delete, so any period query only sums one cell group per day.
+    The cube is persisted as JSON so restarts do not rebuild it; writes are
+    batched to at most one file write per save_interval (flush() writes the
+    rest). Each loaded month keeps the sheet fingerprint it was built from,
+    so a month edited elsewhere is noticed (see check_month) and rebuilt.
+    """
+
+    def __init__(self, path, save_interval=None):
+        self.path = path
+        self.save_interval = config.ROLLUP_SAVE_INTERVAL if save_interval is None else save_interval
+        self.read_only = False # followers keep changes in memory (see leader.set_writable)
+        self._lock = threading.RLock()
+        self._days = {}      # "YYYY-MM-DD" -> {category: {person: amount}}
+        self._months = set() # "YYYY-MM" months fully loaded from the sheet
+        self._totals = {}    # "YYYY-MM" -> {category: {person (lowercase): amount}}, derived
+        self._fingerprints = {} # "YYYY-MM" -> sheet fingerprint the month matches
+        self._written = set()   # "YYYY-MM" months changed by our own writes since the last check
+        self._checked = {}      # "YYYY-MM" -> monotonic time of the last fingerprint check
+        self._dirty = False
+        self._saved_at = None
+        self.reload()
+
+    def reload(self):
+        """(Re)read the cube from disk, dropping in-memory changes."""
+        with self._lock:
+            self._days, self._months, self._fingerprints = {}, set(), {}
+            self._written, self._checked = set(), {}
+            self._dirty = False
+            self._load()
+            self._rebuild_totals()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._days = data.get("days", {})
+            self._months = set(data.get("months", []))
+            self._fingerprints = data.get("fingerprints", {})
+        except Exception as e:
+            logger.warning(f"Could not load rollup from {self.path}, starting empty: {e}")
+            self._days, self._months, self._fingerprints = {}, set(), {}
+
+    def _rebuild_totals(self):
+        """Derive the per-month running totals from the day cells (once, at load)."""
+        self._totals = {}
+        for day, cats in self._days.items():
+            for category, by_person in cats.items():
+                for person, amount in by_person.items():
+                    self._bump_total(day, category, person, amount)
+
+    def _bump_total(self, day, category, person, amount):
+        month = self._totals.setdefault(day[:7], {})
+        persons = month.setdefault(category, {})
+        key = str(person).strip().lower()
+        persons[key] = persons.get(key, 0) + int(amount)
+
+    def save(self):
+        """Atomically write the cube to disk."""
+        with self._lock:
+            if self.read_only:
+                return
+            payload = {"months": sorted(self._months), "fingerprints": self._fingerprints, "days": self._days}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _changed(self):
+        """Note an in-memory change; written now only if the last save is save_interval old."""
+        self._dirty = True
+        if self._saved_at is None or time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def flush(self):
+        """Write pending changes (snapshot job, shutdown)."""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def has_month(self, year, month):
+        return _month_key(year, month) in self._months
+
+    def build_month(self, year, month, rows, fingerprint=None):
+        """Replace one month's cells from (day, category, person, amount) tuples.
+
+        fingerprint is the sheet's summary-block fingerprint read before the rows.
+        """
+        prefix = _month_key(year, month)
+        with self._lock:
+            for key in [k for k in self._days if k.startswith(prefix)]:
+                del self._days[key]
+            self._totals.pop(prefix, None)
+            for day, category, person, amount in rows:
+                self._apply(_day_key(day), category, person, amount)
+            self._months.add(prefix)
+            self._set_fingerprint(prefix, fingerprint)
+            self._written.discard(prefix)
+            self._checked[prefix] = time.monotonic()
+            self._changed()
+
+    def _set_fingerprint(self, prefix, fingerprint):
+        if fingerprint is None:
+            self._fingerprints.pop(prefix, None)
+        else:
+            self._fingerprints[prefix] = list(fingerprint)
+
+    def invalidate_month(self, year, month):
+        """Forget a month so the next query rebuilds it from the sheet."""
+        with self._lock:
+            self._months.discard(_month_key(year, month))
+            self._changed()
+
+    def mark_written(self, year, month):
+        """Our own write changed the sheet (and this cube with it): the next check adopts the new fingerprint."""
+        with self._lock:
+            self._written.add(_month_key(year, month))
+
+    def check_due(self, year, month, interval=None):
+        """True when a loaded month has not been checked against its sheet for `interval` seconds."""
+        interval = config.ROLLUP_VERIFY_INTERVAL if interval is None else interval
+        checked = self._checked.get(_month_key(year, month))
+        return checked is None or time.monotonic() - checked >= interval
+
+    def check_month(self, year, month, fingerprint):
+        """Compare a loaded month with the sheet's current fingerprint; False means rebuild it.
+
+        A month changed only by our own writes (mark_written) adopts the new
+        fingerprint; without one (no summary block) the month is trusted as before.
+        """
+        prefix = _month_key(year, month)
+        with self._lock:
+            self._checked[prefix] = time.monotonic()
+            if fingerprint is None:
+                return True
+            if prefix in self._written:
+                self._written.discard(prefix)
+                self._set_fingerprint(prefix, fingerprint)
+                self._changed()
+                return True
+            return self._fingerprints.get(prefix) == list(fingerprint)
+
+    def _apply(self, day, category, person, amount):
+        self._bump_total(day, category, person, amount)
+        cats = self._days.setdefault(day, {})
+        persons = cats.setdefault(category, {})
+        value = persons.get(person, 0) + int(amount)
+        if value:
+            persons[person] = value
+        else:
+            persons.pop(person, None)
+            if not persons:
+                del cats[category]
+                if not cats:
+                    del self._days[day]
+
+    def add(self, day, category, person, amount):
+        with self._lock:
+            self._apply(_day_key(day), category, person, amount)
+            self._changed()
+
+    def add_many(self, rows):
+        """Apply many (day, category, person, amount) tuples as one change."""
+        with self._lock:
+            for day, category, person, amount in rows:
+                self._apply(_day_key(day), category, person, amount)
+            self._changed()
+
+    def remove(self, day, category, person, amount):
+        self.add(day, category, person, -int(amount))
+
+    def month_total(self, year, month, category, person=None):
+        """Running total of one category in a month, optionally for one person. O(1)."""
+        persons = self._totals.get(_month_key(year, month), {}).get(category, {})
+        if person:
+            return persons.get(str(person).strip().lower(), 0)
+        return sum(persons.values())
+
+    def query(self, start_date, end_date, person=None):
+        """Sum the cells between two dates (inclusive).
+
+        Returns {"categories": {category: amount}, "persons": {person: spent}},
+        where "persons" excludes income.
+        """
+        wanted = str(person).strip().lower() if person else None
+        categories, persons = {}, {}
+        day = start_date if not isinstance(start_date, datetime) else start_date.date()
+        end = end_date if not isinstance(end_date, datetime) else end_date.date()
+        with self._lock:
+            while day <= end:
+                for category, by_person in self._days.get(_day_key(day), {}).items():
+                    for who, amount in by_person.items():
+                        if wanted and str(who).strip().lower() != wanted:
+                            continue
+                        categories[category] = categories.get(category, 0) + amount
+                        if category != INCOME_CATEGORY:
+                            persons[who] = persons.get(who, 0) + amount
+                day += timedelta(days=1)
+        return {"categories": categories, "persons": persons}
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Header written to every new month worksheet
+CANONICAL_HEADER = ["ID", "Ngày hôm nay", "Giờ", "Người", "Danh mục", "Số tiền", "Mô tả", "Trạng thái"]
+
+# Logical fields in sheet order; the registry maps each one to a 0-based column index
+FIELDS = ["id", "date", "time", "person", "category", "amount", "description", "status"]
+
+# Value of the status column for soft-deleted rows (blank means active)
+TOMBSTONE = "deleted"
+
+# Accepted header spellings per field (normalized: NFC + lowercase)
+FIELD_ALIASES = {
+    "id": ["id"],
+    "date": ["ngày hôm nay", "ngày", "date"],
+    "time": ["giờ", "time"],
+    "person": ["người", "person"],
+    "category": ["danh mục", "category"],
+    "amount": ["số tiền", "amount"],
+    "description": ["mô tả", "description"],
+    "status": ["trạng thái", "status"],
+}
+
+
+def is_month_title(title, prefix):
+    """True for '<prefix> mm/yyyy' titles; restored '<...> (backup ...)' copies are not months."""
+    return re.fullmatch(re.escape(prefix) + r' \d{2}/\d{4}', title) is not None
+
+
+def normalize_header(s):
+    """Normalize a header cell to NFC lowercase for comparison."""
+    if not s: return ""
+    return unicodedata.normalize('NFC', str(s)).strip().lower()
+
+
+def detect_columns(header):
+    """Map FIELDS to column indexes for a header row.
+
+    Exact alias match first, then any header containing "ngày" for the date,
+    then the canonical positions (ID=0, Date=1, Time=2, Person=3, Cat=4, Amount=5, Desc=6).
+    The status column is only ever taken from its header.
+    """
+    normalized = [normalize_header(h) for h in header]
+    columns = {}
+    for field in FIELDS:
+        for alias in FIELD_ALIASES[field]:
+            if alias in normalized:
+                columns[field] = normalized.index(alias)
+                break
+    if "date" not in columns:
+        columns["date"] = next((i for i, h in enumerate(normalized) if "ngày" in h), None)
+    for position, field in enumerate(FIELDS):
+        if field == "status":
+            continue
+        if columns.get(field) is None and len(header) > position:
+            columns[field] = position
+    return {field: idx for field, idx in columns.items() if idx is not None}
+
+
+def _rename_legacy_date_header(worksheet, header):
+    """v2: legacy 'Ngày' header in column B becomes 'Ngày hôm nay'."""
+    if len(header) > 1 and header[1] == "Ngày":
+        worksheet.update_cell(1, 2, "Ngày hôm nay")
+        header[1] = "Ngày hôm nay"
+    return header
+
+
+def _add_status_column(worksheet, header):
+    """v3: 'Trạng thái' header in column H, used to tombstone deleted rows."""
+    if "trạng thái" in [normalize_header(h) for h in header]:
+        return header
+    position = CANONICAL_HEADER.index("Trạng thái")
+    if len(header) > position and header[position]:
+        logger.warning(f"Column H of {worksheet.title} is in use ('{header[position]}'); deletes there remove the row (no undo)")
+        return header
+    worksheet.update_cell(1, position + 1, "Trạng thái")
+    header = header + [""] * (position + 1 - len(header))
+    header[position] = "Trạng thái"
+    return header
+
+
+def _add_summary_block(worksheet, header):
+    """v4: SUMIFS summary block in J:L (see sheet_summary)."""
+    import sheet_summary # local import: sheet_summary builds on this module
+    sheet_summary.install(worksheet, detect_columns(header))
+    return header
+
+
+def _add_summary_checksum(worksheet, header):
+    """v5: summary block rewritten with its checksum row (older blocks only)."""
+    import sheet_summary
+    sheet_summary.install(worksheet, detect_columns(header))
+    return header
+
+
+# Ordered (version, step) pairs; a worksheet at version N runs every step above N
+MIGRATIONS = [
+    (2, _rename_legacy_date_header),
+    (3, _add_status_column),
+    (4, _add_summary_block),
+    (5, _add_summary_checksum),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaRegistry:
+    """Verified column layout and schema version per worksheet title, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.read_only = False # followers keep changes in memory (see leader.set_writable)
+        self._lock = threading.RLock()
+        self._entries = {}
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Could not load schema registry from {self.path}: {e}")
+
+    def save(self):
+        with self._lock:
+            if self.read_only:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def get(self, title):
+        return self._entries.get(title)
+
+    def columns(self, title):
+        entry = self._entries.get(title)
+        return entry["columns"] if entry else None
+
+    def is_current(self, title):
+        entry = self._entries.get(title)
+        return bool(entry) and entry.get("version", 0) >= SCHEMA_VERSION
+
+    def record(self, title, columns, version=SCHEMA_VERSION, **extra):
+        with self._lock:
+            entry = self._entries.setdefault(title, {})
+            entry.update({"version": version, "columns": columns, **extra})
+            self.save()
+
+    def update(self, title, **fields):
+        """Update extra metadata (e.g. row counts) of an already recorded worksheet."""
+        with self._lock:
+            entry = self._entries.get(title)
+            if entry is None:
+                return
+            entry.update(fields)
+            self.save()
+
+    def forget(self, title):
+        with self._lock:
+            if self._entries.pop(title, None) is not None:
+                self.save()
+
+
+def migrate_worksheet(worksheet, registry):
+    """Bring one worksheet up to SCHEMA_VERSION and record its column map."""
+    entry = registry.get(worksheet.title) or {}
+    version = entry.get("version", 1)
+    header = [str(h).strip() for h in worksheet.row_values(1)]
+    for step_version, step in MIGRATIONS:
+        if version < step_version:
+            header = step(worksheet, header)
+    columns = detect_columns(header)
+    registry.record(worksheet.title, columns, SCHEMA_VERSION)
+    return columns
+
+
+def start_background_migration(spreadsheet, registry, prefix):
+    """Migrate every '<prefix> mm/yyyy' worksheet not yet at SCHEMA_VERSION in a daemon thread."""
+    def run():
+        try:
+            for worksheet in spreadsheet.worksheets():
+                if registry.read_only:
+                    logger.info("Schema migrator stopped: no longer the leader")
+                    return
+                if not is_month_title(worksheet.title, prefix) or registry.is_current(worksheet.title):
+                    continue
+                try:
+                    migrate_worksheet(worksheet, registry)
+                    logger.info(f"Schema migrated: {worksheet.title} -> v{SCHEMA_VERSION}")
+                except Exception as e:
+                    logger.warning(f"Schema migration failed for {worksheet.title}: {e}")
+        except Exception as e:
+            logger.error(f"Schema migrator error: {e}")
+
+    thread = threading.Thread(target=run, name="schema-migrator", daemon=True)
+    thread.start()
+    return thread
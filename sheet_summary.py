@@ -0,0 +1,161 @@
+import logging
+
+import gspread
+
+import schema
+from categories import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+INCOME_CATEGORY = "Thu nhập"
+
+# The block lives in J:L from row 2 (K1:L1 keep the legacy total), one labelled row per figure:
+#   J2 "SUMMARY" | K2 version | L2 =COUNTA(ID column)  (rows written, tombstones included)
+#   "total" / "checksum" / "income" / "spent" rows, then one "category" row per category and one "person" row per person
+BLOCK_LABEL = "SUMMARY"
+SUMMARY_VERSION = 2
+FIRST_ROW = 2
+BLOCK_RANGE = f"J{FIRST_ROW}:L"
+# Rows written, live total and checksum: any edit of the data moves at least one of them
+FINGERPRINT_RANGE = f"L{FIRST_ROW}:L{FIRST_ROW + 2}"
+# K label of the row summing rows with an empty category (legacy sheets)
+BLANK_CATEGORY = "(trống)"
+# Characters per row (all fields joined) that the checksum covers
+CHECKSUM_WIDTH = 120
+# Fields joined into the checksummed text of a row, in sheet order
+CHECKSUM_FIELDS = ("id", "date", "time", "person", "category", "amount", "description", "status")
+
+
+def _letter(index):
+    return gspread.utils.rowcol_to_a1(1, index + 1)[:-1]
+
+
+def block_categories(seen=()):
+    """CATEGORIES plus any other category names found in a sheet (legacy spellings, blanks).
+
+    SUMIFS matches case-insensitively, so a name differing from an earlier
+    one only by case would be counted twice and is left out.
+    """
+    found = {c.lower(): c for c in CATEGORIES}
+    for name in seen:
+        name = str(name if name is not None else "").strip()
+        found.setdefault(name.lower(), name)
+    return list(found.values())
+
+
+def block_rows(columns, persons, categories=None):
+    """Values (formulas included) for the block of a worksheet with the given column map.
+
+    categories defaults to CATEGORIES; see block_categories for sheets holding others.
+    """
+    def col(field):
+        letter = _letter(columns[field])
+        return f"{letter}$2:{letter}"
+
+    live = f',{col("status")},"<>{schema.TOMBSTONE}"' if "status" in columns else ""
+    amount = col("amount")
+    # Sum of character code x position x row number over each row's joined fields: a new
+    # category, description, person or date changes it even when count and total stay put
+    text = '&"|"&'.join(col(field) for field in CHECKSUM_FIELDS if field in columns)
+    positions = f"SEQUENCE(1,{CHECKSUM_WIDTH})"
+    checksum = f"=SUMPRODUCT(ROW({col('id')})*{positions}*IFERROR(UNICODE(MID({text},{positions},1)),0))"
+    rows = [
+        [BLOCK_LABEL, SUMMARY_VERSION, f"=COUNTA({col('id')})"],
+        ["total", "", f"=SUMIFS({amount}{live})" if live else f"=SUM({amount})"],
+        ["checksum", "", checksum],
+        ["income", "", f'=SUMIFS({amount},{col("category")},"{INCOME_CATEGORY}"{live})'],
+        ["spent", "", f"=L{FIRST_ROW + 1}-L{FIRST_ROW + 3}"],
+    ]
+    for category in categories or CATEGORIES:
+        row = FIRST_ROW + len(rows)
+        if category:
+            rows.append(["category", category, f"=SUMIFS({amount},{col('category')},K{row}{live})"])
+        else:
+            rows.append(["category", BLANK_CATEGORY, f'=SUMIFS({amount},{col("category")},""{live})'])
+    for person in persons:
+        row = FIRST_ROW + len(rows)
+        rows.append(["person", person, f'=SUMIFS({amount},{col("person")},K{row},{col("category")},"<>{INCOME_CATEGORY}"{live})'])
+    return rows
+
+
+def write_block(worksheet, columns, persons, previous_height=0, categories=None):
+    """Write (or rewrite) the block with one update; leftover rows of a longer old block are blanked."""
+    rows = block_rows(columns, persons, categories)
+    rows += [["", "", ""]] * max(0, previous_height - len(rows))
+    worksheet.update(range_name=f"J{FIRST_ROW}", values=rows, value_input_option="USER_ENTERED")
+
+
+def parse_fingerprint(values):
+    """FINGERPRINT_RANGE values (unformatted) -> (rows written, live total, checksum), or None."""
+    try:
+        return int(values[0][0]), int(values[1][0]), int(values[2][0])
+    except (IndexError, TypeError, ValueError):
+        return None
+
+
+def parse_block(values):
+    """Rows read from BLOCK_RANGE (unformatted) -> figures dict, or None if there is no block."""
+    if not values or not values[0] or values[0][0] != BLOCK_LABEL:
+        return None
+
+    def number(row):
+        value = row[2] if len(row) > 2 else 0
+        return int(value) if isinstance(value, (int, float)) else 0
+
+    block = {
+        "version": values[0][1] if len(values[0]) > 1 else None,
+        "rows_written": number(values[0]),
+        "height": len(values),
+        "categories": {},
+        "persons": {},
+    }
+    for row in values[1:]:
+        if not row or not row[0]:
+            continue
+        label = row[0]
+        if label in ("total", "income", "spent"):
+            block[label] = number(row)
+        elif label == "category" and len(row) > 1 and row[1]:
+            block["categories"]["" if row[1] == BLANK_CATEGORY else str(row[1])] = number(row)
+        elif label == "person" and len(row) > 1 and row[1]:
+            block["persons"][str(row[1])] = number(row)
+    return block
+
+
+def is_consistent(block):
+    """Current version and every amount accounted for: categories add up to the total,
+    persons to the spending (a new person or category makes the block stale)."""
+    if not block or block.get("version") != SUMMARY_VERSION:
+        return False
+    if "total" not in block or "spent" not in block:
+        return False
+    return sum(block["categories"].values()) == block["total"] and sum(block["persons"].values()) == block["spent"]
+
+
+def install(worksheet, columns):
+    """Add the block to an existing worksheet (schema migration).
+
+    Reads the person and category columns and J2:L2 in one call; persons
+    and non-standard categories seen in the sheet get their own rows. A block already at SUMMARY_VERSION is kept, a J2 cell
+    used for something else is left alone.
+    """
+    if "amount" not in columns or "category" not in columns or "person" not in columns:
+        logger.warning(f"Cannot add summary block to {worksheet.title}: missing columns")
+        return False
+    person, category, id_letter = _letter(columns["person"]), _letter(columns["category"]), _letter(columns.get("id", 0))
+    person_values, category_values, ids, anchor = worksheet.batch_get(
+        [f"{person}2:{person}", f"{category}2:{category}", f"{id_letter}2:{id_letter}", f"J{FIRST_ROW}:L{FIRST_ROW}"])
+    if anchor and anchor[0] and anchor[0][0] and anchor[0][0] != BLOCK_LABEL:
+        logger.warning(f"J{FIRST_ROW} of {worksheet.title} is in use; summary block not added")
+        return False
+    if anchor and anchor[0] and len(anchor[0]) > 1 and str(anchor[0][1]) == str(SUMMARY_VERSION):
+        return True
+    persons = {"bản thân": "Bản thân"}
+    for row in person_values:
+        if row and str(row[0]).strip():
+            persons.setdefault(str(row[0]).strip().lower(), str(row[0]).strip())
+    # Only rows holding an expense count: a blank category below the data is not a category
+    seen = [category_values[i][0] if i < len(category_values) and category_values[i] else ""
+            for i in range(len(ids)) if ids[i] and str(ids[i][0]).strip()]
+    write_block(worksheet, columns, list(persons.values()), categories=block_categories(seen))
+    return True
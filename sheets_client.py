@@ -0,0 +1,102 @@
+import logging
+import threading
+
+import gspread
+from gspread.utils import convert_credentials
+from google.auth.transport.requests import AuthorizedSession
+from oauth2client.service_account import ServiceAccountCredentials
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+GOOGLE_SHEETS_API_URL = "https://sheets.googleapis.com"
+# Hosts gspread calls (Sheets v4 and the Drive listing behind open-by-name)
+_GOOGLE_API_HOSTS = (GOOGLE_SHEETS_API_URL, "https://www.googleapis.com")
+
+_lock = threading.RLock()
+_credentials = None
+_client = None
+
+
+def get_credentials():
+    """Parse the service account once and reuse it.
+
+    The returned google-auth credentials keep the access token and its expiry,
+    so the OAuth exchange only runs again when the token is actually expired.
+    """
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            creds_source = config.get_google_credentials()
+            if not creds_source:
+                logger.error("❌ No Google Credentials found!")
+                return None
+
+            if isinstance(creds_source, dict):
+                # Load from dict (Env Var)
+                creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_source, SCOPE)
+            else:
+                # Load from file path (Local)
+                creds = ServiceAccountCredentials.from_json_keyfile_name(creds_source, SCOPE)
+            _credentials = convert_credentials(creds)
+        return _credentials
+
+
+def _build_session(credentials):
+    """Authorized requests session with a keep-alive connection pool."""
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=config.SHEETS_POOL_SIZE, pool_maxsize=config.SHEETS_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+def using_standin():
+    """True when SHEETS_API_URL points somewhere other than Google (sheets_standin.py)."""
+    return config.SHEETS_API_URL.rstrip("/") != GOOGLE_SHEETS_API_URL
+
+
+class _RedirectSession(requests.Session):
+    """Unauthenticated session that sends every Google API call to SHEETS_API_URL."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        for host in _GOOGLE_API_HOSTS:
+            if url.startswith(host):
+                url = self.base_url + url[len(host):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+
+def get_client():
+    """Return the process-wide gspread client, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None and using_standin():
+            logger.info(f"Using the Sheets stand-in at {config.SHEETS_API_URL}")
+            _client = gspread.Client(auth=None, session=_RedirectSession(config.SHEETS_API_URL))
+        if _client is None:
+            credentials = get_credentials()
+            if credentials is None:
+                return None
+            _client = gspread.Client(auth=credentials, session=_build_session(credentials))
+        return _client
+
+
+def reset_client():
+    """Drop the pooled session (e.g. after a broken connection); credentials are kept."""
+    global _client
+    with _lock:
+        if _client is not None:
+            try:
+                getattr(_client, "http_client", _client).session.close()
+            except Exception:
+                pass
+        _client = None
@@ -0,0 +1,259 @@
+"""Local stand-in for the Google Sheets API, for running the bot without Google.
+
+Keeps one spreadsheet in memory and answers the calls the bot makes:
+the Drive listing behind gspread's open-by-name, spreadsheets.get, values
+get/batchGet/append/update/batchUpdate/clear and the addSheet/deleteRange
+batchUpdate requests (formatting requests are accepted and ignored).
+With SHEETS_API_URL pointing here, sheets_client routes gspread to it
+and the async backend talks to it directly:
+
+    python sheets_standin.py --port 8085
+    SHEETS_API_URL=http://127.0.0.1:8085 SHEETS_BACKEND=async python bot.py
+
+Formulas are stored as text and never evaluated.
+"""
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import config
+
+_CELL = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def _col_letters(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class Workbook:
+    """Worksheets as lists of rows; every method is called under `lock`."""
+
+    def __init__(self, title=None, spreadsheet_id="standin"):
+        self.title = title or config.GOOGLE_SHEET_NAME
+        self.spreadsheet_id = spreadsheet_id
+        self.lock = threading.Lock()
+        self.sheets = {} # title -> list of rows
+        self.sheet_ids = {} # title -> sheetId
+
+    def add_sheet(self, title, rows=None):
+        self.sheets.setdefault(title, [list(r) for r in rows or []])
+        self.sheet_ids.setdefault(title, len(self.sheet_ids) + 1)
+        return self.sheet_ids[title]
+
+    def properties(self, title):
+        rows = self.sheets[title]
+        return {"title": title, "sheetId": self.sheet_ids[title], "index": list(self.sheets).index(title),
+                "sheetType": "GRID", "gridProperties": {"rowCount": max(1000, len(rows)),
+                                                        "columnCount": max([26] + [len(r) for r in rows])}}
+
+    def parse_range(self, range_name):
+        """'Title'!A1:C5 -> (title, first row, last row, first col, last col), 0-based, None = open."""
+        bare = range_name[1:-1].replace("''", "'") if range_name.startswith("'") and "!" not in range_name else range_name
+        if bare in self.sheets: # a whole worksheet
+            return bare, 0, None, 0, None
+        title, _, cells = range_name.rpartition("!")
+        title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+        if not title:
+            title = next(iter(self.sheets), "Sheet1")
+        if title not in self.sheets:
+            raise KeyError(f"Unable to parse range: {range_name}")
+        start, _, end = cells.upper().partition(":")
+        (c1, r1), (c2, r2) = _CELL.match(start).groups(), _CELL.match(end or start).groups()
+        return (title,
+                int(r1) - 1 if r1 else 0, int(r2) - 1 if r2 else None,
+                _col_index(c1) if c1 else 0, _col_index(c2) if c2 else None)
+
+    def read(self, range_name, unformatted=False):
+        title, r1, r2, c1, c2 = self.parse_range(range_name)
+        rows = self.sheets[title][r1:None if r2 is None else r2 + 1]
+        out = []
+        for row in rows:
+            cells = row[c1:None if c2 is None else c2 + 1]
+            cells = [v if unformatted or isinstance(v, str) else str(v) for v in cells]
+            while cells and cells[-1] in ("", None):
+                cells.pop()
+            out.append(cells)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def write(self, title, row, col, values, user_entered):
+        grid = self.sheets[title]
+        for i, values_row in enumerate(values):
+            while len(grid) <= row + i:
+                grid.append([])
+            target = grid[row + i]
+            for j, value in enumerate(values_row):
+                while len(target) <= col + j:
+                    target.append("")
+                if user_entered and isinstance(value, str) and re.fullmatch(r"-?\d+", value):
+                    value = int(value)
+                target[col + j] = value
+        last_col = col + max((len(r) for r in values), default=1) - 1
+        return "'{}'!{}{}:{}{}".format(title.replace("'", "''"), _col_letters(col), row + 1,
+                                        _col_letters(last_col), row + len(values))
+
+    def clear(self, range_name):
+        title, r1, r2, c1, c2 = self.parse_range(range_name)
+        for row in self.sheets[title][r1:None if r2 is None else r2 + 1]:
+            for col in range(c1, len(row) if c2 is None else min(c2 + 1, len(row))):
+                row[col] = ""
+
+    def append(self, range_name, values, user_entered):
+        title, r1, _, c1, c2 = self.parse_range(range_name)
+        last = r1 - 1
+        for index, row in enumerate(self.sheets[title]):
+            if any(v not in ("", None) for v in row[c1:None if c2 is None else c2 + 1]):
+                last = index
+        return self.write(title, last + 1, c1, values, user_entered)
+
+    def delete_range(self, spec):
+        title = next(t for t, sid in self.sheet_ids.items() if sid == spec["range"]["sheetId"])
+        grid = self.sheets[title]
+        r1, r2 = spec["range"]["startRowIndex"], spec["range"]["endRowIndex"]
+        c1, c2 = spec["range"].get("startColumnIndex", 0), spec["range"].get("endColumnIndex")
+        width = max((len(r) for r in grid), default=0)
+        c2 = width if c2 is None else c2
+        for col in range(c1, c2):
+            column = [row[col] if col < len(row) else "" for row in grid]
+            column = column[:r1] + column[r2:] + [""] * (min(r2, len(grid)) - min(r1, len(grid)))
+            for row, value in zip(grid, column):
+                if col < len(row):
+                    row[col] = value
+                elif value != "":
+                    row.extend([""] * (col - len(row)) + [value])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    workbook = None
+    path_re = re.compile(r"^/v4/spreadsheets/([^/:]+)(.*)$")
+    drive_path = "/drive/v3/files"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        match = self.path_re.match(url.path)
+        if url.path == self.drive_path:
+            book = self.workbook
+            return self._reply(200, {"files": [{"id": book.spreadsheet_id, "name": book.title,
+                                                "createdTime": "", "modifiedTime": ""}]})
+        if not match:
+            return self._reply(404, {"error": {"code": 404, "message": "Not found"}})
+        spreadsheet_id, rest = match.group(1), unquote(match.group(2))
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        book = self.workbook
+        try:
+            with book.lock:
+                return self._reply(200, self._route(book, method, spreadsheet_id, rest, query, body))
+        except (KeyError, ValueError, AttributeError, StopIteration) as e:
+            return self._reply(400, {"error": {"code": 400, "message": str(e)}})
+
+    def _route(self, book, method, spreadsheet_id, rest, query, body):
+        unformatted = query.get("valueRenderOption", [""])[0] == "UNFORMATTED_VALUE"
+        user_entered = lambda: (query.get("valueInputOption") or [body.get("valueInputOption", "")])[0] == "USER_ENTERED"
+        if method == "GET" and rest == "":
+            return {"spreadsheetId": spreadsheet_id, "properties": {"title": book.title, "locale": "vi_VN"},
+                    "sheets": [{"properties": book.properties(t)} for t in book.sheets]}
+        if method == "GET" and rest == "/values:batchGet":
+            return {"spreadsheetId": spreadsheet_id, "valueRanges": [
+                {"range": r, "majorDimension": "ROWS", "values": book.read(r, unformatted)} for r in query.get("ranges", [])]}
+        if method == "GET" and rest.startswith("/values/"):
+            range_name = rest[len("/values/"):]
+            return {"range": range_name, "majorDimension": "ROWS", "values": book.read(range_name, unformatted)}
+        if method == "POST" and rest.startswith("/values/") and rest.endswith(":clear"):
+            book.clear(rest[len("/values/"):-len(":clear")])
+            return {"spreadsheetId": spreadsheet_id}
+        if method == "POST" and rest == "/values:batchClear":
+            for range_name in body.get("ranges", []):
+                book.clear(range_name)
+            return {"spreadsheetId": spreadsheet_id}
+        if method == "POST" and rest.startswith("/values/") and rest.endswith(":append"):
+            updated = book.append(rest[len("/values/"):-len(":append")], body.get("values", []), user_entered())
+            return {"spreadsheetId": spreadsheet_id, "updates": {"updatedRange": updated, "updatedRows": len(body.get("values", []))}}
+        if method == "PUT" and rest.startswith("/values/"):
+            title, r1, _, c1, _ = book.parse_range(rest[len("/values/"):])
+            return {"updatedRange": book.write(title, r1, c1, body.get("values", []), user_entered())}
+        if method == "POST" and rest == "/values:batchUpdate":
+            updated = []
+            for item in body.get("data", []):
+                title, r1, _, c1, _ = book.parse_range(item["range"])
+                updated.append(book.write(title, r1, c1, item.get("values", []), user_entered()))
+            return {"spreadsheetId": spreadsheet_id, "responses": [{"updatedRange": u} for u in updated]}
+        if method == "POST" and rest == ":batchUpdate":
+            replies = []
+            for request in body.get("requests", []):
+                if "addSheet" in request:
+                    title = request["addSheet"]["properties"]["title"]
+                    if title in book.sheets:
+                        raise ValueError(f'A sheet with the name "{title}" already exists.')
+                    book.add_sheet(title)
+                    replies.append({"addSheet": {"properties": book.properties(title)}})
+                elif "deleteRange" in request:
+                    book.delete_range(request["deleteRange"])
+                    replies.append({})
+                else:
+                    replies.append({}) # formatting and other requests are accepted and ignored
+            return {"spreadsheetId": spreadsheet_id, "replies": replies}
+        raise KeyError(f"Unsupported call: {method} {rest}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+
+def start(port=0, workbook=None):
+    """Serve in a daemon thread; returns (server, workbook, base_url)."""
+    workbook = workbook or Workbook()
+    handler = type("Handler", (_Handler,), {"workbook": workbook})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, workbook, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Sheets v4 API")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--title", default=config.GOOGLE_SHEET_NAME, help="spreadsheet name (default: GOOGLE_SHEET_NAME)")
+    parser.add_argument("--sheet", action="append", default=[], help="worksheet title to create (repeatable)")
+    args = parser.parse_args()
+    book = Workbook(args.title)
+    for title in args.sheet:
+        book.add_sheet(title)
+    server, _, url = start(args.port, book)
+    print(f"Sheets stand-in listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,42 @@
+import logging
+import os
+import pickle
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the pickled state changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 2
+
+
+def save(path, state):
+    """Atomically pickle the warm in-memory state to a local file.
+
+    The file is only ever written and read by this process on the bot's
+    own disk; it is not meant to be shared or loaded from elsewhere.
+    """
+    payload = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "state": state}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    """The saved state, or None when the file is missing, unreadable or from another version."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load snapshot {path}: {e}")
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+        logger.info(f"Ignoring snapshot {path}: version {payload.get('version') if isinstance(payload, dict) else '?'}")
+        return None
+    logger.info(f"Loaded snapshot from {time.ctime(payload.get('saved_at', 0))}")
+    return payload["state"]
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+# Modules live at the repository root; derived data goes to a throwaway directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="expense-tests-"))
+
+import pytest
+
+import config
+import schema
+import sheets_client
+import sheets_standin
+
+
+@pytest.fixture
+def standin(monkeypatch, tmp_path):
+    """A stand-in spreadsheet with every Sheets call (gspread and async) routed to it."""
+    server, book, url = sheets_standin.start()
+    monkeypatch.setattr(config, "SHEETS_API_URL", url)
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(schema, "start_background_migration", lambda *args, **kwargs: None)
+    sheets_client.reset_client()
+    yield book
+    sheets_client.reset_client()
+    server.shutdown()
@@ -0,0 +1,20 @@
+import admin
+import schema
+
+
+class FakeHTTP:
+    def __init__(self, columns):
+        self.columns = columns # A1 column letter -> values from row 2
+
+    def values_batch_get(self, spreadsheet_id, ranges, params=None):
+        return {"valueRanges": [{"values": [[v] for v in self.columns[r.split("!")[1][0]]]} for r in ranges]}
+
+
+def test_totals_skip_tombstoned_rows():
+    ws = {"title": "Quản lý chi tiêu 10/2026", "columns": {"amount": 5, "category": 4, "status": 7}}
+    http = FakeHTTP({
+        "F": [50000, 20000, 1000000, 30000],
+        "E": ["Ăn uống", "Ăn uống", admin.INCOME_CATEGORY, "Xăng xe"],
+        "H": ["", schema.TOMBSTONE, "", ""],
+    })
+    assert admin.worksheet_totals(http, "id", ws) == (80000, 1000000)
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import httpx
+
+import schema
+from expense_manager import ExpenseManager
+
+
+def _run(manager, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await manager._async_sheets.aclose()
+    return asyncio.run(main())
+
+
+def test_add_expense_async_writes_where_reports_read(standin):
+    manager = ExpenseManager()
+    title = manager._get_worksheet_name(datetime.now())
+    assert standin.sheets[title][0][:8] == schema.CANONICAL_HEADER
+
+    async def add_all():
+        now = datetime.now()
+        records = await asyncio.gather(*(
+            manager.add_expense_async(1000 * i, f"cơm {i}", date=now, force_id=100 + i) for i in range(1, 4)
+        ))
+        duplicate = await manager.add_expense_async(5, "khác", date=now, force_id=102)
+        return records, duplicate
+
+    records, duplicate = _run(manager, add_all())
+    assert sorted(r["ID"] for r in records) == ["101", "102", "103"]
+    assert duplicate["is_duplicate"] and duplicate["Số tiền"] == 2000 and duplicate["Mô tả"] == "cơm 2"
+    assert manager.schema.get(title)["rows"] == 4
+
+    # The synchronous (gspread) read path sees the same rows
+    df = manager.get_expenses()
+    assert sorted(df["Số tiền"]) == [1000, 2000, 3000]
+
+
+def test_edit_and_delete_async(standin):
+    manager = ExpenseManager()
+
+    async def scenario():
+        await manager.add_expense_async(1000, "cơm trưa", force_id=201)
+        await manager.add_expense_async(2000, "xăng", force_id=202)
+        edited = await manager.edit_expense_async(201, new_amount=1500, new_description="cà phê")
+        deleted = await manager.delete_expense_async(202, actor=1)
+        missing = await manager.delete_expense_async(999, actor=1)
+        return edited, deleted, missing
+
+    assert _run(manager, scenario()) == (True, True, False)
+    df = manager.get_expenses()
+    assert list(df["ID"]) == ["201"]
+    assert df.iloc[0]["Số tiền"] == 1500 and df.iloc[0]["Mô tả"] == "cà phê"
+    assert manager.undo_log.pop(1)["id"] == "202"
+
+
+def test_append_failure_retries_once(standin):
+    manager = ExpenseManager()
+    client = manager._get_async_sheets()
+    real_append, calls = client.append, []
+
+    async def flaky_append(range_name, rows, value_input_option="USER_ENTERED"):
+        calls.append(range_name)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection reset")
+        return await real_append(range_name, rows, value_input_option)
+
+    client.append = flaky_append
+    record = _run(manager, manager.add_expense_async(1000, "cơm", force_id=301))
+    assert len(calls) == 2 and not record["is_duplicate"]
+    assert list(manager.get_expenses()["ID"]) == ["301"]
+
+
+def test_out_of_order_append_responses_keep_the_highest_row(standin):
+    manager = ExpenseManager()
+    worksheet = manager._get_or_create_worksheet(datetime.now())
+    for last_row in (5, 3):
+        manager._note_appended(worksheet, {"updates": {"updatedRange": f"'{worksheet.title}'!A{last_row}:G{last_row}"}}, 1)
+    assert manager.schema.get(worksheet.title)["rows"] == 5
+
+
+def test_async_delete_waits_for_a_sync_writer_that_moves_rows(standin):
+    manager = ExpenseManager()
+    for i in (301, 302, 303):
+        manager.add_expense(1000, "cơm", force_id=i)
+    title = manager._get_worksheet_name(datetime.now())
+    holding, release = threading.Event(), threading.Event()
+
+    def compaction():
+        # Stands in for compact_tombstones: rows below a removed one move up
+        with manager._write_lock:
+            holding.set()
+            release.wait(5)
+            del standin.sheets[title][1]
+
+    async def scenario():
+        writer = threading.Thread(target=compaction)
+        writer.start()
+        holding.wait()
+        delete = asyncio.create_task(manager.delete_expense_async(303, actor=1))
+        await asyncio.sleep(0.3)
+        waited = not delete.done()
+        release.set()
+        deleted = await delete
+        writer.join()
+        return waited, deleted
+
+    assert _run(manager, scenario()) == (True, True)
+    manager._frame_cache.clear()
+    assert list(manager.get_expenses()["ID"]) == ["302"]
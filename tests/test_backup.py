@@ -0,0 +1,161 @@
+import gzip
+import os
+import threading
+import time
+
+import pytest
+
+import backup
+import config
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows):
+        self.title = title
+        self.rows = rows
+
+    def clear(self):
+        self.rows = []
+
+    def update(self, range_name, values, value_input_option=None):
+        assert range_name == "A1"
+        self.rows = [list(r) for r in values]
+
+
+class FakeSpreadsheet:
+    """Month worksheets whose L1:L4 fingerprint is kept in `fingerprints`."""
+
+    def __init__(self):
+        self.sheets = {}
+        self.fingerprints = {}
+        self.reads = [] # (ranges, params) of every values_batch_get
+
+    def worksheets(self):
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows, cols):
+        self.sheets[title] = FakeWorksheet(title, [])
+        return self.sheets[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self.reads.append((ranges, params))
+        out = []
+        for rng in ranges:
+            title = rng.split("!")[0][1:-1]
+            if "!" in rng:
+                values = [[v] for v in self.fingerprints[title]]
+            else:
+                values = self.sheets[title].rows
+            out.append({"range": rng, "values": values})
+        return {"valueRanges": out}
+
+
+def _month(spreadsheet, month, n):
+    title = f"{config.GOOGLE_SHEET_NAME} {month:02d}/2026"
+    rows = [["ID", "Ngày hôm nay", "Số tiền"]] + [[str(i), "2026-01-01", 1000 * i] for i in range(1, n + 1)]
+    spreadsheet.sheets[title] = FakeWorksheet(title, rows)
+    total = sum(1000 * i for i in range(1, n + 1))
+    spreadsheet.fingerprints[title] = [total, n, total, 7 * n]
+    return title
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "CHUNK_ROWS", 3)
+    return backup.BackupStore(str(tmp_path))
+
+
+def _backup(spreadsheet, store, clock, monkeypatch):
+    monkeypatch.setattr(backup.time, "time", lambda: clock[0])
+    clock[0] += 60 # manifests are named by the second
+    return backup.run_backup(spreadsheet, store, keep=10)
+
+
+def test_only_changed_months_are_refetched_and_chunks_dedupe(store, monkeypatch):
+    spreadsheet, clock = FakeSpreadsheet(), [time.time()]
+    jan, feb = _month(spreadsheet, 1, 7), _month(spreadsheet, 2, 4)
+    spreadsheet.sheets["Other"] = FakeWorksheet("Other", [["x"]])
+
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert sorted(changed) == [jan, feb]
+    data_params = spreadsheet.reads[-1][1]
+    assert data_params == {"valueRenderOption": "FORMULA", "dateTimeRenderOption": "FORMATTED_STRING"}
+    objects = set(os.listdir(store.objects_dir))
+
+    spreadsheet.reads.clear()
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert changed == [] and len(spreadsheet.reads) == 1 # fingerprints only
+
+    spreadsheet.sheets[jan].rows.append(["8", "2026-01-02", 8000])
+    spreadsheet.fingerprints[jan][1] = 8
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert changed == [jan]
+    # 9 rows in chunks of 3: the first two chunks are reused, only the tail is new
+    assert len(set(os.listdir(store.objects_dir)) - objects) == 1
+
+    # A new description keeps count and total; the checksum still moves
+    spreadsheet.sheets[feb].rows[1].append("cơm")
+    spreadsheet.fingerprints[feb][3] += 1
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert changed == [feb]
+
+
+def test_month_without_summary_block_or_stale_copy_is_refetched(store, monkeypatch):
+    spreadsheet, clock = FakeSpreadsheet(), [time.time()]
+    jan, feb = _month(spreadsheet, 1, 2), _month(spreadsheet, 2, 2)
+    spreadsheet.fingerprints[feb] = [2000]
+    _backup(spreadsheet, store, clock, monkeypatch)
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert changed == [feb]
+    clock[0] += (config.BACKUP_FULL_EVERY_DAYS + 1) * 86400
+    _, changed, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    assert sorted(changed) == [jan, feb]
+
+
+def test_restore_point_in_time_and_prune(store, monkeypatch):
+    spreadsheet, clock = FakeSpreadsheet(), [time.time()]
+    jan = _month(spreadsheet, 1, 4)
+    first, _, _ = _backup(spreadsheet, store, clock, monkeypatch)
+    original = [list(r) for r in spreadsheet.sheets[jan].rows]
+    spreadsheet.sheets[jan].rows[1][2] = 999
+    spreadsheet.fingerprints[jan][0] = 0
+    _backup(spreadsheet, store, clock, monkeypatch)
+
+    target, count = backup.restore_worksheet(spreadsheet, store, first, jan)
+    assert target.startswith(f"{jan} (backup ") and count == 5
+    assert spreadsheet.sheets[target].rows == original
+
+    # Overwrite the live month from the latest backup
+    backup.restore_worksheet(spreadsheet, store, None, jan, jan)
+    assert spreadsheet.sheets[jan].rows[1][2] == 999
+
+    removed = store.prune(1)
+    assert len(store.manifests()) == 1 and removed == 1
+    with pytest.raises(ValueError):
+        backup.restore_worksheet(spreadsheet, store, first, jan)
+
+
+def test_corrupted_object_is_detected(store):
+    digest = store.put_rows([["a"]])[0]
+    path = os.path.join(store.objects_dir, f"{digest}.gz")
+    with open(path, "wb") as f:
+        f.write(gzip.compress(b'[["b"]]'))
+    with pytest.raises(ValueError):
+        store.get_rows([digest])
+
+
+def test_store_lock_serializes_runs(store):
+    events = []
+
+    def worker(tag):
+        with store.locked():
+            events.append(f"{tag}-in")
+            time.sleep(0.05)
+            events.append(f"{tag}-out")
+
+    threads = [threading.Thread(target=worker, args=(tag,)) for tag in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert events[0][0] == events[1][0] and events[2][0] == events[3][0]
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+import config
+import bot
+
+
+class FakeMessage:
+    def __init__(self, text=""):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def _update(text="", update_id=1):
+    return SimpleNamespace(
+        update_id=update_id,
+        effective_user=SimpleNamespace(id=42),
+        effective_chat=SimpleNamespace(id=42),
+        callback_query=None,
+        message=FakeMessage(text),
+    )
+
+
+def test_help_replies_without_waiting_on_its_own_chat_slot(monkeypatch):
+    monkeypatch.setattr(config, "AUTHORIZED_USER_IDS", [42])
+    update = _update("/help")
+
+    async def main():
+        await asyncio.wait_for(bot.help_command(update, SimpleNamespace(bot=None)), 3)
+    asyncio.run(main())
+    assert len(update.message.replies) == 1 and "/help" in update.message.replies[0]
+
+
+def test_decorated_handlers_keep_their_names_for_the_profiler():
+    assert bot.reclassify_command.__name__ == "reclassify_command" # authorized_only + leader_writes
+    assert bot.backup_sheets.__name__ == "backup_sheets" # leader_only
@@ -0,0 +1,34 @@
+import budgets
+from budgets import ALL_PERSONS, BudgetStore
+from rollup import Rollup
+
+
+def test_crossed_thresholds_only_reports_the_ones_passed_by_this_write():
+    assert budgets.crossed_thresholds(0, 700, 1000, [0.8, 1.0]) == []
+    assert budgets.crossed_thresholds(700, 800, 1000, [0.8, 1.0]) == [0.8]
+    assert budgets.crossed_thresholds(700, 1200, 1000, [0.8, 1.0]) == [0.8, 1.0]
+    assert budgets.crossed_thresholds(850, 900, 1000, [0.8, 1.0]) == [] # already past 80%
+
+
+def test_store_keys_shared_and_personal_budgets(tmp_path):
+    path = str(tmp_path / "budgets.json")
+    store = BudgetStore(path)
+    store.set("Ăn uống", 1000000)
+    store.set("Ăn uống", 300000, person="Vợ")
+    assert BudgetStore(path).items() == [("Ăn uống", ALL_PERSONS, 1000000), ("Ăn uống", "vợ", 300000)]
+    assert store.for_expense("Ăn uống", " VỢ ") == [(ALL_PERSONS, 1000000), ("vợ", 300000)]
+    assert store.for_expense("Xăng xe", "Vợ") == []
+    assert store.remove("Ăn uống", person="vợ") and not store.remove("Ăn uống", person="vợ")
+
+
+def test_evaluate_alerts_from_running_totals(tmp_path):
+    store = BudgetStore(str(tmp_path / "budgets.json"))
+    store.set("Ăn uống", 100000)
+    store.set("Ăn uống", 50000, person="Vợ")
+    rollup = Rollup(str(tmp_path / "rollup.json"), save_interval=0)
+    rollup.add("2026-10-01", "Ăn uống", "Bản thân", 60000)
+    rollup.add("2026-10-02", "Ăn uống", "Vợ", 45000)
+
+    alerts = budgets.evaluate(store, rollup, 2026, 10, "Ăn uống", "Vợ", 45000)
+    assert alerts == [("Ăn uống", ALL_PERSONS, 100000, 105000, 1.0), ("Ăn uống", "vợ", 50000, 45000, 0.8)]
+    assert budgets.evaluate(store, rollup, 2026, 10, "Xăng xe", "Vợ", 45000) == []
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pandas as pd
+
+from expense_manager import ExpenseManager, _compact_frame, _empty_frame
+
+
+def _raw(columns):
+    """Raw sheet frame: the given columns, the rest filled with one valid value per row."""
+    rows = len(next(iter(columns.values())))
+    base = {"ID": "1", "Ngày": "2026-10-01", "Giờ": "12:30:00", "Người": "Bản thân",
+            "Danh mục": "Ăn uống", "Số tiền": "50.000", "Mô tả": "cơm"}
+    return pd.DataFrame({name: columns.get(name, [value] * rows) for name, value in base.items()})
+
+
+def test_compact_frame_types_and_merges_date_and_time():
+    df = _compact_frame(_raw({
+        "ID": ["1", "2", "3"],
+        "Ngày": ["2026-10-01", "02/10/2026", "2026-10-03"],
+        "Giờ": ["12:30:00", "08:05", ""],
+        "Người": ["Bản thân", "Vợ", "Bản thân"],
+        "Danh mục": ["Ăn uống", "Xăng xe", "Ăn uống"],
+        "Số tiền": ["50.000", "1,200,000 đ", ""],
+    }))
+    assert list(df.columns) == ["ID", "Ngày", "Người", "Danh mục", "Số tiền", "Mô tả"]
+    assert str(df["Ngày"].dtype) == "datetime64[ns]"
+    assert isinstance(df["Người"].dtype, pd.CategoricalDtype) and isinstance(df["Danh mục"].dtype, pd.CategoricalDtype)
+    assert df["Số tiền"].dtype == "int64"
+    assert list(df["Ngày"]) == [pd.Timestamp("2026-10-01 12:30"), pd.Timestamp("2026-10-02 08:05"), pd.Timestamp("2026-10-03")]
+    assert list(df["Số tiền"]) == [50000, 1200000, 0]
+    # Already compact (e.g. after a concat): only re-cast
+    again = _compact_frame(pd.concat([df, df], ignore_index=True))
+    assert again.dtypes.equals(df.dtypes) and len(again) == 6
+
+
+def test_rows_with_invalid_dates_are_dropped():
+    df = _compact_frame(_raw({"ID": ["1", "2", "3"], "Ngày": ["2026-10-01", "hôm qua", ""]}))
+    assert list(df["ID"]) == ["1"]
+    assert _compact_frame(pd.DataFrame()).dtypes.equals(_empty_frame().dtypes)
+
+
+def test_invalid_dates_are_dropped_at_load(standin):
+    manager = ExpenseManager()
+    manager.add_expense(50000, "cơm trưa", force_id=1)
+    title = manager._get_worksheet_name(datetime.now())
+    standin.sheets[title].insert(2, [2, "không rõ", "", "Bản thân", "Ăn uống", 20000, "ghi tay"])
+    manager._frame_cache.clear()
+    df = manager.get_expenses()
+    assert list(df["ID"]) == ["1"]
+    assert df["Ngày"].iloc[0].date() == datetime.now().date()
+    assert df["Số tiền"].dtype == "int64"
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import config
+import schema
+from expense_manager import ExpenseManager
+
+
+def _ids(standin, title):
+    return [row[0] for row in standin.sheets[title][1:] if row and row[0] != ""]
+
+
+def _manager_with_rows(standin, count):
+    manager = ExpenseManager()
+    for i in range(1, count + 1):
+        manager.add_expense(1000 * i, f"cơm {i}", force_id=i)
+    return manager, manager._get_worksheet_name(datetime.now())
+
+
+def test_compaction_removes_only_tombstones(standin, monkeypatch):
+    monkeypatch.setattr(config, "COMPACTION_BATCH_SIZE", 1)
+    manager, title = _manager_with_rows(standin, 5)
+    manager.delete_expense(2)
+    manager.delete_expense(4)
+    assert manager.compact_tombstones() == {title: 2}
+    assert _ids(standin, title) == [1, 3, 5]
+
+
+def test_compaction_stops_when_rows_move_between_batches(standin, monkeypatch):
+    monkeypatch.setattr(config, "COMPACTION_BATCH_SIZE", 1)
+    manager, title = _manager_with_rows(standin, 5)
+    manager.delete_expense(2)
+    manager.delete_expense(4)
+
+    spreadsheet = manager._get_spreadsheet()
+    batch_update = spreadsheet.batch_update
+    def insert_by_hand_after_first_batch(body):
+        result = batch_update(body)
+        standin.sheets[title].insert(1, [99, "2026-10-19", "", "Bản thân", "Khác", 1, "tay"])
+        return result
+    monkeypatch.setattr(spreadsheet, "batch_update", insert_by_hand_after_first_batch)
+
+    assert manager.compact_tombstones() == {title: 1}
+    # Row 4 was deleted; row 2's tombstone moved down and is kept, nothing else is lost
+    assert _ids(standin, title) == [99, 1, 2, 3, 5]
+
+
+def test_reclassify_skips_tombstoned_rows(standin):
+    manager, title = _manager_with_rows(standin, 3)
+    manager.delete_expense(2)
+    columns = manager.schema.columns(title)
+    rows = standin.sheets[title][1:4]
+    for row in rows:
+        row[columns["category"]] = "Khác"
+    result = manager.reclassify(apply=True)
+    assert result["rows"] == 2
+    categories = [row[columns["category"]] for row in rows]
+    status = [row[columns["status"]] if len(row) > columns["status"] else "" for row in rows]
+    assert status[1] == schema.TOMBSTONE and categories[1] == "Khác"
+    assert categories[0] == categories[2] == "Ăn uống"
+
+
+def test_reclassify_preview_does_not_wait_for_writers(standin):
+    manager, title = _manager_with_rows(standin, 2)
+    columns = manager.schema.columns(title)
+    standin.sheets[title][1][columns["category"]] = "Khác"
+    result = {}
+    with manager._write_lock:
+        preview = threading.Thread(target=lambda: result.update(manager.reclassify()))
+        preview.start()
+        preview.join(5)
+    assert result["sheets"] == {title: 1}
+    assert standin.sheets[title][1][columns["category"]] == "Khác"
+
+
+def test_sheet_without_a_status_column_deletes_the_row(standin):
+    title = f"{config.GOOGLE_SHEET_NAME} {datetime.now():%m/%Y}"
+    header = ["ID", "Ngày hôm nay", "Giờ", "Người", "Danh mục", "Số tiền", "Mô tả", "Ghi chú"]
+    today = f"{datetime.now():%Y-%m-%d}"
+    standin.add_sheet(title, [header] + [[i, today, "12:00:00", "Bản thân", "Ăn uống", 1000 * i, "cơm", f"ghi chú {i}"]
+                                         for i in (1, 2, 3)])
+    manager = ExpenseManager()
+    assert "status" not in manager.schema.columns(title)
+    block = [row[9:12] for row in standin.sheets[title][:5]]
+
+    assert manager.delete_expense(2)
+    assert asyncio.run(manager.delete_expense_async(3))
+    assert _ids(standin, title) == [1]
+    assert standin.sheets[title][1][7] == "ghi chú 1"
+    assert [row[9:12] for row in standin.sheets[title][:5]] == block
+    assert list(manager.get_expenses()["ID"]) == ["1"]
+    assert manager.get_month_total("Ăn uống") == 1000
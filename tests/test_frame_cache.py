@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+from expense_manager import ExpenseManager
+
+
+@pytest.fixture
+def manager(standin, monkeypatch):
+    """Manager on the stand-in whose fingerprints come from `marks` (the stand-in
+    stores formulas as text) and whose month downloads are counted in `fetches`."""
+    manager = ExpenseManager()
+    manager.marks, manager.fetches = {}, []
+    monkeypatch.setattr(manager, "_read_fingerprints", lambda titles: {t: manager.marks.get(t) for t in titles})
+    fetch = manager._fetch_month_frame
+    def counted(worksheet):
+        manager.fetches.append(worksheet.title)
+        return fetch(worksheet)
+    monkeypatch.setattr(manager, "_fetch_month_frame", counted)
+    manager.add_expense(50000, "cơm trưa")
+    manager.add_expense(20000, "cà phê")
+    manager.title = manager._get_worksheet_name(datetime.now())
+    return manager
+
+
+def _week(manager):
+    today = datetime.now().date()
+    return manager.get_expenses(today.replace(day=1), today)
+
+
+def test_month_is_downloaded_again_only_when_its_fingerprint_moves(manager, standin):
+    manager.marks[manager.title] = (3, 70000, 11)
+    assert len(_week(manager)) == 2
+    assert len(_week(manager)) == 2
+    assert manager.fetches == [manager.title]
+
+    # Edited by hand: same count and total, the checksum moves
+    description = manager.schema.columns(manager.title)["description"]
+    standin.sheets[manager.title][1][description] = "phở"
+    assert "phở" not in set(_week(manager)["Mô tả"])
+    manager.marks[manager.title] = (3, 70000, 12)
+    assert "phở" in set(_week(manager)["Mô tả"])
+    assert len(manager.fetches) == 2
+
+
+def test_month_without_fingerprint_is_always_downloaded(manager):
+    _week(manager)
+    _week(manager)
+    assert manager.fetches == [manager.title] * 2
+
+
+def test_snapshot_restores_only_unchanged_months(manager, monkeypatch):
+    manager.marks[manager.title] = (3, 70000, 11)
+    _week(manager)
+    state = manager.export_state()
+    assert list(state["frames"]) == [manager.title]
+
+    fresh = ExpenseManager()
+    monkeypatch.setattr(fresh, "_read_fingerprints", lambda titles: {t: manager.marks.get(t) for t in titles})
+    assert fresh.restore_state(state) == 1
+    monkeypatch.setattr(fresh, "_fetch_month_frame", lambda ws: pytest.fail("restored month was downloaded"))
+    assert len(_week(fresh)) == 2
+
+    manager.marks[manager.title] = (4, 90000, 15)
+    assert ExpenseManager().restore_state(state) == 0
+
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+import importer
+
+
+class FakeManager:
+    """Collects the records import_statement hands to add_expenses_batch."""
+
+    def __init__(self):
+        self.records = []
+
+    def add_expenses_batch(self, records):
+        self.records.extend(records)
+        return [r["ID"] for r in records]
+
+
+def _import(path):
+    manager = FakeManager()
+    importer.import_statement(str(path), manager)
+    return [(r["amount"], r["category"] == importer.INCOME_CATEGORY) for r in manager.records]
+
+
+def test_unsigned_amount_column_is_spending(tmp_path):
+    path = tmp_path / "s.csv"
+    path.write_text("Ngày,Mô tả,Số tiền\n01/10/2026,cơm trưa,50.000\n02/10/2026,grab,30.000\n", encoding="utf-8")
+    assert _import(path) == [(50000, False), (30000, False)]
+
+
+def test_signed_amount_column_marks_income(tmp_path):
+    path = tmp_path / "s.csv"
+    path.write_text("Ngày,Mô tả,Số tiền\n01/10/2026,cơm trưa,-50.000\n02/10/2026,lương,5.000.000\n", encoding="utf-8")
+    assert _import(path) == [(50000, False), (5000000, True)]
+
+
+def test_type_column_decides_direction(tmp_path):
+    path = tmp_path / "s.csv"
+    path.write_text("Ngày,Mô tả,Số tiền,Debit/Credit\n01/10/2026,cơm,50000,D\n02/10/2026,hoàn tiền,20000,C\n",
+                    encoding="utf-8")
+    columns = importer.detect_statement_columns(["Ngày", "Mô tả", "Số tiền", "Debit/Credit"])
+    assert columns["type"] == "Debit/Credit" and "debit" not in columns
+    assert _import(path) == [(50000, False), (20000, True)]
+
+
+def test_debit_credit_columns(tmp_path):
+    path = tmp_path / "s.csv"
+    path.write_text("Ngày;Diễn giải;Ghi nợ;Ghi có\n01/10/2026;cơm;50.000;\n02/10/2026;lương;;7.000.000\n",
+                    encoding="utf-8")
+    assert _import(path) == [(50000, False), (7000000, True)]
+
+
+def test_csv_title_rows_are_skipped(tmp_path):
+    path = tmp_path / "s.csv"
+    path.write_text("SAO KÊ TÀI KHOẢN\nTừ 01/10/2026 đến 31/10/2026\n\n"
+                    "Ngày giao dịch,Nội dung,Số tiền\n01/10/2026,cơm,45.000\n", encoding="utf-8")
+    assert _import(path) == [(45000, False)]
+
+
+def test_xlsx_numeric_amounts_are_not_digit_stripped(tmp_path):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Sao kê tài khoản"])
+    sheet.append(["Ngày", "Mô tả", "Số tiền"])
+    sheet.append(["01/10/2026", "cơm", 150000.0])
+    sheet.append(["02/10/2026", "trà sữa", 45000])
+    path = tmp_path / "s.xlsx"
+    workbook.save(path)
+    assert _import(path) == [(150000, False), (45000, False)]
+
+
+def test_parse_amounts_text_and_numbers():
+    series = pd.Series(["1.234.567", "1,234,567.00", "-50000", "(20.000)", 150000.0, 99.6, None, ""], dtype=object)
+    assert list(importer.parse_amounts(series)) == [1234567, 1234567, -50000, -20000, 150000, 100, 0, 0]
+
+
+def test_statement_without_a_header_row_is_rejected(tmp_path):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.active.append(["Sao kê tài khoản"])
+    workbook.active.append(["01/10/2026", "cơm", 50000])
+    xlsx = tmp_path / "s.xlsx"
+    workbook.save(xlsx)
+    csv_path = tmp_path / "s.csv"
+    csv_path.write_text("a,b,c\n01/10/2026,cơm,50000\n", encoding="utf-8")
+    for path in (xlsx, csv_path):
+        with pytest.raises(ValueError, match="Không nhận diện"):
+            _import(path)
@@ -0,0 +1,21 @@
+import config
+import keep_alive
+
+
+def _client(monkeypatch, token):
+    monkeypatch.setattr(config, "METRICS_TOKEN", token)
+    monkeypatch.setattr(keep_alive, "metrics_provider", lambda: {"queues": {"running": 0}})
+    return keep_alive.app.test_client()
+
+
+def test_metrics_disabled_without_token(monkeypatch):
+    assert _client(monkeypatch, "").get("/metrics").status_code == 404
+
+
+def test_metrics_requires_matching_token(monkeypatch):
+    client = _client(monkeypatch, "s3cret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.get_json() == {"queues": {"running": 0}}
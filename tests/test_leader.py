@@ -0,0 +1,91 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import leader
+import schema
+from budgets import BudgetStore
+from expense_manager import ExpenseManager
+from rollup import Rollup
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return leader.MemoryLeaseStore()
+    return leader.FileLeaseStore(str(tmp_path / "lease"))
+
+
+def test_one_leader_at_a_time_and_handover_on_release(store):
+    old, new = leader.Lease(store, holder="old", ttl=30), leader.Lease(store, holder="new", ttl=30)
+    assert old.renew() and old.is_leader
+    assert not new.renew() and not new.is_leader
+    assert old.renew() # renewing our own lease
+    old.release()
+    assert not old.is_leader
+    assert new.renew() and store.holder("bot") == "new"
+
+
+def test_expired_lease_is_taken_over(store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(leader.time, "time", lambda: clock[0])
+    old, new = leader.Lease(store, holder="old", ttl=30), leader.Lease(store, holder="new", ttl=30)
+    assert old.renew()
+    clock[0] += 31
+    assert not old.is_leader
+    assert new.renew()
+    assert not old.renew()
+
+
+def test_spool_drains_in_order_and_keeps_files_when_the_write_fails(tmp_path):
+    spool = leader.WriteSpool(str(tmp_path / "spool"))
+    spool.put({"ID": "1", "amount": 50000, "description": "cơm", "date": datetime(2026, 10, 19, 12, 30)})
+    spool.put({"ID": "2", "amount": 20000, "description": "cà phê"})
+
+    def failing(records):
+        raise RuntimeError("sheets down")
+    with pytest.raises(RuntimeError):
+        spool.drain(failing)
+    assert len(spool.pending()) == 2
+
+    seen = []
+    assert spool.drain(seen.extend) == 2
+    assert [r["ID"] for r in seen] == ["1", "2"]
+    assert seen[0]["date"] == datetime(2026, 10, 19, 12, 30)
+    assert spool.pending() == []
+
+
+def test_followers_never_write_local_state_and_leaders_reload_it(tmp_path):
+    path = str(tmp_path / "budgets.json")
+    leader_budgets, follower_budgets = BudgetStore(path), BudgetStore(path)
+    rollup = Rollup(str(tmp_path / "rollup.json"), save_interval=0)
+    leader.set_writable([follower_budgets, rollup], False)
+
+    follower_budgets.set("Ăn uống", 1000000)
+    rollup.add("2026-10-19", "Ăn uống", "Bản thân", 50000)
+    assert not os.path.exists(path) and not os.path.exists(str(tmp_path / "rollup.json"))
+
+    leader_budgets.set("Xăng xe", 500000)
+    leader.set_writable([follower_budgets, rollup], True)
+    assert follower_budgets.items() == [("Xăng xe", "*", 500000)]
+    assert rollup.month_total(2026, 10, "Ăn uống") == 0
+
+    follower_budgets.set("Ăn uống", 1000000)
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"Xăng xe|*", "Ăn uống|*"}
+
+
+def test_follower_manager_leaves_worksheets_to_the_leader(standin, monkeypatch):
+    started = []
+    monkeypatch.setattr(schema, "start_background_migration", lambda *args: started.append(args))
+    manager = ExpenseManager(read_only=True)
+    leader.set_writable([manager.schema, manager], False)
+    assert manager.get_expenses().empty
+    assert standin.sheets == {}
+    assert not started and not os.path.exists(manager.schema.path)
+
+    leader.set_writable([manager.schema, manager], True)
+    assert manager._get_worksheet_name(datetime.now()) in standin.sheets
+    assert len(started) == 1
@@ -0,0 +1,65 @@
+import asyncio
+
+from telegram.error import RetryAfter
+
+from notifier import Broadcaster
+
+
+class FakeBot:
+    """Records sends; `fail` maps chat_id -> list of exceptions raised on successive sends."""
+
+    def __init__(self, fail=None, delay=0):
+        self.sent = []
+        self.fail = fail or {}
+        self.delay = delay
+        self.in_flight = self.peak = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            errors = self.fail.get(chat_id)
+            if errors:
+                raise errors.pop(0)
+            self.sent.append((chat_id, text, kwargs))
+        finally:
+            self.in_flight -= 1
+
+
+def test_broadcast_reaches_every_chat_within_the_concurrency_cap():
+    bot = FakeBot(delay=0.01)
+    broadcaster = Broadcaster(max_concurrency=2, per_chat_interval=0)
+    delivered = asyncio.run(broadcaster.broadcast(bot, [1, 2, 3, 4, 5], "báo cáo", parse_mode="Markdown"))
+    assert delivered == 5
+    assert sorted(chat for chat, _, _ in bot.sent) == [1, 2, 3, 4, 5]
+    assert all(kwargs == {"parse_mode": "Markdown"} for _, _, kwargs in bot.sent)
+    assert bot.peak == 2
+
+
+def test_failed_chat_does_not_stop_the_others():
+    bot = FakeBot(fail={2: [RuntimeError("bot was blocked by the user")]})
+    broadcaster = Broadcaster(max_concurrency=4, per_chat_interval=0)
+    assert asyncio.run(broadcaster.broadcast(bot, [1, 2, 3], "báo cáo")) == 2
+    assert sorted(chat for chat, _, _ in bot.sent) == [1, 3]
+
+
+def test_flood_control_is_retried_once():
+    bot = FakeBot(fail={1: [RetryAfter(0)], 2: [RetryAfter(0), RetryAfter(0)]})
+    broadcaster = Broadcaster(max_concurrency=4, per_chat_interval=0)
+    assert asyncio.run(broadcaster.broadcast(bot, [1, 2], "báo cáo")) == 1
+    assert [chat for chat, _, _ in bot.sent] == [1]
+
+
+def test_sends_to_one_chat_are_spaced_out():
+    bot = FakeBot()
+    broadcaster = Broadcaster(max_concurrency=4, per_chat_interval=0.05)
+
+    async def twice():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(broadcaster.send(bot, 7, "một"), broadcaster.send(bot, 7, "hai"))
+        return loop.time() - start
+
+    assert asyncio.run(twice()) >= 0.05
+    assert [text for _, text, _ in bot.sent] == ["một", "hai"]
@@ -0,0 +1,42 @@
+import pandas as pd
+
+import pagination
+from pagination import ReportPaginator
+
+
+def test_split_pages_respects_the_character_budget_and_row_cap():
+    lines = ["x" * 9] * 5 # 10 characters each with the newline
+    assert [len(p) for p in pagination.split_pages(lines, budget=30, max_rows=10)] == [3, 2]
+    assert [len(p) for p in pagination.split_pages(lines, budget=1000, max_rows=2)] == [2, 2, 1]
+    assert pagination.split_pages([], budget=30, max_rows=10) == []
+
+
+def test_overlong_line_is_truncated_onto_its_own_page():
+    pages = pagination.split_pages(["a", "b" * 100, "c"], budget=20, max_rows=10)
+    assert pages == [["a"], ["b" * 20], ["c"]]
+
+
+def test_render_expense_lines():
+    df = pd.DataFrame({
+        "ID": [7, 8],
+        "Ngày": pd.to_datetime(["2026-10-01", "2026-10-02"]),
+        "Số tiền": [50000, 1000000],
+        "Mô tả": ["cơm", "lương"],
+        "Danh mục": ["Ăn uống", "Thu nhập"],
+    })
+    assert pagination.render_expense_lines(df, with_id=True) == [
+        "➖ 2026-10-01 | ID: `7` | 50,000 đ: cơm",
+        "➕ 2026-10-02 | ID: `8` | 1,000,000 đ: lương",
+    ]
+
+
+def test_paginator_pages_and_expiry(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(pagination.time, "monotonic", lambda: clock[0])
+    paginator = ReportPaginator(ttl=60, page_rows=2)
+    cursor, total = paginator.create("Tuần này\n", ["a", "b", "c"], footer="Tổng: 3")
+    assert total == 2
+    assert paginator.get(cursor, 5) == ("Tuần này\nc\n\n📄 Trang 2/2\nTổng: 3", 2)
+    assert paginator.keyboard(cursor, 0, total) is not None and paginator.keyboard(cursor, 0, 1) is None
+    clock[0] += 61
+    assert paginator.get(cursor, 0) is None
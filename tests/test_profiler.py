@@ -0,0 +1,65 @@
+import asyncio
+import re
+
+from profiler import MESSAGE_LIMIT, HandlerProfiler
+
+
+class FakeBot:
+    def __init__(self, fail_message=False):
+        self.fail_message = fail_message
+        self.messages = []
+        self.documents = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.fail_message:
+            raise RuntimeError("Can't parse entities")
+        self.messages.append(text)
+
+    async def send_document(self, chat_id, document, filename, caption=None):
+        self.documents.append(filename)
+
+
+def _outside_code(text):
+    return "".join(part for i, part in enumerate(text.split("```")) if i % 2 == 0)
+
+
+def _profile(bot, names):
+    profiler = HandlerProfiler()
+    profiler.arm(len(names), chat_id=1)
+
+    async def handler():
+        return sum(range(1000))
+
+    async def run_all():
+        for name in names:
+            await profiler.run(name, handler, bot)
+
+    asyncio.run(run_all())
+    return profiler
+
+
+def test_handler_names_stay_inside_code_blocks():
+    bot = FakeBot()
+    profiler = _profile(bot, ["handle_message", "view_week"])
+    assert not profiler.active
+    report = bot.messages[0]
+    assert report.count("```") % 2 == 0
+    assert "handle_message" in report
+    assert "_" not in _outside_code(report)
+    assert bot.documents == ["profile.pstats"]
+
+
+def test_report_trims_hotspots_to_message_limit():
+    profiler = HandlerProfiler(top=500)
+    hotspots = [f"  0.001s   0.001s      1  some_module.py:{i} some_function_{i}" for i in range(500)]
+    report = profiler._report([("handle_message", 0.5)] * 100, hotspots, None)
+    assert len(report) <= MESSAGE_LIMIT
+    assert report.endswith("```\n")
+    assert re.search(r"\.\.\. \+70", report)
+
+
+def test_document_sent_even_if_report_fails():
+    bot = FakeBot(fail_message=True)
+    _profile(bot, ["handle_message"])
+    assert bot.messages == []
+    assert bot.documents == ["profile.pstats"]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from expense_manager import ExpenseManager
+
+
+def _previous_month(day):
+    return (datetime.now().replace(day=1) - timedelta(days=1)).replace(day=day)
+
+
+def _recent_ids(manager, n):
+    return list(manager.get_recent_expenses(n)["ID"])
+
+
+def test_recent_reads_past_tombstones_before_the_previous_month(standin):
+    manager = ExpenseManager()
+    manager.add_expenses_batch([{"ID": f"prev{i}", "amount": 1000, "description": "cơm",
+                                 "date": _previous_month(i)} for i in range(1, 6)])
+    now = datetime.now()
+    manager.add_expenses_batch([{"ID": f"cur{i}", "amount": 1000, "description": "cơm",
+                                 "date": now} for i in range(1, 21)])
+    for i in (18, 19, 20):
+        manager.delete_expense(f"cur{i}")
+
+    assert _recent_ids(manager, 10) == [f"cur{i}" for i in range(8, 18)]
+    assert _recent_ids(manager, 20) == ["prev3", "prev4", "prev5"] + [f"cur{i}" for i in range(1, 18)]
+
+
+def test_recent_skips_a_fully_tombstoned_month(standin):
+    manager = ExpenseManager()
+    manager.add_expenses_batch([{"ID": f"prev{i}", "amount": 1000, "description": "cơm",
+                                 "date": _previous_month(i)} for i in range(1, 4)])
+    manager.add_expenses_batch([{"ID": "cur1", "amount": 1000, "description": "cơm", "date": datetime.now()}])
+    manager.delete_expense("cur1")
+    assert _recent_ids(manager, 2) == ["prev2", "prev3"]
@@ -0,0 +1,47 @@
+from datetime import date
+
+import recurring
+from recurring import RecurringStore
+
+
+def _rule(schedule, param, start, last_run=None):
+    return {"id": 1, "schedule": schedule, "param": param, "start": start, "last_run": last_run}
+
+
+def test_monthly_day_31_falls_back_to_the_last_day_of_short_months():
+    rule = _rule("monthly", 31, "2026-01-01")
+    assert recurring.occurrences(rule, date(2026, 4, 30)) == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+    assert recurring.occurrences(_rule("monthly", 29, "2028-02-01"), date(2028, 2, 29)) == [date(2028, 2, 29)]
+
+
+def test_weekly_and_every_n_days():
+    # 2026-10-05 is a Monday
+    assert recurring.occurrences(_rule("weekly", 0, "2026-10-01"), date(2026, 10, 19)) == [
+        date(2026, 10, 5), date(2026, 10, 12), date(2026, 10, 19)]
+    assert recurring.occurrences(_rule("every", 10, "2026-10-03"), date(2026, 10, 25)) == [
+        date(2026, 10, 3), date(2026, 10, 13), date(2026, 10, 23)]
+
+
+def test_last_run_skips_occurrences_already_written():
+    rule = _rule("every", 1, "2026-10-01", last_run="2026-10-17")
+    assert recurring.occurrences(rule, date(2026, 10, 19)) == [date(2026, 10, 18), date(2026, 10, 19)]
+    assert recurring.occurrences(rule, date(2026, 10, 17)) == []
+
+
+def test_materialize_writes_missed_occurrences_with_stable_ids(tmp_path):
+    class FakeManager:
+        def __init__(self):
+            self.records = []
+
+        def add_expenses_batch(self, records):
+            self.records.extend(records)
+            return [r["ID"] for r in records]
+
+    store = RecurringStore(str(tmp_path / "recurring.json"))
+    rule = store.add("monthly", 5, 5000000, "tiền nhà", start=date(2026, 8, 1))
+    manager = FakeManager()
+    assert recurring.materialize(store, manager, today=date(2026, 10, 19)) == [
+        f"r{rule['id']}-20260805", f"r{rule['id']}-20260905", f"r{rule['id']}-20261005"]
+    assert recurring.materialize(store, manager, today=date(2026, 10, 19)) == []
+    assert RecurringStore(store.path).rules[0]["last_run"] == "2026-10-19"
@@ -0,0 +1,26 @@
+import response_cache
+from response_cache import ResponseCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: clock[0])
+    cache = ResponseCache(ttl=60)
+    cache.put("month", "report")
+    clock[0] += 59
+    assert cache.get("month") == "report"
+    clock[0] += 1
+    assert cache.get("month") is None
+    cache.put("month", "fresh")
+    assert cache.get("month") == "fresh"
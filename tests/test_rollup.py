@@ -0,0 +1,80 @@
+import json
+from datetime import date, datetime
+
+import config
+from expense_manager import ExpenseManager
+from rollup import Rollup
+
+
+def _saved(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_saves_are_batched_until_flush(tmp_path):
+    path = tmp_path / "rollup.json"
+    rollup = Rollup(str(path), save_interval=3600)
+    rollup.build_month(2026, 10, [("2026-10-01", "Ăn uống", "Bản thân", 50000)], fingerprint=(1, 50000, 7))
+    rollup.add("2026-10-02", "Ăn uống", "Bản thân", 30000)
+    rollup.remove("2026-10-01", "Ăn uống", "Bản thân", 50000)
+    assert _saved(path)["days"] == {"2026-10-01": {"Ăn uống": {"Bản thân": 50000}}}
+
+    rollup.flush()
+    reloaded = Rollup(str(path))
+    assert reloaded.has_month(2026, 10)
+    assert reloaded.month_total(2026, 10, "Ăn uống") == 30000
+    assert reloaded.check_month(2026, 10, (1, 50000, 7))
+
+
+def test_check_month_rebuilds_foreign_edits_and_adopts_own_writes(tmp_path):
+    rollup = Rollup(str(tmp_path / "rollup.json"))
+    rollup.build_month(2026, 10, [], fingerprint=(1, 0, 0))
+    assert rollup.check_month(2026, 10, (1, 0, 0))
+    assert not rollup.check_month(2026, 10, (1, 0, 5)) # edited elsewhere
+
+    rollup.mark_written(2026, 10)
+    assert rollup.check_month(2026, 10, (2, 100, 9))
+    assert rollup.check_month(2026, 10, (2, 100, 9))
+    assert not rollup.check_month(2026, 10, (3, 200, 12))
+    # No summary block to compare: trusted as before
+    assert rollup.check_month(2026, 10, None)
+
+
+def test_check_is_rate_limited(tmp_path):
+    rollup = Rollup(str(tmp_path / "rollup.json"))
+    assert rollup.check_due(2026, 10)
+    rollup.build_month(2026, 10, [])
+    assert not rollup.check_due(2026, 10, interval=3600)
+    assert rollup.check_due(2026, 10, interval=0)
+
+
+def test_query_splits_income_and_persons(tmp_path):
+    rollup = Rollup(str(tmp_path / "rollup.json"))
+    rollup.add_many([
+        ("2026-10-01", "Ăn uống", "Bản thân", 50000),
+        ("2026-10-02", "Ăn uống", "Vợ", 20000),
+        ("2026-10-03", "Thu nhập", "Bản thân", 1000000),
+        ("2026-11-01", "Ăn uống", "Bản thân", 99000),
+    ])
+    result = rollup.query(date(2026, 10, 1), date(2026, 10, 31))
+    assert result["categories"] == {"Ăn uống": 70000, "Thu nhập": 1000000}
+    assert result["persons"] == {"Bản thân": 50000, "Vợ": 20000}
+    assert rollup.month_total(2026, 10, "Ăn uống", person="vợ") == 20000
+
+
+def test_manager_rebuilds_a_month_edited_in_the_sheet(standin, monkeypatch):
+    monkeypatch.setattr(config, "ROLLUP_VERIFY_INTERVAL", 0)
+    manager = ExpenseManager()
+    title = manager._get_worksheet_name(datetime.now())
+    marks = {title: (1, 0, 0)}
+    monkeypatch.setattr(manager, "_read_fingerprints", lambda titles: {t: marks.get(t) for t in titles})
+    now = datetime.now()
+    manager.add_expense(50000, "cơm trưa")
+    marks[title] = (2, 50000, 10) # our own write: adopted
+    assert manager.get_month_total("Ăn uống") == 50000
+
+    amount = manager.schema.columns(title)["amount"]
+    standin.sheets[title][1][amount] = 80000
+    assert manager.get_month_total("Ăn uống") == 50000 # fingerprint unchanged: no read
+    marks[title] = (2, 80000, 10)
+    assert manager.get_month_total("Ăn uống", month=now.month, year=now.year) == 80000
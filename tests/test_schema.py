@@ -0,0 +1,50 @@
+import config
+import schema
+import sheets_client
+from expense_manager import ExpenseManager
+from schema import start_background_migration
+
+LEGACY_HEADER = ["ID", "Ngày", "Giờ", "Người", "Danh mục", "Số tiền", "Mô tả"]
+
+
+def test_detect_columns_aliases_and_positions():
+    columns = schema.detect_columns(["id", "Date", "Giờ", "Người", "Category", "Số tiền", "Mô tả", "Trạng thái"])
+    assert columns == {field: i for i, field in enumerate(schema.FIELDS)}
+    # No status column unless it has its header
+    assert "status" not in schema.detect_columns(LEGACY_HEADER + ["Ghi chú"])
+
+
+def test_background_migration_upgrades_legacy_sheets_once(standin, tmp_path, monkeypatch):
+    title = f"{config.GOOGLE_SHEET_NAME} 09/2025"
+    standin.add_sheet(title, [LEGACY_HEADER, [1, "2025-09-01", "12:00:00", "Bản thân", "Ăn uống", 50000, "cơm"]])
+    standin.add_sheet("Ghi chú", [["không phải sheet tháng"]])
+    backup_title = f"{title} (backup 20251001-020000)"
+    standin.add_sheet(backup_title, [LEGACY_HEADER])
+    spreadsheet = sheets_client.get_client().open(config.GOOGLE_SHEET_NAME)
+    registry = schema.SchemaRegistry(str(tmp_path / "schema.json"))
+
+    start_background_migration(spreadsheet, registry, config.GOOGLE_SHEET_NAME).join(10)
+    header = standin.sheets[title][0]
+    assert header[:8] == schema.CANONICAL_HEADER
+    assert registry.get(title)["version"] == schema.SCHEMA_VERSION
+    assert registry.columns(title)["status"] == 7
+    assert schema.SchemaRegistry(registry.path).is_current(title)
+    assert registry.get("Ghi chú") is None
+    assert registry.get(backup_title) is None and standin.sheets[backup_title][0] == LEGACY_HEADER
+
+    migrated = []
+    monkeypatch.setattr(schema, "migrate_worksheet", lambda worksheet, registry: migrated.append(worksheet.title))
+    start_background_migration(spreadsheet, registry, config.GOOGLE_SHEET_NAME).join(10)
+    assert migrated == []
+
+
+def test_restored_backups_are_not_listed_as_months(standin):
+    title = f"{config.GOOGLE_SHEET_NAME} 09/2025"
+    row = [1, "2025-09-01", "12:00:00", "Bản thân", "Ăn uống", 50000, "cơm"]
+    standin.add_sheet(title, [LEGACY_HEADER, row])
+    standin.add_sheet(f"{title} (backup 20251001-020000)", [LEGACY_HEADER, row])
+    assert schema.is_month_title(title, config.GOOGLE_SHEET_NAME)
+    assert not schema.is_month_title(f"{title} (backup 20251001-020000)", config.GOOGLE_SHEET_NAME)
+
+    manager = ExpenseManager(read_only=True) # no current month sheet: all months are listed
+    assert list(manager.get_expenses()["ID"]) == ["1"]
@@ -0,0 +1,67 @@
+import sheet_summary
+
+COLUMNS = {"id": 0, "date": 1, "time": 2, "person": 3, "category": 4, "amount": 5, "description": 6, "status": 7}
+
+
+class FakeWorksheet:
+    title = "Quản lý chi tiêu 01/2024"
+
+    def __init__(self, ids, persons, categories):
+        self.values = {"D": persons, "E": categories, "A": ids}
+        self.written = None
+
+    def batch_get(self, ranges):
+        return [[[v] for v in self.values.get(r[0], [])] for r in ranges]
+
+    def update(self, range_name, values, value_input_option=None):
+        self.written = values
+
+
+def _values(rows, figures):
+    """Block rows as read back (unformatted), with L replaced by the given figures."""
+    return [[row[0], row[1], figures.get((row[0], row[1]), 0)] for row in rows]
+
+
+def test_block_rows_keep_fingerprint_cells_in_place():
+    rows = sheet_summary.block_rows(COLUMNS, ["Bản thân"])
+    labels = [row[0] for row in rows]
+    assert labels[:5] == [sheet_summary.BLOCK_LABEL, "total", "checksum", "income", "spent"]
+    assert sheet_summary.FINGERPRINT_RANGE == "L2:L4"
+    # spent = total (L3) - income (L5)
+    assert rows[4][2] == "=L3-L5"
+    assert "MID(A$2:A&" in rows[2][2] and "H$2:H" in rows[2][2]
+    assert sheet_summary.parse_fingerprint([[3], [70000], [11]]) == (3, 70000, 11)
+    assert sheet_summary.parse_fingerprint([[3], [70000]]) is None
+
+
+def test_legacy_and_blank_categories_get_their_own_rows():
+    categories = sheet_summary.block_categories(["ăn uống", "Ăn vặt", "", None, "Ăn vặt"])
+    assert categories[-2:] == ["Ăn vặt", ""]
+    assert "ăn uống" not in categories # SUMIFS would count it twice with "Ăn uống"
+
+    rows = sheet_summary.block_rows(COLUMNS, ["Bản thân"], categories)
+    blank = next(row for row in rows if row[1] == sheet_summary.BLANK_CATEGORY)
+    assert ',E$2:E,""' in blank[2]
+
+    figures = {("total", ""): 90000, ("spent", ""): 90000, ("category", "Ăn uống"): 50000,
+               ("category", "Ăn vặt"): 30000, ("category", sheet_summary.BLANK_CATEGORY): 10000,
+               ("person", "Bản thân"): 90000}
+    block = sheet_summary.parse_block(_values(rows, figures))
+    assert block["categories"][""] == 10000
+    assert sheet_summary.is_consistent(block)
+    # Without the extra rows the same sheet never adds up
+    assert not sheet_summary.is_consistent(sheet_summary.parse_block(_values(sheet_summary.block_rows(COLUMNS, ["Bản thân"]), figures)))
+
+
+def test_install_adds_categories_seen_in_the_sheet():
+    ws = FakeWorksheet(ids=[1, 2, 3], persons=["Bản thân", "vợ", "Vợ"], categories=["Ăn uống", "Ăn vặt", ""])
+    assert sheet_summary.install(ws, COLUMNS)
+    labels = [(row[0], row[1]) for row in ws.written]
+    assert ("category", "Ăn vặt") in labels and ("category", sheet_summary.BLANK_CATEGORY) in labels
+    assert [l for l in labels if l[0] == "person"] == [("person", "Bản thân"), ("person", "vợ")]
+
+
+def test_install_keeps_a_current_block():
+    ws = FakeWorksheet(ids=[1], persons=["Bản thân"], categories=["Ăn uống"])
+    ws.batch_get = lambda ranges: [[["Bản thân"]], [["Ăn uống"]], [[1]], [[sheet_summary.BLOCK_LABEL, str(sheet_summary.SUMMARY_VERSION)]]]
+    assert sheet_summary.install(ws, COLUMNS) and ws.written is None
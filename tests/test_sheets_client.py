@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import gspread
+
+import sheets_client
+from expense_manager import ExpenseManager
+
+
+def _ids(standin, title):
+    return [row[0] for row in standin.sheets[title][1:] if row and row[0] != ""]
+
+
+def test_failed_append_retries_on_a_fresh_client(standin, monkeypatch):
+    manager = ExpenseManager()
+    broken = sheets_client.get_client().http_client
+    real_append, calls = gspread.Worksheet.append_row, []
+
+    def flaky_append(self, *args, **kwargs):
+        calls.append(self.client)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return real_append(self, *args, **kwargs)
+
+    monkeypatch.setattr(gspread.Worksheet, "append_row", flaky_append)
+    record = manager.add_expense(1000, "cơm", force_id=401)
+    assert not record["is_duplicate"]
+    assert calls[0] is broken and calls[1] is not broken
+    assert sheets_client.get_client().http_client is calls[1]
+
+
+def test_retried_append_bumps_the_data_version(standin, monkeypatch):
+    manager = ExpenseManager()
+    now = datetime.now()
+    real_append, calls = gspread.Worksheet.append_row, []
+
+    def flaky_append(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return real_append(self, *args, **kwargs)
+
+    monkeypatch.setattr(gspread.Worksheet, "append_row", flaky_append)
+    before = manager.data_version(now.year, now.month)
+    manager.add_expense(1000, "cơm", force_id=402)
+    assert manager.data_version(now.year, now.month) == before + 1
+
+
+def test_retry_writes_a_back_dated_expense_to_its_own_month(standin, monkeypatch):
+    manager = ExpenseManager()
+    last_month = datetime.now().replace(day=1) - timedelta(days=1)
+    manager._get_or_create_worksheet(last_month)
+    real_append, calls = gspread.Worksheet.append_row, []
+
+    def flaky_append(self, *args, **kwargs):
+        calls.append((self.title, kwargs))
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return real_append(self, *args, **kwargs)
+
+    monkeypatch.setattr(gspread.Worksheet, "append_row", flaky_append)
+    manager.add_expense(1000, "cơm", date=last_month, force_id=403)
+    title = manager._get_worksheet_name(last_month)
+    assert [c[0] for c in calls] == [title, title]
+    assert calls[1][1] == {"value_input_option": "USER_ENTERED", "table_range": "A:H"}
+    assert _ids(standin, title) == [403]
+
+
+def test_retry_does_not_duplicate_an_append_that_landed(standin, monkeypatch):
+    manager = ExpenseManager()
+    real_append = gspread.Worksheet.append_row
+
+    def lost_response(self, *args, **kwargs):
+        real_append(self, *args, **kwargs)
+        raise ConnectionError("connection reset after the write")
+
+    monkeypatch.setattr(gspread.Worksheet, "append_row", lost_response)
+    manager.add_expense(1000, "cơm", force_id=404)
+    title = manager._get_worksheet_name(datetime.now())
+    assert _ids(standin, title) == [404]
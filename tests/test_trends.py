@@ -0,0 +1,10 @@
+import trends
+
+
+def test_period_count_defaults_and_clamps():
+    assert trends.period_count("month") == 12
+    assert trends.period_count("year") == 5
+    assert trends.period_count("month", 6) == 6
+    assert trends.period_count("month", 500) == 36
+    assert trends.period_count("year", 3000) == 10
+    assert trends.period_count("person", 0) == 12 # "0" falls back to the default
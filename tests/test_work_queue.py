@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from work_queue import Busy, ChatWorkQueues
+
+
+def _run(queues, jobs):
+    """jobs: (chat_id, tag) in submission order; returns (completion order, shed tags, peak concurrency)."""
+    order, shed, running, peak = [], [], [0], [0]
+
+    async def job(chat_id, tag):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        order.append((chat_id, tag))
+        running[0] -= 1
+
+    async def submit(chat_id, tag):
+        try:
+            await queues.run(chat_id, lambda: job(chat_id, tag))
+        except Busy:
+            shed.append((chat_id, tag))
+
+    async def main():
+        await asyncio.gather(*(submit(chat_id, tag) for chat_id, tag in jobs))
+
+    asyncio.run(main())
+    return order, shed, peak[0]
+
+
+def test_updates_of_one_chat_run_in_arrival_order():
+    queues = ChatWorkQueues(max_concurrency=4, max_depth=10, max_total=100)
+    order, shed, _ = _run(queues, [(1, i) for i in range(6)])
+    assert shed == []
+    assert order == [(1, i) for i in range(6)]
+
+
+def test_global_cap_limits_concurrent_handlers():
+    queues = ChatWorkQueues(max_concurrency=2, max_depth=10, max_total=100)
+    _, _, peak = _run(queues, [(chat, 0) for chat in range(6)])
+    assert peak == 2
+
+
+def test_sheds_beyond_chat_depth_and_total():
+    queues = ChatWorkQueues(max_concurrency=2, max_depth=2, max_total=3)
+    order, shed, _ = _run(queues, [(1, 0), (1, 1), (1, 2), (2, 0), (3, 0)])
+    assert (1, 2) in shed # chat 1 already had two pending
+    assert (3, 0) in shed # three pending in total
+    assert queues.metrics()["shed"] == 2
+    assert sorted(order) == [(1, 0), (1, 1), (2, 0)]
+
+
+def test_idle_chats_are_forgotten_and_metrics_reset():
+    queues = ChatWorkQueues(max_concurrency=2, max_depth=5, max_total=10)
+    _run(queues, [(1, 0), (2, 0), (1, 1)])
+    metrics = queues.metrics()
+    assert queues._depth == {} and queues._chat_locks == {}
+    assert metrics["processed"] == 3 and metrics["queued"] == 0 and metrics["running"] == 0
+
+
+def test_handler_errors_propagate_and_release_the_chat():
+    queues = ChatWorkQueues(max_concurrency=1, max_depth=1, max_total=1)
+
+    async def boom():
+        raise ValueError("boom")
+
+    async def main():
+        with pytest.raises(ValueError):
+            await queues.run(1, boom)
+        return await queues.run(1, lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,104 @@
+import io
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+import config
+
+INCOME_CATEGORY = "Thu nhập"
+
+# /trend modes and their accepted spellings
+MODES = {
+    "month": ["thang", "tháng", "mom", "month"],
+    "year": ["nam", "năm", "yoy", "year"],
+    "person": ["nguoi", "người", "person"],
+}
+
+
+def parse_mode(word):
+    word = (word or "").strip().lower()
+    for mode, aliases in MODES.items():
+        if word in aliases:
+            return mode
+    return None
+
+
+# Periods per /trend: (default, maximum); years are whole calendar years
+PERIODS = {"month": (12, 36), "person": (12, 36), "year": (5, 10)}
+
+
+def period_count(mode, requested=None):
+    """Number of periods to show, clamped to 1..maximum of the mode (default when not given)."""
+    default, maximum = PERIODS[mode]
+    return max(1, min(requested or default, maximum))
+
+
+def build_pivot(df, period="M", by="Danh mục"):
+    """Spending per period (rows) and category/person (columns), vectorized.
+
+    Income is excluded from the columns and returned as a separate series.
+    """
+    if df.empty:
+        return pd.DataFrame(), pd.Series(dtype="int64")
+    frame = pd.DataFrame({
+        "period": df['Ngày'].dt.to_period(period),
+        "key": df[by].astype(str),
+        "amount": df['Số tiền'].astype("int64"),
+        "income": df['Danh mục'] == INCOME_CATEGORY,
+    }).dropna(subset=["period"])
+
+    spent = frame[~frame["income"]]
+    pivot = spent.pivot_table(index="period", columns="key", values="amount", aggfunc="sum", fill_value=0)
+    income = frame[frame["income"]].groupby("period")["amount"].sum()
+
+    # Keep empty periods visible so changes are computed against the right neighbour
+    if not frame.empty:
+        full = pd.period_range(frame["period"].min(), frame["period"].max(), freq=period)
+        pivot = pivot.reindex(full, fill_value=0)
+        income = income.reindex(full, fill_value=0)
+    return pivot, income
+
+
+def format_trend(pivot, income, title, top=5):
+    """Text table: total spent per period with change vs the previous one, plus top keys."""
+    if pivot.empty:
+        return None
+    totals = pivot.sum(axis=1)
+    change = totals.pct_change() * 100
+
+    report = f"📈 **{title}**\n"
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    for period, total in totals.items():
+        delta = change.get(period)
+        delta_str = f" ({delta:+.1f}%)" if pd.notna(delta) and abs(delta) != float("inf") else ""
+        report += f"• {period}: ➖ {int(total):,} {config.CURRENCY}{delta_str}"
+        if income.get(period, 0):
+            report += f" | ➕ {int(income[period]):,}"
+        report += "\n"
+
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    report += "🏷 **Lớn nhất cả kỳ:**\n"
+    for key, amount in pivot.sum().sort_values(ascending=False).head(top).items():
+        report += f"• {key}: {int(amount):,} {config.CURRENCY}\n"
+    return report
+
+
+def render_trend_chart(pivot, title):
+    """Stacked bar chart as PNG bytes. Uses the Figure API so it is safe off the main thread."""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bottom = None
+    labels = [str(p) for p in pivot.index]
+    for column in pivot.columns:
+        values = pivot[column].values
+        ax.bar(labels, values, bottom=bottom, label=str(column))
+        bottom = values if bottom is None else bottom + values
+    ax.set_title(title)
+    ax.legend(fontsize="small")
+    ax.tick_params(axis="x", rotation=45)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    buf.seek(0)
+    return buf
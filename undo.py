@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class UndoLog:
+    """Most recent soft deletes per user, persisted as JSON so /undo survives restarts.
+
+    Each entry is {"sheet": worksheet title, "id": expense ID}; only the last
+    config.UNDO_HISTORY deletes of every user are kept.
+    """
+
+    def __init__(self, path, limit=None):
+        self.path = path
+        self.limit = limit or config.UNDO_HISTORY
+        self.read_only = False # followers keep changes in memory (see leader.set_writable)
+        self._lock = threading.Lock()
+        self._entries = {} # str(user id) -> [entry, ...], oldest first
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Could not load undo log from {self.path}: {e}")
+
+    def _save(self):
+        if self.read_only:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def push(self, actor, sheet, expense_id):
+        with self._lock:
+            entries = self._entries.setdefault(str(actor), [])
+            entries.append({"sheet": sheet, "id": str(expense_id)})
+            del entries[:-self.limit]
+            self._save()
+
+    def pop(self, actor):
+        """Remove and return the actor's latest entry, or None."""
+        with self._lock:
+            entries = self._entries.get(str(actor))
+            if not entries:
+                return None
+            entry = entries.pop()
+            if not entries:
+                del self._entries[str(actor)]
+            self._save()
+            return entry
+
+    def discard(self, sheet, expense_ids):
+        """Drop entries whose rows were physically removed by compaction."""
+        expense_ids = {str(i) for i in expense_ids}
+        with self._lock:
+            changed = False
+            for actor in list(self._entries):
+                kept = [e for e in self._entries[actor] if not (e["sheet"] == sheet and e["id"] in expense_ids)]
+                if len(kept) != len(self._entries[actor]):
+                    changed = True
+                    if kept:
+                        self._entries[actor] = kept
+                    else:
+                        del self._entries[actor]
+            if changed:
+                self._save()
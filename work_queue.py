@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Busy(Exception):
+    """Raised by ChatWorkQueues.run when an update is shed instead of queued."""
+
+
+class ChatWorkQueues:
+    """Per-chat FIFO execution of update handlers with admission control.
+
+    Updates of one chat run strictly one after another in arrival order
+    (asyncio.Lock hands over to waiters first-come first-served), at most
+    `max_concurrency` handlers run at once across all chats, and an update
+    is rejected with Busy when its chat already has `max_depth` updates
+    waiting or the whole bot has `max_total` in flight.
+    """
+
+    def __init__(self, max_concurrency=None, max_depth=None, max_total=None):
+        self.max_concurrency = max_concurrency or config.WORK_CONCURRENCY
+        self.max_depth = max_depth or config.WORK_QUEUE_DEPTH
+        self.max_total = max_total or config.WORK_QUEUE_TOTAL
+        self._semaphore = None
+        self._chat_locks = {}
+        self._depth = {} # chat_id -> updates queued or running
+        self._running = 0
+        self._stats = {"processed": 0, "shed": 0, "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0}
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running application loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, chat_id, handler):
+        """Queue handler() behind the chat's earlier updates and return its result."""
+        depth = self._depth.get(chat_id, 0)
+        if depth >= self.max_depth or sum(self._depth.values()) >= self.max_total:
+            self._stats["shed"] += 1
+            raise Busy(chat_id)
+
+        self._depth[chat_id] = depth + 1
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        queued_at = time.monotonic()
+        try:
+            async with lock:
+                async with self._get_semaphore():
+                    waited = time.monotonic() - queued_at
+                    self._stats["wait_total"] += waited
+                    self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+                    self._running += 1
+                    started = time.monotonic()
+                    try:
+                        return await handler()
+                    finally:
+                        self._running -= 1
+                        self._stats["processed"] += 1
+                        self._stats["run_total"] += time.monotonic() - started
+        finally:
+            self._depth[chat_id] -= 1
+            if not self._depth[chat_id]:
+                # Idle chat: forget its state so the dicts stay small
+                del self._depth[chat_id]
+                if not lock.locked():
+                    self._chat_locks.pop(chat_id, None)
+
+    def metrics(self):
+        """Current queue depths and cumulative wait/run times (safe to call from other threads)."""
+        depth = dict(self._depth)
+        stats = dict(self._stats)
+        processed = stats["processed"] or 1
+        return {
+            "running": self._running,
+            "queued": sum(depth.values()) - self._running,
+            "busy_chats": len(depth),
+            "max_chat_depth": max(depth.values(), default=0),
+            "processed": stats["processed"],
+            "shed": stats["shed"],
+            "wait_avg_ms": round(stats["wait_total"] / processed * 1000, 1),
+            "wait_max_ms": round(stats["wait_max"] * 1000, 1),
+            "run_avg_ms": round(stats["run_total"] / processed * 1000, 1),
+            "limits": {"concurrency": self.max_concurrency, "chat_depth": self.max_depth, "total": self.max_total},
+        }